@@ -0,0 +1,120 @@
+"""
+Memory-aware admission control shared by all models.
+
+Every model job reserves its estimated memory (model_registry.estimate_memory_mb)
+from one host-wide budget before it runs and releases it when it finishes.
+Jobs that do not fit wait. Waiting jobs are queued per model and served
+round-robin across models, FIFO within a model; the job whose turn it is
+blocks the ones behind it until it fits, so large jobs (DeOldify at 1920px,
+VGGT with many frames) are not starved by a stream of small ones. A job
+larger than the whole budget runs once nothing else is running.
+
+MEMORY_BUDGET_MB sets the budget; by default it is 75% of physical memory.
+Set it to -1 to disable admission control.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from metrics import Gauge, observe
+
+
+def _default_budget_mb():
+    try:
+        return 0.75 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**20
+    except (ValueError, OSError, AttributeError):
+        return 8192.0
+
+
+def image_pixels(paths, default=0):
+    """
+    Total pixel count of the images at paths (reads headers only). Files
+    whose header cannot be read count as `default` pixels; the model reports
+    the actual error when it runs.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    total = 0
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                total += image.width * image.height
+        except (OSError, UnidentifiedImageError):
+            total += default
+    return total
+
+
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", "0")) or _default_budget_mb()
+
+
+class MemoryScheduler:
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self.reserved_mb = 0.0
+        self.running = 0
+        self.waiting = OrderedDict()  # model -> deque of tickets; order is the round-robin turn order
+        self.admitted = 0
+        self.delayed = 0
+        self._cond = threading.Condition()
+
+    def _is_next(self, ticket):
+        queue = next(iter(self.waiting.values()))
+        return queue[0] is ticket
+
+    def _fits(self, mb):
+        return self.running == 0 or self.reserved_mb + mb <= self.budget_mb
+
+    @contextmanager
+    def admit(self, model, mb):
+        """Reserve mb for the duration of the block, waiting for its fair turn."""
+        if self.budget_mb < 0:
+            yield
+            return
+
+        ticket = object()
+        start_time = time.perf_counter()
+        with self._cond:
+            self.waiting.setdefault(model, deque()).append(ticket)
+            if not (self._is_next(ticket) and self._fits(mb)):
+                self.delayed += 1
+            while not (self._is_next(ticket) and self._fits(mb)):
+                self._cond.wait()
+
+            # Give the other models a turn before this model's next job
+            queue = self.waiting.pop(model)
+            queue.popleft()
+            if queue:
+                self.waiting[model] = queue
+            self.reserved_mb += mb
+            self.running += 1
+            self.admitted += 1
+            self._cond.notify_all()  # the next job in line may fit as well
+        observe("admission_wait", time.perf_counter() - start_time, model)
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.reserved_mb -= mb
+                self.running -= 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "budget_mb": self.budget_mb,
+                "reserved_mb": self.reserved_mb,
+                "running": self.running,
+                "waiting": sum(len(queue) for queue in self.waiting.values()),
+                "admitted": self.admitted,
+                "delayed": self.delayed,
+            }
+
+
+memory_scheduler = MemoryScheduler(MEMORY_BUDGET_MB)
+
+Gauge("memory_reserved_mb", "Estimated memory reserved by running model jobs.", function=lambda: memory_scheduler.stats()["reserved_mb"])
+Gauge("memory_budget_mb", "Memory budget for model jobs.", function=lambda: memory_scheduler.budget_mb)
+Gauge("admission_waiting_jobs", "Model jobs waiting for memory.", function=lambda: memory_scheduler.stats()["waiting"])
@@ -0,0 +1,214 @@
+"""
+Micro-batching in front of the model workers.
+
+Requests to the same model that arrive within a short window are collected
+(up to a maximum batch size) into one workspace and run through the model in a
+single invocation; each caller then gets its own output back. Configure per
+model with the project keys "batch_window_ms" and "max_batch_size". Models
+with max_batch_size 1 bypass the batcher.
+
+While all of a model's workers are busy, new requests keep queueing, so the
+next batch grows with the load.
+
+Run `python batching.py` for a throughput/latency comparison on the stub model.
+"""
+import argparse
+import itertools
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from queue import Empty, Queue
+
+from PIL import Image
+
+from constants import BASE_DIR, STUB_WORKER
+from metrics import Gauge, Histogram, observe, percentile
+from model_workers import run_model
+from worker_protocol import output_path
+from workspaces import request_workspace
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class MicroBatcher:
+    def __init__(self, project):
+        self.project = project
+        self.model = project["model"]
+        self.window = project.get("batch_window_ms", 0) / 1000
+        self.max_batch_size = max(1, project.get("max_batch_size", 1))
+        self.concurrency = max(1, project.get("concurrency", 1))
+
+        self.pending = Queue()
+        self.slots = threading.Semaphore(self.concurrency)
+        self.executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix=f"batch-{self.model}")
+        self._names = itertools.count()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.latencies = deque(maxlen=1000)
+        threading.Thread(target=self._dispatch_loop, daemon=True, name=f"batcher-{self.model}").start()
+
+    def submit(self, input_file, output_file):
+        """
+        Queue one image. Once the model output has been moved to output_file,
+        the future resolves to the seconds the model took to run the batch.
+        """
+        future = Future()
+        self.pending.put((str(input_file), str(output_file), future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self.pending.get(timeout=remaining)
+                else:
+                    item = self.pending.get_nowait()
+            except Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            # Wait for a free worker first; requests keep piling up meanwhile.
+            self.slots.acquire()
+            batch = self._collect()
+            self.executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        for _, _, _, submitted in batch:
+            observe("batch_wait", started - submitted, self.model)
+        batch_size.observe(len(batch), model=self.model)
+        try:
+            with request_workspace(self.model) as (input_dir, output_dir):
+                names = []
+                for input_file, _, _, _ in batch:
+                    name = f"{next(self._names)}{os.path.splitext(input_file)[1]}"
+                    _link_or_copy(input_file, input_dir / name)
+                    names.append(name)
+
+                infer_time = run_model(self.project, input_dir, output_dir).get("infer_time")
+
+                for name, (_, output_file, future, submitted) in zip(names, batch):
+                    try:
+                        shutil.move(output_path(output_dir, name, self.model), output_file)
+                    except OSError as e:
+                        future.set_exception(e)
+                        continue
+                    future.set_result(infer_time)
+                    with self._stats_lock:
+                        self.latencies.append(time.perf_counter() - submitted)
+            with self._stats_lock:
+                self.batches += 1
+                self.items += len(batch)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = list(self.latencies)
+            return {
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "latency_p50": percentile(latencies, 50),
+                "latency_p95": percentile(latencies, 95),
+            }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+batch_size = Histogram("batch_size", "Images per model invocation.", ["model"], buckets=(1, 2, 4, 8, 16, 32))
+Gauge(
+    "batch_queue_depth", "Images waiting for the next batch.", ["model"],
+    function=lambda: {(model,): batcher.pending.qsize() for model, batcher in list(_batchers.items())},
+)
+
+
+def get_batcher(project):
+    with _batchers_lock:
+        batcher = _batchers.get(project["model"])
+        if batcher is None:
+            batcher = MicroBatcher(project)
+            _batchers[project["model"]] = batcher
+        return batcher
+
+
+def run_batched(project, input_file, output_file):
+    """
+    Run the model on a single image, sharing the invocation with other
+    requests that arrive in the same batch window. Returns the seconds the
+    model invocation took (or None if unknown), excluding the batch window
+    and the wait for a worker.
+    """
+    if project.get("max_batch_size", 1) <= 1:
+        input_dir = os.path.dirname(str(input_file))
+        output_dir = os.path.dirname(str(output_file))
+        return run_model(project, input_dir, output_dir).get("infer_time")
+    return get_batcher(project).submit(input_file, output_file).result()
+
+
+def _benchmark(requests, clients, delay, overhead):
+    for max_batch_size in (1, 8):
+        project = {
+            "model": f"Stub{max_batch_size}",
+            "venv": sys.executable,
+            "worker": STUB_WORKER,
+            "worker_args": ["--model", f"Stub{max_batch_size}", "--delay", str(delay), "--batch-overhead", str(overhead)],
+            "cwd": BASE_DIR,
+            "concurrency": 1,
+            "batch_window_ms": 10,
+            "max_batch_size": max_batch_size,
+        }
+        # Warm the worker so startup is not part of the measurement.
+        with request_workspace(project["model"]) as (input_dir, output_dir):
+            Image.new("RGB", (8, 8)).save(input_dir / "warm.png")
+            run_model(project, input_dir, output_dir)
+
+        latencies = []
+
+        def client(i):
+            with request_workspace(project["model"]) as (input_dir, output_dir):
+                input_file = input_dir / "temp.png"
+                Image.new("RGB", (8, 8)).save(input_file)
+                start = time.perf_counter()
+                run_batched(project, input_file, output_dir / f"temp_{project['model']}.png")
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(client, range(requests)))
+        elapsed = time.perf_counter() - start
+        print(
+            f"max_batch_size={max_batch_size}: {requests / elapsed:.1f} req/s, "
+            f"p50 {percentile(latencies, 50) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batched and unbatched throughput on the stub model")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--delay", type=float, default=0.01, help="Stub compute time per image (s)")
+    parser.add_argument("--overhead", type=float, default=0.1, help="Stub fixed cost per invocation (s)")
+    args = parser.parse_args()
+    _benchmark(args.requests, args.clients, args.delay, args.overhead)
@@ -0,0 +1,291 @@
+"""
+Stream a large image archive through one model or a chain of models.
+
+    python bulk_process.py archive/ --output-dir restored/ --models DarkIR
+    python bulk_process.py files.txt --output-dir restored/ --models DarkIR DeOldify X-Restormer
+
+The input is a directory (searched recursively) or a text file with one image
+path per line. Models come from model_registry.py and run with the same resize
+bounds and worker settings as the UI tabs; several models run as a pipeline
+(see pipeline.py). Outputs mirror the input tree as <file name>_<models>.png;
+the input suffix is kept, so a.jpg and a.png in one folder do not overwrite
+each other. List file entries are relative to the list file; entries whose
+output would land outside --output-dir (such as ../x.jpg) are rejected.
+
+Images flow through three bounded stages: --io-workers threads decode up to
+--prefetch images ahead, --workers threads run the models, and another
+--io-workers threads write finished images behind them (at most --write-behind
+waiting). Nothing else is kept per image, so memory stays flat however large
+the archive is. Every written output is appended to a checkpoint file in the
+output directory; a rerun skips images that are checkpointed and unchanged, so
+an interrupted run (Ctrl+C included) resumes where it stopped. Failed images
+are not checkpointed and are retried on the next run.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+from queue import Queue
+
+from PIL import Image
+
+from model_registry import image_models
+from model_workers import stop_all
+from pipeline import Pipeline
+from worker_protocol import IMAGE_SUFFIXES
+
+# Seconds of history the live images/s figure is averaged over
+RATE_WINDOW = 30.0
+
+_DONE = object()
+
+
+def iter_inputs(source):
+    """Yield (path, relative path) for every image in a directory tree or list file, lazily."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES:
+                    path = os.path.join(root, name)
+                    yield path, os.path.relpath(path, source)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source) as f:
+        for line in f:
+            entry = line.strip()
+            if entry and not entry.startswith("#"):
+                yield os.path.join(base, entry), os.path.normpath(entry.lstrip(os.sep))
+
+
+def output_file(output_dir, rel, label):
+    """Output path for the input at `rel`; raises ValueError if it would be outside output_dir."""
+    root = os.path.abspath(output_dir)
+    destination = os.path.normpath(os.path.join(root, f"{rel}_{label}.png"))
+    if os.path.commonpath([root, destination]) != root:
+        raise ValueError(f"{rel} would be written outside {output_dir}")
+    return destination
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}\t{stat.st_mtime_ns}"
+
+
+class Checkpoint:
+    """Append-only log of "<relative path>\\t<size>\\t<mtime_ns>" lines for finished images."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    rel, _, signature = line.rstrip("\n").partition("\t")
+                    if signature:
+                        self.done[rel] = signature
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def is_done(self, path, rel):
+        signature = self.done.get(rel)
+        try:
+            return signature is not None and signature == source_signature(path)
+        except OSError:
+            return False  # missing input; reported when it is read
+
+    def record(self, rel, signature):
+        with self._lock:
+            self._file.write(f"{rel}\t{signature}\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    """Counts finished images and prints images/s and ETA every `interval` seconds."""
+
+    def __init__(self, total, interval):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.perf_counter()
+        self.history = deque([(self.start_time, 0)])
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._live = sys.stderr.isatty()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="bulk-progress")
+
+    def add(self, failed=False):
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.done += 1
+
+    def rate(self):
+        now = time.perf_counter()
+        with self._lock:
+            self.history.append((now, self.done))
+            while len(self.history) > 2 and now - self.history[1][0] > RATE_WINDOW:
+                self.history.popleft()
+            (t0, done0), (t1, done1) = self.history[0], self.history[-1]
+        return (done1 - done0) / (t1 - t0) if t1 > t0 else 0.0
+
+    def line(self):
+        rate = self.rate()
+        remaining = self.total - self.done - self.failed
+        eta = format_duration(remaining / rate) if rate > 0 else "--"
+        return (
+            f"{self.done}/{self.total} done, {self.failed} failed, "
+            f"{rate:.2f} images/s, ETA {eta}"
+        )
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._live:
+                print("\r" + self.line(), end="", file=sys.stderr, flush=True)
+            else:
+                print(self.line(), file=sys.stderr, flush=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self._live:
+            print(file=sys.stderr)
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+def load_image(path):
+    with Image.open(path) as image:
+        return image.convert("RGB")
+
+
+def save_image(image, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp = f"{destination}.{threading.get_ident()}.tmp"
+    image.save(tmp, format="PNG")
+    os.replace(tmp, destination)
+
+
+def bulk_process(source, output_dir, models, workers, io_workers, prefetch, write_behind, report_interval):
+    pipeline = Pipeline(models, cache=False)
+    label = "_".join(pipeline.models)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output_dir, f"checkpoint_{label}.txt"))
+
+    total = skipped = 0
+    for path, rel in iter_inputs(source):
+        total += 1
+        skipped += checkpoint.is_done(path, rel)
+    print(f"{pipeline.name}: {total - skipped} to process, {skipped} already done")
+
+    pending = (item for item in iter_inputs(source) if not checkpoint.is_done(*item))
+    pending_lock = threading.Lock()
+    loaded = Queue(prefetch)  # decoded inputs waiting for a model worker
+    finished = Queue(write_behind)  # outputs waiting to be written
+    progress = Progress(total - skipped, report_interval)
+
+    def read():
+        while True:
+            with pending_lock:
+                item = next(pending, None)
+            if item is None:
+                return
+            path, rel = item
+            try:
+                destination = output_file(output_dir, rel, label)
+            except ValueError as e:
+                print(f"\nERROR: skipping {path}: {e}", file=sys.stderr)
+                progress.add(failed=True)
+                continue
+            try:
+                loaded.put((rel, destination, source_signature(path), load_image(path)))
+            except Exception as e:
+                print(f"\nERROR: could not read {path}: {e}", file=sys.stderr)
+                progress.add(failed=True)
+
+    def process():
+        while (item := loaded.get()) is not _DONE:
+            rel, destination, signature, image = item
+            try:
+                job = pipeline.run(image)
+            except Exception as e:
+                print(f"\nERROR: {pipeline.name} failed on {rel}: {e}", file=sys.stderr)
+                progress.add(failed=True)
+                continue
+            finished.put((rel, destination, signature, job.output_image))
+
+    def write():
+        while (item := finished.get()) is not _DONE:
+            rel, destination, signature, image = item
+            try:
+                save_image(image, destination)
+            except Exception as e:
+                print(f"\nERROR: could not write the output for {rel}: {e}", file=sys.stderr)
+                progress.add(failed=True)
+                continue
+            checkpoint.record(rel, signature)
+            progress.add()
+
+    def start(target, count, name):
+        threads = [threading.Thread(target=target, daemon=True, name=f"{name}-{i}") for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    # Daemon threads, so Ctrl+C ends the run at once; the checkpoint is already on disk
+    with progress:
+        stages = [
+            (start(read, io_workers, "bulk-read"), loaded, workers),
+            (start(process, workers, "bulk-model"), finished, io_workers),
+            (start(write, io_workers, "bulk-write"), None, 0),
+        ]
+        for threads, next_queue, consumers in stages:
+            for thread in threads:
+                thread.join()
+            for _ in range(consumers):
+                next_queue.put(_DONE)
+
+    checkpoint.close()
+    elapsed = time.perf_counter() - progress.start_time
+    rate = progress.done / elapsed if elapsed > 0 else 0.0
+    print(f"Finished in {format_duration(elapsed)}: {progress.done} done, {progress.failed} failed, {rate:.2f} images/s")
+    return progress.failed == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a directory or list of images through one or more models")
+    parser.add_argument("source", help="Input directory (searched recursively) or a text file with one image path per line")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--models", nargs="+", required=True, choices=image_models(), help="Model, or models to chain in order")
+    parser.add_argument("--workers", type=int, default=8, help="Images in the models at the same time")
+    parser.add_argument("--io-workers", type=int, default=4, help="Threads decoding inputs and, separately, writing outputs")
+    parser.add_argument("--prefetch", type=int, default=16, help="Decoded inputs kept ready ahead of the models")
+    parser.add_argument("--write-behind", type=int, default=16, help="Finished outputs waiting to be written")
+    parser.add_argument("--report-interval", type=float, default=2.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    try:
+        ok = bulk_process(
+            args.source, args.output_dir, args.models, args.workers, args.io_workers,
+            args.prefetch, args.write_behind, args.report_interval,
+        )
+    finally:
+        stop_all()
+    sys.exit(0 if ok else 1)
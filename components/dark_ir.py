@@ -1,35 +1,17 @@
-import subprocess
-from PIL import Image, ImageOps
 import gradio as gr
 
-from constants import BASE_DIR
+from components.image_model import stream_image_request
+from model_registry import projects_for_tab
 
-projects = [
-    {
-        "venv": BASE_DIR / "DarkIR/venv_DarkIR/bin/python",
-        "script": BASE_DIR / "DarkIR/inference.py",
-        "args": ["-i", "../input_128/", "-o", "../output_images/"],
-        "cwd": BASE_DIR / "DarkIR",  # important: run inside the project folder
-        "model": "DarkIR",
-    },
-]
+projects = projects_for_tab("dark_ir")
 
-def resize_image(image, model):
+def resize_image(image, model, latency_target=0):
     project = next((p for p in projects if p["model"] == model), None)
     if project is None:
-        return (None, None), "Invalid model selection"
+        yield (None, None), "Invalid model selection"
+        return
 
-    resized_image = ImageOps.contain(image, (256,256))
-    resized_image.save(f"input_128/temp.png")
-
-    subprocess.run(
-        [str(project["venv"]), str(project["script"]), *project["args"]],
-        cwd=project["cwd"],
-        check=True,
-    )
-
-    output_image = Image.open(f"output_images/temp_{model}.png")
-    return (resized_image, output_image), f"Used model: {model}"
+    yield from stream_image_request("Dark IR", project, image, latency_target)
 
 def dark_ir():
     with gr.Row():
@@ -40,6 +22,7 @@ def dark_ir():
                 label="Model",
                 value=projects[0]["model"] if projects else None
             )
+            latency_target = gr.Slider(minimum=0, maximum=30, value=0, step=0.5, label="Latency Target (s, 0 = default size)")
             submit_btn = gr.Button("Process Image", variant="primary")
 
         with gr.Column():
@@ -48,6 +31,6 @@ def dark_ir():
 
     submit_btn.click(
         fn=resize_image,
-        inputs=[input_image, model_dropdown],
+        inputs=[input_image, model_dropdown, latency_target],
         outputs=[image_slider, model_info]
     )
\ No newline at end of file
@@ -0,0 +1,191 @@
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from batching import run_batched
+from latency_model import choose_bound, predict_seconds, record_run
+from metrics import Trace, span
+from model_workers import run_model_arrays, supports_shm
+from result_cache import result_cache
+from streaming import STREAM_INTERVAL, eta_text, run_in_background, wait
+from tiling import process_tiled
+from workspaces import request_workspace
+
+# Largest side of the partial output shown while a tiled request runs
+TILED_PREVIEW_SIZE = 1024
+
+
+def process_image(project, image, bound, cache=True):
+    """
+    Resize `image` to fit in bound x bound, run the project's model on it and
+    return (resized_image, output_image, info). Repeated inputs are served
+    from the result cache unless cache is False.
+    """
+    model = project["model"]
+    with span("resize", model):
+        resized_image = ImageOps.contain(image, (bound, bound))
+
+    if cache:
+        with span("cache_lookup", model):
+            key = result_cache.key(resized_image, model, bound)
+            output_image = result_cache.get(key)
+        if output_image is not None:
+            return resized_image, output_image, f"Used model: {model} (cached)"
+
+    output_image = None
+    timings = {}
+    if supports_shm(project):
+        with span("model_run", model):
+            outputs = run_model_arrays(project, {"temp": np.asarray(resized_image.convert("RGB"))}, timings)
+        if outputs is not None:
+            output_image = Image.fromarray(np.asarray(outputs["temp"]))
+
+    if output_image is None:
+        output_image, timings["infer_time"] = _process_with_files(project, resized_image)
+
+    if cache:
+        with span("cache_store", model):
+            result_cache.put(key, output_image)
+    # Uncached runs teach the latency model how long the model takes on an
+    # input of this size; waiting for a worker is predicted separately
+    if timings.get("infer_time") is not None:
+        record_run(model, resized_image.width * resized_image.height, timings["infer_time"])
+    return resized_image, output_image, f"Used model: {model}"
+
+
+def plan_bound(project, image, latency_target=0):
+    """(bound, predicted seconds or None) for a request; see process_image_with_target."""
+    if latency_target:
+        return choose_bound(project, image, latency_target)
+    return project["bound"], predict_seconds(project, image, project["bound"])
+
+
+def process_image_with_target(project, image, latency_target=0, plan=None):
+    """
+    process_image with the largest bound predicted to finish within
+    latency_target seconds (see latency_model.py), or the model's default
+    bound when latency_target is 0. The info reports the input size and,
+    with a target, the predicted and actual time. `plan` is a precomputed
+    plan_bound() result.
+    """
+    bound, predicted = plan or plan_bound(project, image, latency_target)
+    start_time = time.perf_counter()
+    resized_image, output_image, info = process_image(project, image, bound)
+    actual = time.perf_counter() - start_time
+
+    info += f", input {resized_image.width}x{resized_image.height}"
+    if latency_target:
+        prediction = f"predicted {predicted:.2f}s" if predicted is not None else "no prediction yet"
+        info += f" (target {latency_target:g}s, {prediction}, actual {actual:.2f}s)"
+    return resized_image, output_image, info
+
+
+def _process_with_files(project, resized_image):
+    model = project["model"]
+    with request_workspace(model) as (input_dir, output_dir):
+        input_file = input_dir / "temp.png"
+        output_file = output_dir / f"temp_{model}.png"
+        with span("encode", model):
+            resized_image.save(input_file)
+        with span("model_run", model):
+            infer_time = run_batched(project, input_file, output_file)
+        with span("decode", model):
+            output_image = Image.open(output_file)
+            output_image.load()
+    return output_image, infer_time
+
+
+def process_image_tiled(project, image, tile_size, overlap, max_in_flight, on_tile=None):
+    """
+    Run the project's model over the full-resolution image in overlapping
+    tiles. Returns (input_image, output_image, info). on_tile is passed on
+    to tiling.process_tiled.
+    """
+    model = project["model"]
+    tile_size, overlap, max_in_flight = int(tile_size), int(overlap), int(max_in_flight)
+    overlap = min(overlap, tile_size // 2)
+
+    key = result_cache.key(image, model, f"tiled{tile_size}o{overlap}")
+    output_image = result_cache.get(key)
+    if output_image is not None:
+        return image, output_image, f"Used model: {model}, tiled (cached)"
+
+    with span("tiled_run", model):
+        output_image, tiles = process_tiled(project, image, tile_size, overlap, max_in_flight, on_tile)
+    with span("cache_store", model):
+        result_cache.put(key, output_image)
+    return image, output_image, f"Used model: {model}, {tiles} tiles of {tile_size}px (overlap {overlap}px)"
+
+
+def _stream(tab, model, image, work, status, preview=None):
+    """
+    Run work() -> (input, output, info) in the background under a trace for
+    `tab`, yielding ((image, preview or image), status(elapsed)) while it
+    runs and ((input, output), info) at the end.
+    """
+    trace = Trace(tab, model)
+    start_time = time.perf_counter()
+
+    def traced():
+        with trace.activate():
+            return work()
+
+    future = run_in_background(traced)
+    # Cached results come back at once; only show progress for real runs
+    if not wait(future, min(0.1, STREAM_INTERVAL)):
+        shown = image
+        yield (image, shown), status(time.perf_counter() - start_time)
+        while not wait(future):
+            if preview is not None:
+                shown = preview() or shown
+            yield (image, shown), status(time.perf_counter() - start_time)
+
+    try:
+        resized_image, output_image, info = future.result()
+    except Exception:
+        trace.finish("error")
+        raise
+    trace.finish()
+    yield (resized_image, output_image), info
+
+
+def stream_image_request(tab, project, image, latency_target=0):
+    """
+    Generator version of process_image_with_target for the Gradio image tabs:
+    streams the elapsed time and the latency model's ETA while the model runs.
+    """
+    model = project["model"]
+    plan = plan_bound(project, image, latency_target)
+
+    def status(elapsed):
+        return f"Running {model}... {eta_text(elapsed, plan[1])}"
+
+    yield from _stream(tab, model, image, lambda: process_image_with_target(project, image, latency_target, plan), status)
+
+
+def stream_tiled_request(tab, project, image, tile_size, overlap, max_in_flight):
+    """
+    Generator version of process_image_tiled: streams tile progress with an
+    ETA, and the partially blended output as a downscaled preview.
+    """
+    model = project["model"]
+    progress = {"done": 0, "total": 0, "render": None}
+
+    def on_tile(done, total, render_preview):
+        progress.update(done=done, total=total, render=render_preview)
+
+    def status(elapsed):
+        if not progress["total"]:
+            return f"Running {model}... {eta_text(elapsed)}"
+        return f"Running {model}: {progress['done']}/{progress['total']} tiles, {eta_text(elapsed, done=progress['done'], total=progress['total'])}"
+
+    def preview():
+        render = progress["render"]
+        return render(TILED_PREVIEW_SIZE) if render is not None else None
+
+    yield from _stream(
+        tab, model, image,
+        lambda: process_image_tiled(project, image, tile_size, overlap, max_in_flight, on_tile),
+        status, preview,
+    )
@@ -0,0 +1,41 @@
+import gradio as gr
+
+from metrics import request_trace
+from model_registry import image_models
+from pipeline import Pipeline
+
+DEFAULT_STAGES = ["DarkIR", "DeOldify", "X-Restormer"]
+
+def run_pipeline(image, stages):
+    if image is None:
+        return (None, None), "Please upload an image"
+    try:
+        pipeline = Pipeline(stages or [])
+    except ValueError as e:
+        return (None, None), str(e)
+
+    with request_trace("Pipeline", "+".join(pipeline.models)):
+        job = pipeline.run(image)
+    return (job.input_image, job.output_image), job.report(pipeline.name)
+
+def pipeline_page():
+    with gr.Row():
+        with gr.Column():
+            input_image = gr.Image(type="pil", label="Input Image")
+            stages_dropdown = gr.Dropdown(
+                choices=image_models(),
+                label="Stages (run in the order selected)",
+                value=[model for model in DEFAULT_STAGES if model in image_models()],
+                multiselect=True
+            )
+            submit_btn = gr.Button("Run Pipeline", variant="primary")
+
+        with gr.Column():
+            image_slider = gr.ImageSlider(label="Resized Image vs Output Image")
+            model_info = gr.Text(label="Model Info", lines=5)
+
+    submit_btn.click(
+        fn=run_pipeline,
+        inputs=[input_image, stages_dropdown],
+        outputs=[image_slider, model_info]
+    )
@@ -1,35 +1,22 @@
-import subprocess
-from PIL import Image, ImageOps
 import gradio as gr
 
-from constants import BASE_DIR
+from components.image_model import stream_image_request, stream_tiled_request
+from model_registry import projects_for_tab
 
-projects = [
-    {
-        "venv": BASE_DIR / "X-Restormer/venv/bin/python",
-        "script": BASE_DIR / "X-Restormer/xrestormer/test.py",
-        "args": ["-opt", "options/test/001_xrestormer_sr.yml"],
-        "cwd": BASE_DIR / "X-Restormer",
-        "model": "X-Restormer",
-    },
-]
+projects = projects_for_tab("super_resolution")
 
-def resize_image(image, model):
+def resize_image(image, model, tiled=False, tile_size=256, tile_overlap=16, max_tiles_in_flight=4, latency_target=0):
     project = next((p for p in projects if p["model"] == model), None)
     if project is None:
-        return (None, None), "Invalid model selection"
+        yield (None, None), "Invalid model selection"
+        return
 
-    resized_image = ImageOps.contain(image, (256,256))
-    resized_image.save(f"input_128/temp.png")
-
-    subprocess.run(
-        [str(project["venv"]), str(project["script"]), *project["args"]],
-        cwd=project["cwd"],
-        check=True,
-    )
-
-    output_image = Image.open(f"output_images/temp_{model}.png")
-    return (resized_image, output_image), f"Used model: {model}"
+    if tiled:
+        yield from stream_tiled_request(
+            "Super Resolution", project, image, tile_size, tile_overlap, max_tiles_in_flight
+        )
+    else:
+        yield from stream_image_request("Super Resolution", project, image, latency_target)
 
 def super_resolution():
     with gr.Row():
@@ -40,6 +27,12 @@ def super_resolution():
                 label="Model",
                 value=projects[0]["model"] if projects else None
             )
+            with gr.Accordion("Tiled mode", open=False):
+                tiled = gr.Checkbox(label="Process at full resolution (tiled)", value=False)
+                tile_size = gr.Slider(minimum=64, maximum=512, value=projects[0]["tile_size"], step=32, label="Tile Size (px)")
+                tile_overlap = gr.Slider(minimum=0, maximum=128, value=projects[0]["tile_overlap"], step=4, label="Tile Overlap (px)")
+                max_tiles_in_flight = gr.Slider(minimum=1, maximum=16, value=projects[0]["max_tiles_in_flight"], step=1, label="Max Tiles in Flight")
+            latency_target = gr.Slider(minimum=0, maximum=30, value=0, step=0.5, label="Latency Target (s, 0 = default size)")
             submit_btn = gr.Button("Process Image", variant="primary")
 
         with gr.Column():
@@ -48,6 +41,6 @@ def super_resolution():
 
     submit_btn.click(
         fn=resize_image,
-        inputs=[input_image, model_dropdown],
+        inputs=[input_image, model_dropdown, tiled, tile_size, tile_overlap, max_tiles_in_flight, latency_target],
         outputs=[image_slider, model_info]
     )
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""
+Precomputed filter index over a VGGT reconstruction.
+
+predictions_to_glb recomputes the filtered point cloud (percentile threshold,
+frame selection, background and sky masks) from scratch for every parameter
+combination. PointCloudIndex does that work once per reconstruction:
+
+- points of each prediction branch are stored grouped by frame and sorted by
+  confidence inside each frame, so a frame selection is a contiguous slice and
+  a confidence threshold is a suffix of it;
+- a permutation sorts all points by confidence for the "All frames" case;
+- black/white background masks are precomputed in the same order, and the sky
+  mask is built lazily the first time it is requested.
+
+Filtering then reduces to a binary search plus a slice, and the resulting scene
+is assembled with the same camera and alignment helpers predictions_to_glb uses,
+so the output matches it point for point.
+
+trimesh, matplotlib and vggt.visual_util are slow to import and only needed to
+build scenes, so they are imported on first use (or by import_scene_dependencies).
+"""
+import os
+import threading
+
+import numpy as np
+
+from metrics import percentile
+
+CONF_EPS = 1e-5
+# Largest dense voxel lookup table (int64 entries, 128 MB); bigger grids sort instead
+MAX_DENSE_VOXELS = 1 << 24
+# Flattened voxel keys must stay below this to fit in int64
+MAX_FLAT_VOXELS = 1 << 62
+
+
+def import_scene_dependencies():
+    """Import the scene-building dependencies now instead of on the first request."""
+    import matplotlib  # noqa: F401
+    import trimesh  # noqa: F401
+    import vggt.visual_util  # noqa: F401
+
+
+def _suffix_start(sorted_conf, conf_thres):
+    """First index whose confidence passes (conf >= percentile) & (conf > CONF_EPS)."""
+    threshold = 0.0 if conf_thres == 0.0 else percentile(sorted_conf, conf_thres, presorted=True)
+    return max(
+        np.searchsorted(sorted_conf, threshold, side="left"),
+        np.searchsorted(sorted_conf, CONF_EPS, side="right"),
+    )
+
+
+def _sky_mask(target_dir, S, H, W):
+    """S x H x W float mask (1 = keep, 0 = sky), same procedure as predictions_to_glb."""
+    import cv2
+    import onnxruntime
+    from vggt.visual_util import download_file_from_url, segment_sky
+
+    target_dir_images = os.path.join(target_dir, "images")
+    image_list = sorted(os.listdir(target_dir_images))
+    if not os.path.exists("skyseg.onnx"):
+        print("Downloading skyseg.onnx...")
+        download_file_from_url("https://huggingface.co/JianyuanWang/skyseg/resolve/main/skyseg.onnx", "skyseg.onnx")
+
+    skyseg_session = None
+    sky_mask_list = []
+    for image_name in image_list:
+        image_filepath = os.path.join(target_dir_images, image_name)
+        mask_filepath = os.path.join(target_dir, "sky_masks", image_name)
+        if os.path.exists(mask_filepath):
+            sky_mask = cv2.imread(mask_filepath, cv2.IMREAD_GRAYSCALE)
+        else:
+            if skyseg_session is None:
+                skyseg_session = onnxruntime.InferenceSession("skyseg.onnx")
+            sky_mask = segment_sky(image_filepath, skyseg_session, mask_filepath)
+        if sky_mask.shape[0] != H or sky_mask.shape[1] != W:
+            sky_mask = cv2.resize(sky_mask, (W, H))
+        sky_mask_list.append(sky_mask)
+    return (np.array(sky_mask_list) > 0.1).astype(np.float32)
+
+
+class _ConfidenceOrder:
+    """Frame-grouped, confidence-sorted ordering of one confidence array."""
+
+    def __init__(self, conf):
+        S = conf.shape[0]
+        per_frame = conf.reshape(S, -1)
+        points_per_frame = per_frame.shape[1]
+
+        # Sort inside each frame; frames stay in order, so frame f occupies
+        # [f * points_per_frame, (f + 1) * points_per_frame).
+        within = np.argsort(per_frame, axis=1, kind="stable")
+        self.order = (within + (np.arange(S) * points_per_frame)[:, None]).reshape(-1)
+        self.sorted_conf = np.take_along_axis(per_frame, within, axis=1).reshape(-1)
+        self.frame_offsets = np.arange(S + 1) * points_per_frame
+
+        # Permutation of the frame-grouped arrays sorting every point by confidence
+        self.global_perm = np.argsort(self.sorted_conf, kind="stable")
+        self.global_sorted_conf = self.sorted_conf[self.global_perm]
+
+    def select(self, conf_thres, frame_idx):
+        """Indices into the frame-grouped arrays of the points that pass."""
+        if frame_idx is None:
+            start = _suffix_start(self.global_sorted_conf, conf_thres)
+            return self.global_perm[start:]
+        lo, hi = self.frame_offsets[frame_idx], self.frame_offsets[frame_idx + 1]
+        start = _suffix_start(self.sorted_conf[lo:hi], conf_thres)
+        return np.arange(lo + start, hi)
+
+
+class _Branch:
+    def __init__(self, points, conf, colors_rgb):
+        self.conf = conf
+        self.shape = conf.shape
+        self.confidence = _ConfidenceOrder(conf)
+        order = self.confidence.order
+        self.vertices = np.ascontiguousarray(points.reshape(-1, 3)[order], dtype=np.float32)
+        self.colors = colors_rgb[order]
+        self.not_black = self.colors.astype(np.uint16).sum(axis=1) >= 16
+        self.not_white = ~((self.colors[:, 0] > 240) & (self.colors[:, 1] > 240) & (self.colors[:, 2] > 240))
+        self.sky_confidence = None
+
+
+def _first_per_voxel(keys, num_cells):
+    """Index of the first point in every occupied voxel."""
+    if num_cells <= MAX_DENSE_VOXELS:
+        # Dense grid: a scatter-min is several times faster than sorting
+        first = np.full(num_cells, len(keys), dtype=np.int64)
+        np.minimum.at(first, keys, np.arange(len(keys), dtype=np.int64))
+        return first[first < len(keys)]
+    _, keep = np.unique(keys, return_index=True)
+    return keep
+
+
+def _voxel_keep(vertices, lower, upper, voxel_size):
+    """
+    Indices of the first point in every occupied voxel. The grid spans
+    [lower, upper]; the few points outside it (far outliers) are deduplicated
+    by their cell coordinates, so they can never overflow the flattened keys.
+    Non-finite points are dropped.
+    """
+    scaled = (vertices - lower.astype(vertices.dtype)) / vertices.dtype.type(voxel_size)
+    dims = np.floor((upper - lower) / voxel_size) + 1
+    num_cells = int(dims[0]) * int(dims[1]) * int(dims[2])
+    # Column by column is faster than reducing an N x 3 mask over axis 1
+    inside = (scaled[:, 0] >= 0) & (scaled[:, 0] < dims[0])
+    for axis in (1, 2):
+        inside &= (scaled[:, axis] >= 0) & (scaled[:, axis] < dims[axis])
+
+    keep = []
+    inside_idx = None if inside.all() else np.flatnonzero(inside)
+    cells = np.floor(scaled if inside_idx is None else scaled[inside_idx]).astype(np.int64)
+    if num_cells < MAX_FLAT_VOXELS:
+        dims = dims.astype(np.int64)
+        keys = cells[:, 0] + dims[0] * (cells[:, 1] + dims[1] * cells[:, 2])
+        first = _first_per_voxel(keys, num_cells)
+    else:
+        first = np.unique(cells, axis=0, return_index=True)[1]
+    keep.append(first if inside_idx is None else inside_idx[first])
+
+    if inside_idx is not None:
+        outside_idx = np.flatnonzero(~inside)
+        # float64, so far points with a tiny voxel size do not overflow to inf
+        outside = (vertices[outside_idx].astype(np.float64) - lower) / voxel_size
+        finite = np.isfinite(outside).all(axis=1)
+        outside_idx, outside = outside_idx[finite], outside[finite]
+        if len(outside_idx):
+            cells = np.floor(np.clip(outside, -MAX_FLAT_VOXELS, MAX_FLAT_VOXELS)).astype(np.int64)
+            keep.append(outside_idx[np.unique(cells, axis=0, return_index=True)[1]])
+    return np.sort(np.concatenate(keep))
+
+
+def voxel_downsample(vertices, colors, max_points, voxel_size=None):
+    """
+    Keep the most confident point of every occupied voxel (vertices are
+    expected in ascending confidence order, as filter() returns them).
+
+    Without a voxel_size, the grid is coarsened until at most max_points
+    voxels are occupied. Returns (vertices, colors, voxel_size).
+    """
+    if len(vertices) <= max_points:
+        return vertices, colors, 0.0
+
+    # Reverse so np.unique's first occurrence is the most confident point
+    vertices = vertices[::-1]
+    colors = colors[::-1]
+
+    # The grid covers the robust extent of a subsample, so a few far outliers
+    # cannot blow up its size
+    sample = vertices[:: max(1, len(vertices) // 100000)]
+    sample = sample[np.all(np.isfinite(sample), axis=1)]
+    if not len(sample):
+        return vertices[:0], colors[:0], 0.0
+    low, high = np.percentile(sample, [0.1, 99.9], axis=0).astype(np.float64)
+    margin = 0.05 * (high - low)
+    lower, upper = low - margin, high + margin
+
+    auto = not voxel_size or voxel_size <= 0
+    if auto:
+        # Points mostly lie on surfaces, so start from an area-based estimate
+        # over the robust extent of the subsample
+        extent = np.maximum(np.percentile(sample, 99, axis=0) - np.percentile(sample, 1, axis=0), 1e-6)
+        voxel_size = float(np.sqrt((extent[0] * extent[1] + extent[1] * extent[2] + extent[0] * extent[2]) / max_points))
+
+    for _ in range(16):
+        keep = _voxel_keep(vertices, lower, upper, voxel_size)
+        if len(keep) <= max_points or not auto:
+            break
+        # Occupied voxels of a surface scale with 1 / voxel_size^2
+        voxel_size *= max(1.05, float(np.sqrt(len(keep) / max_points)))
+
+    if len(keep) > max_points:
+        keep = keep[np.linspace(0, len(keep) - 1, max_points).astype(np.int64)]
+    return vertices[keep], colors[keep], voxel_size
+
+
+def _frame_index(filter_by_frames):
+    if filter_by_frames is None or filter_by_frames in ("all", "All"):
+        return None
+    try:
+        return int(filter_by_frames.split(":")[0])
+    except (ValueError, IndexError):
+        return None
+
+
+class PointCloudIndex:
+    def __init__(self, predictions, target_dir=None):
+        self.target_dir = target_dir
+        self.extrinsic = np.asarray(predictions["extrinsic"])
+        self._lock = threading.Lock()
+
+        images = np.asarray(predictions["images"])
+        if images.ndim == 4 and images.shape[1] == 3:  # NCHW
+            images = np.transpose(images, (0, 2, 3, 1))
+        colors_rgb = (images.reshape(-1, 3) * 255).astype(np.uint8)
+
+        self.branches = {}
+        depth_points = np.asarray(predictions["world_points_from_depth"])
+        depth_conf = np.asarray(predictions.get("depth_conf", np.ones_like(depth_points[..., 0])))
+        self.branches["depth"] = _Branch(depth_points, depth_conf, colors_rgb)
+        if "world_points" in predictions:
+            points = np.asarray(predictions["world_points"])
+            conf = np.asarray(predictions.get("world_points_conf", np.ones_like(points[..., 0])))
+            self.branches["pointmap"] = _Branch(points, conf, colors_rgb)
+        else:
+            self.branches["pointmap"] = self.branches["depth"]
+
+    def _confidence(self, branch, mask_sky):
+        if not mask_sky or self.target_dir is None:
+            return branch.confidence
+        with self._lock:
+            if branch.sky_confidence is None:
+                S, H, W = branch.shape
+                sky_conf = branch.conf * _sky_mask(self.target_dir, S, H, W)
+                # Re-sorting changes the point order, so the sky variant gets
+                # its own permutation back into the branch's arrays.
+                sky_order = _ConfidenceOrder(sky_conf)
+                inverse = np.empty_like(branch.confidence.order)
+                inverse[branch.confidence.order] = np.arange(len(inverse))
+                sky_order.to_branch = inverse[sky_order.order]
+                branch.sky_confidence = sky_order
+            return branch.sky_confidence
+
+    def filter(self, conf_thres=50.0, filter_by_frames="all", mask_black_bg=False, mask_white_bg=False,
+               mask_sky=False, prediction_mode="Predicted Pointmap"):
+        """Return (vertices, colors) of the points predictions_to_glb would keep."""
+        if conf_thres is None:
+            conf_thres = 10.0
+        branch = self.branches["pointmap" if "Pointmap" in prediction_mode else "depth"]
+        confidence = self._confidence(branch, mask_sky)
+
+        selected = confidence.select(conf_thres, _frame_index(filter_by_frames))
+        if confidence is not branch.confidence:
+            selected = confidence.to_branch[selected]
+
+        keep = None
+        if mask_black_bg:
+            keep = branch.not_black[selected]
+        if mask_white_bg:
+            white = branch.not_white[selected]
+            keep = white if keep is None else keep & white
+        if keep is not None:
+            selected = selected[keep]
+        return branch.vertices[selected], branch.colors[selected]
+
+    def to_scene(self, conf_thres=50.0, filter_by_frames="all", mask_black_bg=False, mask_white_bg=False,
+                 show_cam=True, mask_sky=False, prediction_mode="Predicted Pointmap"):
+        """Build the same trimesh.Scene predictions_to_glb would."""
+        vertices_3d, colors_rgb = self.filter(
+            conf_thres, filter_by_frames, mask_black_bg, mask_white_bg, mask_sky, prediction_mode
+        )
+        return self._build_scene(vertices_3d, colors_rgb, filter_by_frames, show_cam)
+
+    def to_preview_scene(self, max_points, voxel_size=None, conf_thres=50.0, filter_by_frames="all",
+                         mask_black_bg=False, mask_white_bg=False, show_cam=True, mask_sky=False,
+                         prediction_mode="Predicted Pointmap"):
+        """
+        Level-of-detail version of to_scene: the filtered points are voxel-grid
+        downsampled to at most max_points. Returns (scene, info) where info has
+        the full and preview point counts and the voxel size used.
+        """
+        vertices_3d, colors_rgb = self.filter(
+            conf_thres, filter_by_frames, mask_black_bg, mask_white_bg, mask_sky, prediction_mode
+        )
+        total_points = len(vertices_3d)
+        vertices_3d, colors_rgb, voxel_size = voxel_downsample(vertices_3d, colors_rgb, max_points, voxel_size)
+        info = {"total_points": total_points, "preview_points": len(vertices_3d), "voxel_size": voxel_size}
+        return self._build_scene(vertices_3d, colors_rgb, filter_by_frames, show_cam), info
+
+    def num_points(self, conf_thres=50.0, filter_by_frames="all", mask_black_bg=False, mask_white_bg=False,
+                   mask_sky=False, prediction_mode="Predicted Pointmap"):
+        vertices_3d, _ = self.filter(conf_thres, filter_by_frames, mask_black_bg, mask_white_bg, mask_sky, prediction_mode)
+        return len(vertices_3d)
+
+    def _build_scene(self, vertices_3d, colors_rgb, filter_by_frames, show_cam):
+        import matplotlib
+        import trimesh
+        from vggt.visual_util import apply_scene_alignment, integrate_camera_into_scene
+
+        camera_matrices = self.extrinsic
+        frame_idx = _frame_index(filter_by_frames)
+        if frame_idx is not None:
+            camera_matrices = camera_matrices[frame_idx][None]
+
+        if vertices_3d.size == 0:
+            vertices_3d = np.array([[1, 0, 0]])
+            colors_rgb = np.array([[255, 255, 255]])
+            scene_scale = 1
+        else:
+            lower_percentile = np.percentile(vertices_3d, 5, axis=0)
+            upper_percentile = np.percentile(vertices_3d, 95, axis=0)
+            scene_scale = np.linalg.norm(upper_percentile - lower_percentile)
+
+        scene_3d = trimesh.Scene()
+        scene_3d.add_geometry(trimesh.PointCloud(vertices=vertices_3d, colors=colors_rgb))
+
+        num_cameras = len(camera_matrices)
+        extrinsics_matrices = np.zeros((num_cameras, 4, 4))
+        extrinsics_matrices[:, :3, :4] = camera_matrices
+        extrinsics_matrices[:, 3, 3] = 1
+
+        if show_cam:
+            colormap = matplotlib.colormaps.get_cmap("gist_rainbow")
+            for i in range(num_cameras):
+                camera_to_world = np.linalg.inv(extrinsics_matrices[i])
+                rgba_color = colormap(i / num_cameras)
+                current_color = tuple(int(255 * x) for x in rgba_color[:3])
+                integrate_camera_into_scene(scene_3d, camera_to_world, current_color, scene_scale)
+
+        return apply_scene_alignment(scene_3d, extrinsics_matrices)
@@ -1,9 +1,13 @@
+from collections import OrderedDict, deque
 from datetime import datetime
 import gc
 import os
 import shutil
+import threading
 import time
 import glob
+import hashlib
+import json
 import subprocess
 import sys
 import gradio as gr
@@ -12,7 +16,66 @@ import numpy as np
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from vggt.visual_util import predictions_to_glb
+from admission import memory_scheduler
+from constants import BASE_DIR, STUB_MODELS, STUB_VGGT, STUB_VGGT_ARGS
+from components.scene_export import export_compact_npz, export_ply, export_quantized_glb
+from components.vggt_index import PointCloudIndex
+from latency_model import latency_model, record_run
+from metrics import Trace, observe, span
+from model_registry import MODELS, estimate_memory_mb
+from streaming import eta_text, frame_progress, run_in_background, wait
+from upload_store import image_set_key, import_uploads, restore_reconstruction, store_reconstruction
+
+VGGT_PROJECT = MODELS["VGGT"]
+
+# Lines of run.py output kept for the log and error messages
+VGGT_OUTPUT_TAIL = 200
+
+PREDICTION_KEYS = [
+    "pose_enc",
+    "depth",
+    "depth_conf",
+    "world_points",
+    "world_points_conf",
+    "images",
+    "extrinsic",
+    "intrinsic",
+    "world_points_from_depth",
+]
+
+# Number of reconstructions whose predictions are kept in memory.
+PREDICTIONS_CACHE_SIZE = int(os.environ.get("VGGT_PREDICTIONS_CACHE_SIZE", "4"))
+# Unpack predictions.npz once into uncompressed .npy files and memory-map them,
+# so only the pages a visualization touches are read.
+PREDICTIONS_MMAP = os.environ.get("VGGT_PREDICTIONS_MMAP", "0") == "1"
+
+# Seconds a visualization request waits for newer parameter changes before
+# rebuilding; requests superseded in the meantime are dropped.
+VISUALIZATION_DEBOUNCE = float(os.environ.get("VGGT_VISUALIZATION_DEBOUNCE", "0.15"))
+
+# Level of detail: show a voxel-downsampled preview of at most this many points
+# first, then replace it with the full-density scene. 0 disables the preview.
+PREVIEW_POINTS = int(os.environ.get("VGGT_PREVIEW_POINTS", "200000"))
+# Voxel edge length for the preview; 0 picks it from the point budget.
+PREVIEW_VOXEL_SIZE = float(os.environ.get("VGGT_PREVIEW_VOXEL_SIZE", "0"))
+
+# Write GLBs with 16-bit quantized positions (KHR_mesh_quantization) instead of
+# float32; set to 0 for viewers that do not support the extension.
+QUANTIZED_GLB = os.environ.get("VGGT_QUANTIZED_GLB", "1") == "1"
+# Scene files kept per reconstruction; the least recently used are deleted.
+MAX_SCENE_FILES = int(os.environ.get("VGGT_MAX_SCENE_FILES", "32"))
+
+DOWNLOAD_FORMATS = {
+    "Binary PLY": (".ply", export_ply),
+    "Compact NPZ (quantized)": (".npz", export_compact_npz),
+}
+
+# Skip inference for an image set whose predictions are already stored.
+REUSE_RECONSTRUCTIONS = os.environ.get("VGGT_REUSE_RECONSTRUCTIONS", "1") == "1"
+
+_predictions_cache = OrderedDict()  # target_dir -> (npz mtime, predictions)
+_point_index_cache = OrderedDict()  # target_dir -> (npz mtime, PointCloudIndex)
+_predictions_lock = threading.Lock()
 
 
 # -------------------------------------------------------------------------
@@ -20,8 +83,9 @@ from vggt.visual_util import predictions_to_glb
 # -------------------------------------------------------------------------
 def handle_uploads(input_images):
     """
-    Create a new 'target_dir' + 'images' subfolder, and place user-uploaded
-    images into it. Return (target_dir, image_paths).
+    Create a new 'target_dir' + 'images' subfolder, and link user-uploaded
+    images into it from the content-addressed upload store.
+    Return (target_dir, image_paths).
     """
     start_time = time.time()
     gc.collect()
@@ -32,33 +96,27 @@ def handle_uploads(input_images):
     target_dir = os.path.abspath(f"input_images_{timestamp}")
     target_dir_images = os.path.join(target_dir, "images")
     
-    print(f"DEBUG: Creating target directory: {target_dir}")
-    print(f"DEBUG: Current working directory: {os.getcwd()}")
-
     # Clean up if somehow that folder already exists
     if os.path.exists(target_dir):
         shutil.rmtree(target_dir)
     os.makedirs(target_dir)
     os.makedirs(target_dir_images)
 
-    image_paths = []
+    file_paths = []
 
     # --- Handle images ---
     if input_images is not None:
         for file_data in input_images:
             if isinstance(file_data, dict) and "name" in file_data:
-                file_path = file_data["name"]
+                file_paths.append(file_data["name"])
             else:
-                file_path = file_data
-            dst_path = os.path.join(target_dir_images, os.path.basename(file_path))
-            shutil.copy(file_path, dst_path)
-            image_paths.append(dst_path)
+                file_paths.append(file_data)
 
-    # Sort final images for gallery
-    image_paths = sorted(image_paths)
+    # Hash, store and link in parallel; returns sorted paths for the gallery
+    image_paths = import_uploads(file_paths, target_dir_images) if file_paths else []
 
     end_time = time.time()
-    print(f"Files copied to {target_dir_images}; took {end_time - start_time:.3f} seconds")
+    print(f"Files linked into {target_dir_images}; took {end_time - start_time:.3f} seconds")
     return target_dir, image_paths
 
 
@@ -69,13 +127,213 @@ def update_gallery_on_upload(input_images):
     If nothing is uploaded, returns None values.
     """
     if not input_images:
-        print("DEBUG: No images uploaded")
         return None, [], "Please upload images to continue."
-    target_dir, image_paths = handle_uploads(input_images)
-    print(f"DEBUG: update_gallery_on_upload returning target_dir='{target_dir}', num_images={len(image_paths)}")
+    with span("upload", "VGGT"):
+        target_dir, image_paths = handle_uploads(input_images)
     return target_dir, image_paths, "Upload complete. Click 'Reconstruct' to begin 3D processing."
 
 
+def _read_predictions(predictions_path, mtime):
+    if not PREDICTIONS_MMAP:
+        with np.load(predictions_path) as loaded:
+            return {key: np.array(loaded[key]) for key in PREDICTION_KEYS if key in loaded}
+
+    results_dir = os.path.dirname(predictions_path)
+    npy_dir = os.path.join(results_dir, f"predictions_npy_{mtime}")
+    if not os.path.isdir(npy_dir):
+        # Drop unpacked copies of earlier predictions.npz versions
+        for stale_dir in glob.glob(os.path.join(results_dir, "predictions_npy_*")):
+            shutil.rmtree(stale_dir, ignore_errors=True)
+        tmp_dir = f"{npy_dir}.tmp{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        with np.load(predictions_path) as loaded:
+            for key in PREDICTION_KEYS:
+                if key in loaded:
+                    np.save(os.path.join(tmp_dir, f"{key}.npy"), loaded[key])
+        try:
+            os.rename(tmp_dir, npy_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # another request won the race
+
+    return {
+        key: np.load(os.path.join(npy_dir, f"{key}.npy"), mmap_mode="r")
+        for key in PREDICTION_KEYS
+        if os.path.exists(os.path.join(npy_dir, f"{key}.npy"))
+    }
+
+
+def _cache_get(cache, target_dir, mtime):
+    with _predictions_lock:
+        cached = cache.get(target_dir)
+        if cached is not None and cached[0] == mtime:
+            cache.move_to_end(target_dir)
+            return cached[1]
+    return None
+
+
+def _cache_put(cache, target_dir, mtime, value):
+    with _predictions_lock:
+        cache[target_dir] = (mtime, value)
+        cache.move_to_end(target_dir)
+        while len(cache) > PREDICTIONS_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def load_predictions(target_dir):
+    """
+    Return the predictions dict for target_dir, served from a small LRU cache
+    that is invalidated when predictions.npz changes. Returns None if the
+    reconstruction has not been run yet.
+    """
+    predictions_path = os.path.join(target_dir, "results", "predictions.npz")
+    if not os.path.exists(predictions_path):
+        return None
+    mtime = os.path.getmtime(predictions_path)
+
+    predictions = _cache_get(_predictions_cache, target_dir, mtime)
+    if predictions is not None:
+        return predictions
+
+    start_time = time.time()
+    predictions = _read_predictions(predictions_path, mtime)
+    observe("npz_load", time.time() - start_time, "VGGT")
+    print(f"Loaded predictions for {target_dir} in {time.time() - start_time:.2f} seconds")
+    _cache_put(_predictions_cache, target_dir, mtime, predictions)
+    return predictions
+
+
+def load_point_index(target_dir):
+    """
+    Return the PointCloudIndex for target_dir, building it on first use.
+    Cached alongside the predictions and invalidated the same way.
+    """
+    predictions_path = os.path.join(target_dir, "results", "predictions.npz")
+    if not os.path.exists(predictions_path):
+        return None
+    mtime = os.path.getmtime(predictions_path)
+
+    index = _cache_get(_point_index_cache, target_dir, mtime)
+    if index is not None:
+        return index
+
+    predictions = load_predictions(target_dir)
+    start_time = time.time()
+    index = PointCloudIndex(predictions, target_dir=target_dir)
+    observe("index_build", time.time() - start_time, "VGGT")
+    print(f"Built point cloud index for {target_dir} in {time.time() - start_time:.2f} seconds")
+    _cache_put(_point_index_cache, target_dir, mtime, index)
+    return index
+
+
+class VisualizationCoalescer:
+    """
+    Tracks the latest visualization request per reconstruction. Older requests
+    that are still waiting or building notice they were superseded and bail out
+    instead of finishing a GLB nobody will look at.
+    """
+
+    def __init__(self):
+        self.latest = {}
+        self.requested = 0
+        self.rebuilt = 0
+        self.avoided = 0
+        self._lock = threading.Lock()
+
+    def begin(self, target_dir):
+        with self._lock:
+            generation = self.latest.get(target_dir, 0) + 1
+            self.latest[target_dir] = generation
+            self.requested += 1
+            return generation
+
+    def is_current(self, target_dir, generation):
+        with self._lock:
+            return self.latest.get(target_dir) == generation
+
+    def record_avoided(self):
+        with self._lock:
+            self.avoided += 1
+
+    def record_rebuilt(self):
+        with self._lock:
+            self.rebuilt += 1
+
+    def stats(self):
+        with self._lock:
+            return {"requested": self.requested, "rebuilt": self.rebuilt, "avoided": self.avoided}
+
+
+visualization_coalescer = VisualizationCoalescer()
+
+
+def scene_file(target_dir, suffix, **params):
+    """Short, stable file name for a parameter combination (glbscene_<hash><suffix>)."""
+    key = json.dumps(params, sort_keys=True, default=str)
+    return os.path.join(target_dir, f"glbscene_{hashlib.sha1(key.encode()).hexdigest()[:12]}{suffix}")
+
+
+def prune_scene_files(target_dir, keep=None):
+    """Delete the least recently used scene files (by mtime) beyond MAX_SCENE_FILES."""
+    files = [path for path in glob.glob(os.path.join(target_dir, "glbscene_*")) if not path.endswith(".tmp")]
+    if len(files) <= MAX_SCENE_FILES:
+        return
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[MAX_SCENE_FILES:]:
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def export_glb(glbscene, glbfile, quantized=QUANTIZED_GLB, trace=None):
+    """Export via a temporary file so a concurrent reader never sees a partial GLB."""
+    tmp_file = f"{glbfile}.{threading.get_ident()}.tmp"
+    with span("glb_export", "VGGT", trace):
+        if quantized:
+            export_quantized_glb(glbscene, tmp_file)
+        else:
+            glbscene.export(file_obj=tmp_file, file_type="glb")
+    os.replace(tmp_file, glbfile)
+    prune_scene_files(os.path.dirname(glbfile), keep=glbfile)
+
+
+def build_glbs(
+    point_index, glbfile, preview_points, keep_going=lambda: True, quantized=QUANTIZED_GLB, trace=None, **params
+):
+    """
+    Yield (stage, glb path, log message): first a coarse "preview" GLB if the
+    filtered scene has more than preview_points points, then the "full" GLB.
+    Stops early once keep_going() returns False. Stage timings go to `trace`.
+    """
+    if preview_points:
+        start_time = time.time()
+        with span("preview_build", "VGGT", trace):
+            glbscene, info = point_index.to_preview_scene(preview_points, PREVIEW_VOXEL_SIZE, **params)
+        if info["preview_points"] < info["total_points"]:
+            preview_file = glbfile[: -len(".glb")] + f"_preview{preview_points}.glb"
+            export_glb(glbscene, preview_file, quantized, trace)
+            message = (
+                f"Preview: {info['preview_points']:,} of {info['total_points']:,} points "
+                f"(voxel size {info['voxel_size']:.4g}) built in {time.time() - start_time:.2f}s. "
+                f"Building full-resolution scene..."
+            )
+            print(message)
+            yield "preview", preview_file, message
+
+    if not keep_going():
+        return
+    start_time = time.time()
+    with span("scene_build", "VGGT", trace):
+        glbscene = point_index.to_scene(**params)
+    if not keep_going():
+        return
+    export_glb(glbscene, glbfile, quantized, trace)
+    message = f"Full-resolution scene built in {time.time() - start_time:.2f}s"
+    print(message)
+    yield "full", glbfile, message
+
+
 def clear_fields():
     """Clears the 3D viewer."""
     return None
@@ -86,10 +344,12 @@ def update_log():
     return "Loading and Reconstructing..."
 
 
-def run_vggt_inference(target_dir):
+def run_vggt_inference(target_dir, progress=None):
     """
     Run VGGT inference by calling run.py as a subprocess.
-    Returns the path to the results directory.
+    Returns the path to the results directory. run.py output is read as it is
+    written; progress(line, done, total) is called for every line, with the
+    frame counts of "done/total" counters or (None, None).
     """
     if not target_dir or not os.path.isdir(target_dir):
         raise ValueError("No valid target directory found. Please upload images first.")
@@ -97,19 +357,27 @@ def run_vggt_inference(target_dir):
     input_dir = os.path.abspath(os.path.join(target_dir, "images"))
     output_dir = os.path.abspath(os.path.join(target_dir, "results"))
     
-    print(f"DEBUG: input_dir={input_dir}, exists={os.path.exists(input_dir)}")
-    
     if not os.path.isdir(input_dir):
         raise ValueError(f"Input directory does not exist: {input_dir}")
     
-    # Get the path to run.py relative to the project root
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(script_dir)
-    vggt_dir = os.path.join(project_root, "vggt")
-    run_script = os.path.join(vggt_dir, "run.py")
+    # An identical image set was reconstructed before: reuse its predictions
+    set_key = image_set_key(input_dir)
+    predictions_path = os.path.join(output_dir, "predictions.npz")
+    os.makedirs(output_dir, exist_ok=True)
+    if REUSE_RECONSTRUCTIONS and restore_reconstruction(set_key, "predictions.npz", predictions_path):
+        print(f"Reusing stored predictions for image set {set_key[:12]}; skipping inference")
+        return output_dir
+    
+    # The file may be a link into the reconstruction store: run.py must write a new one, not truncate it
+    if os.path.exists(predictions_path):
+        os.remove(predictions_path)
     
-    # Use the vggt venv Python interpreter instead of current one
-    vggt_python = os.path.join(vggt_dir, "venv", "bin", "python3")
+    # Paths to run.py and the vggt venv Python interpreter come from the model registry
+    vggt_dir, run_script, vggt_python = str(VGGT_PROJECT["cwd"]), str(VGGT_PROJECT["script"]), str(VGGT_PROJECT["venv"])
+    
+    # Synthetic predictions for benchmarks and CPU-only boxes
+    if STUB_MODELS:
+        vggt_dir, run_script, vggt_python = str(BASE_DIR), str(STUB_VGGT), sys.executable
     
     # Fallback to current Python if vggt venv doesn't exist
     if not os.path.exists(vggt_python):
@@ -118,8 +386,6 @@ def run_vggt_inference(target_dir):
     
     # Call run.py as subprocess
     print(f"Running VGGT inference on {input_dir}...")
-    print(f"DEBUG: run_script={run_script}, exists={os.path.exists(run_script)}")
-    print(f"DEBUG: vggt_python={vggt_python}, exists={os.path.exists(vggt_python)}")
     
     cmd = [
         vggt_python,
@@ -127,18 +393,44 @@ def run_vggt_inference(target_dir):
         "--input_dir", input_dir,
         "--output_dir", output_dir,
     ]
+    if STUB_MODELS:
+        cmd += STUB_VGGT_ARGS
     
-    print(f"DEBUG: Running command: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True, cwd=vggt_dir)
+    frames = len(os.listdir(input_dir))
+    output = deque(maxlen=VGGT_OUTPUT_TAIL)
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    with memory_scheduler.admit("VGGT", estimate_memory_mb(VGGT_PROJECT, frames=frames)):
+        with span("inference", "VGGT"):
+            start_time = time.perf_counter()
+            with subprocess.Popen(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, cwd=vggt_dir, env=env
+            ) as process:
+                for line in process.stdout:
+                    line = line.rstrip()
+                    output.append(line)
+                    if progress is not None:
+                        progress(line, *frame_progress(line))
+            inference_time = time.perf_counter() - start_time
     
-    if result.returncode != 0:
-        print("STDERR:", result.stderr)
-        raise RuntimeError(f"VGGT inference failed: {result.stderr}")
+    print("OUTPUT:", "\n".join(output))
+    if process.returncode != 0:
+        raise RuntimeError("VGGT inference failed: " + "\n".join(list(output)[-20:]))
     
-    print("STDOUT:", result.stdout)
+    record_run("VGGT", frames, inference_time)
+    if os.path.exists(predictions_path):
+        store_reconstruction(set_key, predictions_path)
     return output_dir
 
 
+def predict_inference_seconds(frames):
+    """Predicted run.py time for `frames` images from past runs, or None."""
+    fit = latency_model("VGGT").fit()
+    if fit is None:
+        return None
+    a, b = fit
+    return a + b * frames
+
+
 def gradio_reconstruct(
     target_dir,
     conf_thres=3.0,
@@ -148,17 +440,21 @@ def gradio_reconstruct(
     show_cam=True,
     mask_sky=False,
     prediction_mode="Pointmap Regression",
+    fast_preview=True,
+    preview_points=PREVIEW_POINTS,
+    quantized_glb=QUANTIZED_GLB,
 ):
     """
     Perform reconstruction by calling run.py subprocess and then visualizing.
+    Yields progress while run.py runs (its latest output, frames done and an
+    ETA), a coarse preview when fast_preview is set, then the full scene.
     """
-    print(f"DEBUG: gradio_reconstruct called with target_dir='{target_dir}', type={type(target_dir)}")
-    
     if not target_dir or not os.path.isdir(target_dir):
-        print(f"DEBUG: Invalid target_dir. Exists: {os.path.exists(target_dir) if target_dir else 'N/A'}")
-        return None, "No valid target directory found. Please upload images first.", None
+        yield None, "No valid target directory found. Please upload images first.", None
+        return
     
     start_time = time.time()
+    trace = Trace("3D Reconstruction", "VGGT")
     gc.collect()
     
     # Get frame filter choices
@@ -167,117 +463,203 @@ def gradio_reconstruct(
     all_files_display = [f"{i}: {filename}" for i, filename in enumerate(all_files)]
     frame_filter_choices = ["All"] + all_files_display
     
+    progress = {"stage": "Running VGGT", "line": "", "done": 0, "total": 0}
+    
+    def on_output(line, done, total):
+        progress["line"] = line
+        # A new counter may start (another total); within one, progress never goes back
+        if total and (total != progress["total"] or done >= progress["done"]):
+            progress.update(done=min(done, total), total=total)
+    
+    def reconstruct():
+        with trace.activate():
+            # Run inference via subprocess
+            output_dir = run_vggt_inference(target_dir, on_output)
+            
+            # Load predictions and build the filter index once for this reconstruction
+            progress.update(stage="Loading predictions", line="")
+            return output_dir, load_point_index(target_dir)
+    
     try:
-        # Run inference via subprocess
-        output_dir = run_vggt_inference(target_dir)
-        
-        # Load predictions
+        future = run_in_background(reconstruct)
+        predicted = predict_inference_seconds(len(all_files))
+        while not wait(future):
+            elapsed = time.time() - start_time
+            if progress["stage"] != "Running VGGT":
+                status = f"{progress['stage']}... {elapsed:.1f}s elapsed"
+            elif progress["total"]:
+                status = f"Running VGGT on {len(all_files)} frames: {progress['done']}/{progress['total']}, {eta_text(elapsed, done=progress['done'], total=progress['total'])}"
+            else:
+                status = f"Running VGGT on {len(all_files)} frames... {eta_text(elapsed, predicted)}"
+            if progress["line"]:
+                status += f"\n{progress['line']}"
+            yield gr.update(), status, gr.update()
+        output_dir, point_index = future.result()
         predictions_path = os.path.join(output_dir, "predictions.npz")
-        if not os.path.exists(predictions_path):
-            return None, f"Predictions file not found at {predictions_path}", gr.Dropdown(choices=frame_filter_choices, value="All", interactive=True)
-        
-        loaded = np.load(predictions_path)
-        key_list = [
-            "pose_enc",
-            "depth",
-            "depth_conf",
-            "world_points",
-            "world_points_conf",
-            "images",
-            "extrinsic",
-            "intrinsic",
-            "world_points_from_depth",
-        ]
-        predictions = {key: np.array(loaded[key]) for key in key_list if key in loaded}
+        if point_index is None:
+            trace.finish("error")
+            yield None, f"Predictions file not found at {predictions_path}", gr.Dropdown(choices=frame_filter_choices, value="All", interactive=True)
+            return
         
         # Handle None frame_filter
         if frame_filter is None:
             frame_filter = "All"
         
         # Build GLB file name
-        glbfile = os.path.join(
-            target_dir,
-            f"glbscene_{conf_thres}_{frame_filter.replace('.', '_').replace(':', '').replace(' ', '_')}_maskb{mask_black_bg}_maskw{mask_white_bg}_cam{show_cam}_sky{mask_sky}_pred{prediction_mode.replace(' ', '_')}.glb",
+        glbfile = scene_file(
+            target_dir, ".glb", conf_thres=conf_thres, frame_filter=frame_filter, mask_black_bg=mask_black_bg,
+            mask_white_bg=mask_white_bg, show_cam=show_cam, mask_sky=mask_sky, prediction_mode=prediction_mode,
+            quantized=quantized_glb,
         )
         
-        # Convert predictions to GLB
-        glbscene = predictions_to_glb(
-            predictions,
+        # Convert predictions to GLB (coarse preview first, then full density)
+        for stage, path, message in build_glbs(
+            point_index,
+            glbfile,
+            int(preview_points or 0) if fast_preview else 0,
+            quantized=quantized_glb,
+            trace=trace,
             conf_thres=conf_thres,
             filter_by_frames=frame_filter,
             mask_black_bg=mask_black_bg,
             mask_white_bg=mask_white_bg,
             show_cam=show_cam,
             mask_sky=mask_sky,
-            target_dir=target_dir,
             prediction_mode=prediction_mode,
-        )
-        glbscene.export(file_obj=glbfile)
+        ):
+            if stage == "preview":
+                yield path, message, gr.Dropdown(choices=frame_filter_choices, value=frame_filter, interactive=True)
         
-        # Cleanup
-        del predictions
+        # Cleanup (the index stays cached for update_visualization)
+        del point_index
         gc.collect()
         
         end_time = time.time()
         print(f"Total time: {end_time - start_time:.2f} seconds")
-        log_msg = f"Reconstruction Success ({len(all_files)} frames). Visualization complete."
+        trace.finish()
+        log_msg = f"Reconstruction Success ({len(all_files)} frames). Visualization complete. {message}"
         
-        return glbfile, log_msg, gr.Dropdown(choices=frame_filter_choices, value=frame_filter, interactive=True)
+        yield glbfile, log_msg, gr.Dropdown(choices=frame_filter_choices, value=frame_filter, interactive=True)
     
     except Exception as e:
+        trace.finish("error")
         print(f"Error during reconstruction: {str(e)}")
-        return None, f"Error: {str(e)}", gr.Dropdown(choices=frame_filter_choices, value="All", interactive=True)
+        yield None, f"Error: {str(e)}", gr.Dropdown(choices=frame_filter_choices, value="All", interactive=True)
 
 
 def update_visualization(
-    target_dir, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode
+    target_dir, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode,
+    fast_preview=True, preview_points=PREVIEW_POINTS, quantized_glb=QUANTIZED_GLB,
 ):
     """
-    Reload saved predictions from npz, create (or reuse) the GLB for new parameters,
+    Reuse the GLB for these parameters if it exists, otherwise build it from the
+    cached point cloud index (coarse preview first when fast_preview is set),
     and return it for the 3D viewer.
     """
     if not target_dir or not os.path.isdir(target_dir):
-        return None, "No reconstruction available. Please click the Reconstruct button first."
+        yield None, "No reconstruction available. Please click the Reconstruct button first."
+        return
     
     predictions_path = os.path.join(target_dir, "results", "predictions.npz")
     if not os.path.exists(predictions_path):
-        return None, f"No reconstruction available. Please run 'Reconstruct' first."
-    
-    key_list = [
-        "pose_enc",
-        "depth",
-        "depth_conf",
-        "world_points",
-        "world_points_conf",
-        "images",
-        "extrinsic",
-        "intrinsic",
-        "world_points_from_depth",
-    ]
+        yield None, f"No reconstruction available. Please run 'Reconstruct' first."
+        return
     
-    loaded = np.load(predictions_path)
-    predictions = {key: np.array(loaded[key]) for key in key_list if key in loaded}
-    
-    glbfile = os.path.join(
-        target_dir,
-        f"glbscene_{conf_thres}_{frame_filter.replace('.', '_').replace(':', '').replace(' ', '_')}_maskb{mask_black_bg}_maskw{mask_white_bg}_cam{show_cam}_sky{mask_sky}_pred{prediction_mode.replace(' ', '_')}.glb",
+    glbfile = scene_file(
+        target_dir, ".glb", conf_thres=conf_thres, frame_filter=frame_filter, mask_black_bg=mask_black_bg,
+        mask_white_bg=mask_white_bg, show_cam=show_cam, mask_sky=mask_sky, prediction_mode=prediction_mode,
+        quantized=quantized_glb,
     )
     
-    if not os.path.exists(glbfile):
-        glbscene = predictions_to_glb(
-            predictions,
+    # Every request supersedes the ones before it, including cheap ones below
+    generation = visualization_coalescer.begin(target_dir)
+    trace = Trace("3D Visualization", "VGGT")
+    
+    def is_current():
+        return visualization_coalescer.is_current(target_dir, generation)
+    
+    # Only touch the predictions when this combination has not been rendered yet
+    message = "Visualization updated"
+    try:
+        # Mark as recently used so pruning keeps it
+        os.utime(glbfile)
+        cached = True
+    except FileNotFoundError:
+        # Never built, or pruned between the lookup and now: build it again
+        cached = False
+    if not cached:
+        # Give a slider drag time to settle; only the last value gets built
+        time.sleep(VISUALIZATION_DEBOUNCE)
+        if not is_current():
+            visualization_coalescer.record_avoided()
+            trace.finish("superseded")
+            yield gr.update(), gr.update()
+            return
+        
+        with trace.activate():
+            point_index = load_point_index(target_dir)
+        for stage, path, message in build_glbs(
+            point_index,
+            glbfile,
+            int(preview_points or 0) if fast_preview else 0,
+            keep_going=is_current,
+            quantized=quantized_glb,
+            trace=trace,
             conf_thres=conf_thres,
             filter_by_frames=frame_filter,
             mask_black_bg=mask_black_bg,
             mask_white_bg=mask_white_bg,
             show_cam=show_cam,
             mask_sky=mask_sky,
-            target_dir=target_dir,
             prediction_mode=prediction_mode,
-        )
-        glbscene.export(file_obj=glbfile)
+        ):
+            if stage == "preview":
+                yield path, message
+        
+        if not os.path.exists(glbfile):
+            # Superseded while building
+            visualization_coalescer.record_avoided()
+            trace.finish("superseded")
+            yield gr.update(), gr.update()
+            return
+        visualization_coalescer.record_rebuilt()
+        trace.finish()
+    else:
+        trace.finish("cached")
+    
+    # A newer request will deliver its own GLB; don't flash this one in between
+    if not is_current():
+        yield gr.update(), gr.update()
+        return
+    
+    avoided = visualization_coalescer.stats()["avoided"]
+    yield glbfile, f"{message} ({avoided} superseded rebuilds skipped so far)"
+
+
+def export_download(
+    target_dir, download_format, conf_thres, frame_filter, mask_black_bg, mask_white_bg, mask_sky, prediction_mode,
+):
+    """Write the filtered point cloud (without cameras) in a download format and return its path."""
+    if not target_dir or load_point_index(target_dir) is None:
+        return None, "No reconstruction available. Please run 'Reconstruct' first."
     
-    return glbfile, "Visualization updated"
+    suffix, export = DOWNLOAD_FORMATS[download_format]
+    params = dict(
+        conf_thres=conf_thres, filter_by_frames=frame_filter, mask_black_bg=mask_black_bg,
+        mask_white_bg=mask_white_bg, mask_sky=mask_sky, prediction_mode=prediction_mode,
+    )
+    path = scene_file(target_dir, suffix, **params)
+    if not os.path.exists(path):
+        start_time = time.time()
+        with span("scene_build", "VGGT"):
+            scene = load_point_index(target_dir).to_scene(show_cam=False, **params)
+        tmp_file = f"{path}.{threading.get_ident()}.tmp"
+        with span("download_export", "VGGT"):
+            export(scene, tmp_file)
+        os.replace(tmp_file, path)
+        prune_scene_files(target_dir, keep=path)
+        print(f"Exported {os.path.basename(path)} in {time.time() - start_time:.2f}s")
+    return path, f"{download_format} ready ({os.path.getsize(path) / 1e6:.1f} MB)"
 
 
 # -------------------------------------------------------------------------
@@ -334,6 +716,16 @@ def vggt_page():
                     mask_sky = gr.Checkbox(label="Filter Sky", value=False)
                     mask_black_bg = gr.Checkbox(label="Filter Black Background", value=False)
                     mask_white_bg = gr.Checkbox(label="Filter White Background", value=False)
+            
+            with gr.Row():
+                fast_preview = gr.Checkbox(label="Fast Preview (show a downsampled scene first)", value=PREVIEW_POINTS > 0)
+                preview_points = gr.Number(label="Preview Point Budget", value=PREVIEW_POINTS or 200000, precision=0, minimum=1000)
+                quantized_glb = gr.Checkbox(label="Quantized GLB (16-bit positions, smaller file)", value=QUANTIZED_GLB)
+            
+            with gr.Row():
+                download_format = gr.Dropdown(choices=list(DOWNLOAD_FORMATS), value="Binary PLY", label="Download Format")
+                download_btn = gr.Button("Export Point Cloud")
+                download_file = gr.File(label="Point Cloud Download", interactive=False)
     
     # -------------------------------------------------------------------------
     # Event handlers
@@ -366,43 +758,42 @@ def vggt_page():
             show_cam,
             mask_sky,
             prediction_mode,
+            fast_preview,
+            preview_points,
+            quantized_glb,
         ],
         outputs=[reconstruction_output, log_output, frame_filter],
+        concurrency_limit=1,
     )
     
-    # Real-time visualization updates
-    conf_thres.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    frame_filter.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    mask_black_bg.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    mask_white_bg.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    show_cam.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    mask_sky.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
-    )
-    prediction_mode.change(
-        update_visualization,
-        [target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode],
-        [reconstruction_output, log_output],
+    # Real-time visualization updates. Bursts of changes (e.g. dragging the
+    # slider) collapse to the latest values: Gradio keeps only the last pending
+    # trigger and VisualizationCoalescer drops rebuilds that were superseded.
+    gr.on(
+        triggers=[
+            conf_thres.change,
+            frame_filter.change,
+            mask_black_bg.change,
+            mask_white_bg.change,
+            show_cam.change,
+            mask_sky.change,
+            prediction_mode.change,
+            quantized_glb.change,
+        ],
+        fn=update_visualization,
+        inputs=[
+            target_dir_output, conf_thres, frame_filter, mask_black_bg, mask_white_bg, show_cam, mask_sky, prediction_mode,
+            fast_preview, preview_points, quantized_glb,
+        ],
+        outputs=[reconstruction_output, log_output],
+        trigger_mode="always_last",
     )
+    
+    download_btn.click(
+        fn=export_download,
+        inputs=[
+            target_dir_output, download_format, conf_thres, frame_filter, mask_black_bg, mask_white_bg, mask_sky,
+            prediction_mode,
+        ],
+        outputs=[download_file, log_output],
+    )
\ No newline at end of file
@@ -0,0 +1,78 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import gradio as gr
+
+from metrics import request_trace
+from model_registry import MODELS
+from video import VIDEO_DUPLICATE_THRESHOLD, restore_video
+
+projects = [MODELS["DarkIR"], MODELS["DeOldify"]]
+
+# Restored videos are written here; Gradio copies each result into its own
+# cache, so only the most recent VIDEO_MAX_OUTPUTS are kept
+VIDEO_OUTPUT_DIR = tempfile.mkdtemp(prefix="restored_videos_")
+VIDEO_MAX_OUTPUTS = int(os.environ.get("VIDEO_MAX_OUTPUTS", "8"))
+atexit.register(shutil.rmtree, VIDEO_OUTPUT_DIR, ignore_errors=True)
+
+
+def prune_outputs(keep=VIDEO_MAX_OUTPUTS):
+    """Delete all but the `keep` most recently written videos."""
+    paths = sorted(
+        (os.path.join(VIDEO_OUTPUT_DIR, name) for name in os.listdir(VIDEO_OUTPUT_DIR)),
+        key=os.path.getmtime, reverse=True,
+    )
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def process_video(video, model, skip_duplicates):
+    project = next((p for p in projects if p["model"] == model), None)
+    if project is None:
+        return None, "Invalid model selection"
+    if not video:
+        return None, "Please upload a video"
+
+    with tempfile.NamedTemporaryFile(suffix=".mp4", dir=VIDEO_OUTPUT_DIR, delete=False) as f:
+        output_file = f.name
+    try:
+        with request_trace("Video", model):
+            stats = restore_video(
+                project, video, output_file,
+                threshold=VIDEO_DUPLICATE_THRESHOLD if skip_duplicates else -1,
+            )
+    except BaseException:
+        os.remove(output_file)
+        raise
+    prune_outputs()
+    info = (
+        f"Used model: {model}, {stats['frames']} frames in {stats['seconds']:.1f}s ({stats['fps']:.1f} frames/s), "
+        f"{stats['reused']} reused from near-identical frames ({stats['reuse_ratio']:.0%})"
+    )
+    return output_file, info
+
+def video_page():
+    with gr.Row():
+        with gr.Column():
+            input_video = gr.Video(label="Input Video")
+            model_dropdown = gr.Dropdown(
+                choices=[project["model"] for project in projects],
+                label="Model",
+                value=projects[0]["model"] if projects else None
+            )
+            skip_duplicates = gr.Checkbox(label="Reuse outputs for near-identical frames", value=True)
+            submit_btn = gr.Button("Process Video", variant="primary")
+
+        with gr.Column():
+            output_video = gr.Video(label="Output Video")
+            model_info = gr.Text(label="Model Info")
+
+    submit_btn.click(
+        fn=process_video,
+        inputs=[input_video, model_dropdown, skip_duplicates],
+        outputs=[output_video, model_info]
+    )
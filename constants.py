@@ -1,3 +1,36 @@
+import os
+import shlex
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parent
\ No newline at end of file
+BASE_DIR = Path(__file__).resolve().parent
+# Root of the on-disk result cache and upload store.
+CACHE_DIR = Path(os.environ.get("CACHE_DIR", BASE_DIR / "cache"))
+
+# Run every model through stub_models/stub_worker.py instead of the real venvs.
+STUB_MODELS = os.environ.get("STUB_MODELS", "0") == "1"
+STUB_WORKER = BASE_DIR / "stub_models/stub_worker.py"
+# With STUB_MODELS, the 3D tab runs stub_models/stub_vggt.py with these extra args.
+STUB_VGGT = BASE_DIR / "stub_models/stub_vggt.py"
+STUB_VGGT_ARGS = shlex.split(os.environ.get("STUB_VGGT_ARGS", ""))
+
+# Seconds to wait for a worker to load its model / finish a single job.
+WORKER_STARTUP_TIMEOUT = float(os.environ.get("WORKER_STARTUP_TIMEOUT", "600"))
+WORKER_JOB_TIMEOUT = float(os.environ.get("WORKER_JOB_TIMEOUT", "600"))
+
+# Let projects with "transport": "shm" pass raw pixels to their worker through
+# shared memory instead of PNG files. Set to 0 to always use files.
+SHM_TRANSPORT = os.environ.get("SHM_TRANSPORT", "1") == "1"
+
+# Start one worker per model and import the 3D dependencies in the background
+# right after launch, so first requests skip the cold start.
+PREWARM = os.environ.get("PREWARM", "0") == "1"
+
+# Local port for the Prometheus metrics endpoint (see metrics.py). 0 disables it.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "9464"))
+
+# Job API for programmatic clients (see job_api.py). Port 0 disables it.
+JOB_API_PORT = int(os.environ.get("JOB_API_PORT", "7861"))
+JOB_API_HOST = os.environ.get("JOB_API_HOST", "127.0.0.1")
+
+# Worker hosts (host:port, comma-separated) that model jobs are sent to; see remote_workers.py.
+REMOTE_WORKERS = [address.strip() for address in os.environ.get("REMOTE_WORKERS", "").split(",") if address.strip()]
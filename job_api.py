@@ -0,0 +1,430 @@
+"""
+Asynchronous job API for programmatic clients, next to the Gradio UI.
+
+    POST /jobs                  {"model": "DarkIR", "images": ["<base64>", ...]}
+                                -> 202 {"jobs": [{"id", "status", "position"}, ...]}
+    GET  /jobs/<id>             -> {"id", "model", "status", "position", "seconds", "error"}
+    GET  /jobs/<id>/events      -> text/event-stream of the job's status until it finishes
+    GET  /jobs/<id>/result      -> the output bytes (image/png, or predictions.npz for VGGT)
+    GET  /models                -> {model: {"queued", "running", "capacity"}}
+
+For the image models every image in a submission becomes its own job, resized
+to the model's bound like in the UI. For VGGT all images of a submission are
+one reconstruction job (optional "names" fix the frame order).
+
+Each model has its own bounded queue (JOB_QUEUE_SIZE) served by
+concurrency x max_batch_size threads, so jobs of one model reach its
+micro-batcher together and a burst for one model does not delay the others.
+A submission that does not fit in the queue is rejected as a whole with 429
+and a Retry-After estimate instead of being partly accepted. Results are kept
+as produced: the worker's PNG file for file-based models, one PNG encoding
+for shared-memory models, and the predictions file for VGGT; they are served
+as stored, without decoding or re-encoding. Finished jobs, with their results
+and VGGT folders, are dropped after JOB_RESULT_TTL seconds: on every submit and
+lookup, and on a timer in between.
+"""
+import base64
+import binascii
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from batching import run_batched
+from constants import JOB_API_HOST, JOB_API_PORT
+from metrics import Counter, Gauge, observe
+from model_registry import MODELS
+from model_workers import run_model_arrays, supports_shm
+from workspaces import request_workspace
+
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "64"))
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", "600"))
+# Seconds between sweeps for expired jobs (besides the ones on submit and lookup)
+JOB_PURGE_INTERVAL = 60
+# Largest request body accepted by POST /jobs
+JOB_MAX_REQUEST_MB = float(os.environ.get("JOB_MAX_REQUEST_MB", "256"))
+
+FINISHED = ("done", "failed")
+
+jobs_rejected = Counter("job_api_rejected_total", "Job submissions rejected because the model's queue was full.", ["model"])
+
+
+class Job:
+    def __init__(self, model, payload):
+        self.id = uuid.uuid4().hex
+        self.model = model
+        self.payload = payload  # input bytes (image models) or [(name, bytes)] (VGGT); dropped once started
+        self.status = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None  # output bytes kept in memory
+        self.result_path = None  # or an output file served from disk
+        self.content_type = "image/png"
+        self.cleanup_dir = None
+        self.changed = threading.Condition()
+
+    def set_status(self, status, error=None):
+        with self.changed:
+            self.status = status
+            self.error = error
+            if status == "running":
+                self.started = time.time()
+            elif status in FINISHED:
+                self.finished = time.time()
+            self.changed.notify_all()
+
+    def describe(self, position=None):
+        info = {"id": self.id, "model": self.model, "status": self.status}
+        if position is not None:
+            info["position"] = position
+        if self.finished is not None and self.started is not None:
+            info["seconds"] = round(self.finished - self.started, 3)
+        if self.error is not None:
+            info["error"] = self.error
+        if self.status == "done":
+            info["result"] = f"/jobs/{self.id}/result"
+        return info
+
+
+def _run_image_job(project, job):
+    model = project["model"]
+    bound = project["bound"]
+    with Image.open(io.BytesIO(job.payload)) as image:
+        resized = ImageOps.contain(image.convert("RGB"), (bound, bound))
+
+    if supports_shm(project):
+        outputs = run_model_arrays(project, {"temp": np.asarray(resized)})
+        if outputs is not None:
+            buffer = io.BytesIO()
+            Image.fromarray(np.asarray(outputs["temp"])).save(buffer, format="PNG", compress_level=1)
+            job.result = buffer.getvalue()
+            return
+
+    with request_workspace(model) as (input_dir, output_dir):
+        input_file = input_dir / "temp.png"
+        output_file = output_dir / f"temp_{model}.png"
+        resized.save(input_file, compress_level=1)
+        run_batched(project, input_file, output_file)
+        job.result = output_file.read_bytes()  # the worker's PNG, as written
+
+
+def _run_vggt_job(job):
+    from components.vggt_page import handle_uploads, run_vggt_inference
+
+    upload_dir = tempfile.mkdtemp(prefix="job_api_")
+    try:
+        paths = []
+        for name, data in job.payload:
+            path = os.path.join(upload_dir, os.path.basename(name))
+            with open(path, "wb") as f:
+                f.write(data)
+            paths.append(path)
+        target_dir, _ = handle_uploads(paths)
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+    job.cleanup_dir = target_dir
+    output_dir = run_vggt_inference(target_dir)
+    job.result_path = os.path.join(output_dir, "predictions.npz")
+    job.content_type = "application/octet-stream"
+
+
+class ModelQueue:
+    """Bounded FIFO of one model's jobs, served by `workers` threads started on first use."""
+
+    def __init__(self, project, capacity, workers):
+        self.project = project
+        self.capacity = capacity
+        self.workers = workers
+        self.pending = deque()
+        self.running = 0
+        self.durations = deque(maxlen=32)
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, jobs):
+        """Queue all of `jobs`, or none of them if they do not fit. Returns whether they were queued."""
+        with self._cond:
+            if len(self.pending) + len(jobs) > self.capacity:
+                return False
+            self.pending.extend(jobs)
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, daemon=True, name=f"job-{self.project['model']}-{len(self._threads)}"
+                )
+                thread.start()
+                self._threads.append(thread)
+            self._cond.notify(len(jobs))
+        return True
+
+    def position(self, job):
+        with self._cond:
+            try:
+                return self.pending.index(job)
+            except ValueError:
+                return None
+
+    def retry_after(self, count):
+        """Rough seconds until `count` more jobs would fit."""
+        with self._cond:
+            per_job = sum(self.durations) / len(self.durations) if self.durations else 1.0
+            excess = len(self.pending) + count - self.capacity
+        return max(1, round(excess * per_job / self.workers))
+
+    def stats(self):
+        with self._cond:
+            return {"queued": len(self.pending), "running": self.running, "capacity": self.capacity}
+
+    def _work(self):
+        model = self.project["model"]
+        while True:
+            with self._cond:
+                while not self.pending:
+                    self._cond.wait()
+                job = self.pending.popleft()
+                self.running += 1
+            observe("job_queue_wait", time.time() - job.created, model)
+            job.set_status("running")
+            try:
+                if model == "VGGT":
+                    _run_vggt_job(job)
+                else:
+                    _run_image_job(self.project, job)
+                job.payload = None
+                job.set_status("done")
+            except Exception as e:
+                print(f"ERROR: job {job.id} ({model}) failed: {e}")
+                job.payload = None
+                job.set_status("failed", str(e))
+            finally:
+                with self._cond:
+                    self.running -= 1
+                    if job.started is not None:
+                        self.durations.append(time.time() - job.started)
+
+
+class JobManager:
+    def __init__(self, capacity=JOB_QUEUE_SIZE, ttl=JOB_RESULT_TTL):
+        self.ttl = ttl
+        self.queues = {
+            model: ModelQueue(project, capacity, max(1, project.get("concurrency", 1)) * max(1, project.get("max_batch_size", 1)))
+            for model, project in MODELS.items()
+        }
+        self.jobs = OrderedDict()  # id -> Job, in submission order
+        self._lock = threading.Lock()
+
+    def submit(self, model, payloads):
+        """Queue one job per payload; returns the jobs, or None if the model's queue is full."""
+        self._purge()
+        queue = self.queues[model]
+        jobs = [Job(model, payload) for payload in payloads]
+        with self._lock:  # register first so a job that finishes at once can be looked up
+            for job in jobs:
+                self.jobs[job.id] = job
+        if queue.submit(jobs):
+            return jobs
+        with self._lock:
+            for job in jobs:
+                del self.jobs[job.id]
+        jobs_rejected.inc(model=model)
+        return None
+
+    def get(self, job_id):
+        self._purge()
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def describe(self, job):
+        return job.describe(self.queues[job.model].position(job) if job.status == "queued" else None)
+
+    def _purge(self):
+        cutoff = time.time() - self.ttl
+        expired = []
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.finished is not None and job.finished < cutoff:
+                    expired.append(self.jobs.pop(job_id))
+        for job in expired:
+            if job.cleanup_dir:
+                shutil.rmtree(job.cleanup_dir, ignore_errors=True)
+
+    def _purge_loop(self):
+        while True:
+            time.sleep(max(1.0, min(self.ttl, JOB_PURGE_INTERVAL)))
+            self._purge()
+
+    def start_purging(self):
+        """Drop expired jobs on a timer too, so results do not outlive the TTL once submissions stop."""
+        threading.Thread(target=self._purge_loop, daemon=True, name="job-purge").start()
+
+
+job_manager = JobManager()
+
+Gauge(
+    "job_api_queue_depth", "Jobs waiting in the job API queue of each model.", ["model"],
+    function=lambda: {(model,): queue.stats()["queued"] for model, queue in job_manager.queues.items()},
+)
+
+
+def _decode_images(body):
+    """Parse a POST /jobs body into (model, payloads); raises ValueError with a client-facing message."""
+    try:
+        request = json.loads(body)
+        model = request["model"]
+        images = [base64.b64decode(image, validate=True) for image in request["images"]]
+    except (ValueError, KeyError, TypeError, binascii.Error) as e:
+        raise ValueError(f'expected JSON {{"model": ..., "images": [base64, ...]}}: {e}')
+    if model not in MODELS:
+        raise ValueError(f"unknown model {model!r}; choose from {', '.join(MODELS)}")
+    if not images:
+        raise ValueError("no images")
+    if model == "VGGT":
+        names = request.get("names") or [f"image_{i:04d}.png" for i in range(len(images))]
+        if len(names) != len(images):
+            raise ValueError("names and images differ in length")
+        return model, [list(zip(names, images))]
+    return model, images
+
+
+class _JobHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status, data, headers=()):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > JOB_MAX_REQUEST_MB * 2**20:
+            self.close_connection = True
+            self._send_json(413, {"error": f"request larger than {JOB_MAX_REQUEST_MB:g} MB"})
+            return
+        try:
+            model, payloads = _decode_images(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if len(payloads) > job_manager.queues[model].capacity:
+            self._send_json(400, {"error": f"at most {job_manager.queues[model].capacity} images per {model} submission"})
+            return
+        jobs = job_manager.submit(model, payloads)
+        if jobs is None:
+            queue = job_manager.queues[model]
+            retry_after = queue.retry_after(len(payloads))
+            self._send_json(
+                429, {"error": f"{model} queue is full", **queue.stats(), "retry_after": retry_after},
+                headers=[("Retry-After", str(retry_after))],
+            )
+            return
+        self._send_json(202, {"jobs": [job_manager.describe(job) for job in jobs]})
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts == ["models"]:
+            self._send_json(200, {model: queue.stats() for model, queue in job_manager.queues.items()})
+            return
+        if len(parts) not in (2, 3) or parts[0] != "jobs":
+            self._send_json(404, {"error": "not found"})
+            return
+        job = job_manager.get(parts[1])
+        if job is None:
+            self._send_json(404, {"error": "unknown or expired job"})
+            return
+
+        action = parts[2] if len(parts) == 3 else None
+        if action is None:
+            self._send_json(200, job_manager.describe(job))
+        elif action == "events":
+            self._stream_events(job)
+        elif action == "result":
+            self._send_result(job)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _stream_events(self, job):
+        """Server-sent events: one message per status change, ending with the final status."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        last = None
+        while True:
+            with job.changed:
+                while job.status == last:
+                    job.changed.wait(timeout=15)
+                    if job.status == last:
+                        break  # keep-alive below
+                status = job.status
+            if status == last:
+                self.wfile.write(b": keep-alive\n\n")
+            else:
+                info = job_manager.describe(job)
+                self.wfile.write(f"event: {status}\ndata: {json.dumps(info)}\n\n".encode())
+                last = status
+            self.wfile.flush()
+            if status in FINISHED:
+                return
+
+    def _send_result(self, job):
+        if job.status != "done":
+            self._send_json(409, job_manager.describe(job))
+            return
+        if job.result is not None:
+            self.send_response(200)
+            self.send_header("Content-Type", job.content_type)
+            self.send_header("Content-Length", str(len(job.result)))
+            self.end_headers()
+            self.wfile.write(job.result)
+            return
+        with open(job.result_path, "rb") as f:
+            self.send_response(200)
+            self.send_header("Content-Type", job.content_type)
+            self.send_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+            self.send_header("Content-Disposition", f'attachment; filename="{os.path.basename(job.result_path)}"')
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_job_api(port=JOB_API_PORT, host=JOB_API_HOST):
+    """Serve the job API from a daemon thread. Returns the server, or None if disabled."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _JobHandler)
+    except OSError as e:
+        print(f"WARNING: job API not started on port {port}: {e}")
+        return None
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    job_manager.start_purging()
+    print(f"Job API available at http://{host}:{port}/jobs")
+    return _server
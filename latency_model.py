@@ -0,0 +1,115 @@
+"""
+Learned per-model latency, used to pick the input size for a latency target.
+
+Every uncached image request records (input pixels, seconds), where seconds
+is the model's execution time as reported by the worker; the batch window,
+memory admission and the wait for a worker are left out. The model's run time
+is fitted as seconds = a + b * pixels over its last LATENCY_HISTORY runs, so
+the fit follows the host's current speed. The expected wait for a worker is a
+separate term, from the model's current backlog (jobs running or waiting for
+a worker) relative to its concurrency. choose_bound() then picks the largest bound,
+in steps of BOUND_STEP between MIN_BOUND and the project's "max_bound", for
+which wait + run time fits the target. The model's default bound is used
+until it has history.
+"""
+import os
+import threading
+from collections import deque
+
+import numpy as np
+
+from metrics import in_flight_jobs, queue_depth
+
+LATENCY_HISTORY = int(os.environ.get("LATENCY_HISTORY", "100"))
+MIN_BOUND = 64
+BOUND_STEP = 32
+
+
+class LatencyModel:
+    def __init__(self, history=LATENCY_HISTORY):
+        self.samples = deque(maxlen=history)  # (pixels, seconds)
+        self._lock = threading.Lock()
+
+    def record(self, pixels, seconds):
+        with self._lock:
+            self.samples.append((pixels, seconds))
+
+    def fit(self):
+        """(a, b) of seconds = a + b * pixels, or None without history."""
+        with self._lock:
+            samples = np.array(self.samples, dtype=np.float64)
+        if len(samples) == 0:
+            return None
+        pixels, seconds = samples[:, 0], samples[:, 1]
+        if len(samples) < 3 or np.ptp(pixels) < 0.05 * pixels.mean():
+            # All runs at about one size: assume time proportional to pixels
+            return 0.0, seconds.mean() / max(pixels.mean(), 1.0)
+        b, a = np.polyfit(pixels, seconds, 1)
+        if b <= 0:
+            return 0.0, seconds.mean() / max(pixels.mean(), 1.0)
+        return max(a, 0.0), b
+
+    def typical_run(self):
+        with self._lock:
+            return float(np.median([seconds for _, seconds in self.samples])) if self.samples else 0.0
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def latency_model(model):
+    with _models_lock:
+        return _models.setdefault(model, LatencyModel())
+
+
+def record_run(model, pixels, seconds):
+    latency_model(model).record(pixels, seconds)
+
+
+def expected_wait(project):
+    """Seconds a new job is expected to wait for one of the model's workers."""
+    model = project["model"]
+    concurrency = max(1, project.get("concurrency", 1))
+    backlog = in_flight_jobs.get(model=model) + queue_depth.get(model=model)
+    ahead = backlog - concurrency + 1
+    return max(0, ahead) / concurrency * latency_model(model).typical_run()
+
+
+def contained_size(width, height, bound):
+    scale = bound / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def predict_seconds(project, image, bound):
+    """Predicted seconds for a request at `bound`, including the wait for a worker, or None without history."""
+    fit = latency_model(project["model"]).fit()
+    if fit is None:
+        return None
+    a, b = fit
+    w, h = contained_size(*image.size, bound)
+    return expected_wait(project) + a + b * w * h
+
+
+def choose_bound(project, image, target):
+    """
+    Largest bound predicted to finish within `target` seconds, and that
+    prediction. Returns (project["bound"], None) while the model has no history.
+    Inputs are not upscaled past the default bound; if no bound fits,
+    MIN_BOUND is used.
+    """
+    fit = latency_model(project["model"]).fit()
+    if fit is None:
+        return project["bound"], None
+    a, b = fit
+    wait = expected_wait(project)
+    width, height = image.size
+    upper = min(project.get("max_bound", project["bound"]), max(project["bound"], width, height))
+
+    bound = max(MIN_BOUND, upper)
+    while True:
+        w, h = contained_size(width, height, bound)
+        predicted = wait + a + b * w * h
+        if predicted <= target or bound <= MIN_BOUND:
+            return bound, predicted
+        bound = max(MIN_BOUND, bound - BOUND_STEP)
@@ -0,0 +1,438 @@
+"""
+Load test for the app's request handlers, run against stub models.
+
+Drives super_resolution/dark_ir/bw_to_color.resize_image, run_pipeline, gradio_reconstruct
+and update_visualization from --concurrency client threads with a weighted
+request mix, and reports throughput, p50/p95/p99 latency and peak RSS (app
+plus model worker processes). Every model runs through stub_models/ with the
+given fake startup and compute cost, so no submodule, venv or GPU is needed.
+
+    python load_test.py --concurrency 8 --requests 200
+    python load_test.py --mix dark_ir=3,bw_to_color=1 --delay 0.02 --save-baseline
+    python load_test.py --compare benchmarks/load_test_baseline.json
+
+Results are compared against the stored baseline (if any): a scenario whose
+throughput drops, or whose p95 or the peak RSS grows, by more than
+--tolerance is reported as a regression and the exit status is 1.
+
+The 3D scenarios still need trimesh, matplotlib and vggt.visual_util for
+building scenes; they are skipped with a message when those are missing.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+
+BASELINE_PATH = os.path.join(ROOT_DIR, "benchmarks", "load_test_baseline.json")
+
+SCENARIOS = ("super_resolution", "super_resolution_tiled", "dark_ir", "bw_to_color", "pipeline", "reconstruct", "visualize")
+DEFAULT_MIX = "super_resolution=2,super_resolution_tiled=1,dark_ir=2,bw_to_color=2,pipeline=1,reconstruct=1,visualize=2"
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _child_pids():
+    pids = []
+    for task in os.listdir("/proc/self/task"):
+        try:
+            with open(f"/proc/self/task/{task}/children") as f:
+                pids.extend(int(pid) for pid in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class RssSampler:
+    """Samples the RSS of this process and its children (the model workers) in the background."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_app = 0
+        self.peak_total = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            app = _rss_bytes(os.getpid())
+            total = app + sum(_rss_bytes(pid) for pid in _child_pids())
+            self.peak_app = max(self.peak_app, app)
+            self.peak_total = max(self.peak_total, total)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.exists("/proc/self/status"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if not self.peak_app:
+            # No /proc (e.g. macOS): fall back to this process's max RSS
+            import resource
+
+            scale = 1 if sys.platform == "darwin" else 1024
+            self.peak_app = self.peak_total = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Scenarios:
+    """Request functions for each scenario. Each returns True on success."""
+
+    def __init__(self, args, work_dir):
+        from PIL import Image
+
+        self.args = args
+        self.work_dir = work_dir
+        self.Image = Image
+        self.images = []  # previously sent images, reused for --repeat-ratio
+        self.images_lock = threading.Lock()
+        self.reconstructions = queue.SimpleQueue()  # reconstructed target dirs not in use
+
+    def image(self, rng):
+        with self.images_lock:
+            if self.images and rng.random() < self.args.repeat_ratio:
+                return rng.choice(self.images)
+        width, height = self.args.image_size
+        image = self.Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+        with self.images_lock:
+            self.images.append(image)
+        return image
+
+    def super_resolution(self, rng):
+        from components import super_resolution
+
+        # The handlers stream progress; the last update has the result
+        _, info = list(super_resolution.resize_image(self.image(rng), "X-Restormer"))[-1]
+        return info.startswith("Used model")
+
+    def super_resolution_tiled(self, rng):
+        from components import super_resolution
+
+        _, info = list(super_resolution.resize_image(self.image(rng), "X-Restormer", tiled=True))[-1]
+        return info.startswith("Used model")
+
+    def dark_ir(self, rng):
+        from components import dark_ir
+
+        _, info = list(dark_ir.resize_image(self.image(rng), "DarkIR"))[-1]
+        return info.startswith("Used model")
+
+    def bw_to_color(self, rng):
+        from components import bw_to_color
+
+        _, info = list(bw_to_color.resize_image(self.image(rng).convert("L").convert("RGB"), "DeOldify"))[-1]
+        return info.startswith("Used model")
+
+    def pipeline(self, rng):
+        from components import pipeline_page
+
+        _, info = pipeline_page.run_pipeline(self.image(rng), ["DarkIR", "DeOldify", "X-Restormer"])
+        return info.startswith("Pipeline")
+
+    def _upload(self, rng):
+        from components import vggt_page
+
+        upload_dir = tempfile.mkdtemp(dir=self.work_dir)
+        paths = []
+        for i in range(self.args.frames):
+            path = os.path.join(upload_dir, f"frame_{i:03d}.png")
+            self.image(rng).save(path)
+            paths.append(path)
+        target_dir, _ = vggt_page.handle_uploads(paths)
+        return target_dir
+
+    def reconstruct(self, rng):
+        from components import vggt_page
+
+        target_dir = self._upload(rng)
+        outputs = list(vggt_page.gradio_reconstruct(target_dir, conf_thres=50.0))
+        glbfile, log_message = outputs[-1][:2]
+        return glbfile is not None and not log_message.startswith("Error")
+
+    def prepare_reconstruction(self, rng):
+        from components import vggt_page
+
+        target_dir = self._upload(rng)
+        list(vggt_page.gradio_reconstruct(target_dir, conf_thres=50.0, fast_preview=False))
+        self.reconstructions.put(target_dir)
+
+    def visualize(self, rng):
+        from components import vggt_page
+
+        # Each request takes a reconstruction of its own, so requests do not supersede each other
+        try:
+            target_dir = self.reconstructions.get_nowait()
+        except queue.Empty:
+            self.prepare_reconstruction(rng)
+            target_dir = self.reconstructions.get()
+        try:
+            outputs = list(vggt_page.update_visualization(
+                target_dir, round(rng.uniform(0, 90), 1), "All", False, False, True, False,
+                "Depthmap and Camera Branch", fast_preview=False,
+            ))
+        finally:
+            self.reconstructions.put(target_dir)
+        return outputs[-1][0] is not None
+
+
+def check_3d_dependencies():
+    """
+    Error message if a scene-building dependency is missing, else None.
+    components.vggt_page imports these lazily, so importing it proves nothing.
+    """
+    for module in ("trimesh", "matplotlib", "vggt.visual_util"):
+        try:
+            found = importlib.util.find_spec(module) is not None
+        except ImportError:  # parent package missing
+            found = False
+        if not found:
+            return f"No module named '{module}'"
+    return None
+
+
+def run_load(args, mix, scenarios):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    plan_rng = random.Random(args.seed)
+    plan = plan_rng.choices(names, weights, k=args.requests)
+
+    results = {name: {"latencies": [], "errors": 0} for name in names}
+    results_lock = threading.Lock()
+
+    def client(i):
+        name = plan[i]
+        rng = random.Random(args.seed * 1_000_003 + i)
+        start = time.perf_counter()
+        try:
+            ok = getattr(scenarios, name)(rng)
+        except Exception as e:
+            print(f"{name} request failed: {e}", file=sys.__stderr__)
+            ok = False
+        elapsed = time.perf_counter() - start
+        with results_lock:
+            if ok:
+                results[name]["latencies"].append(elapsed)
+            else:
+                results[name]["errors"] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(client, range(args.requests)))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed, sampler):
+    from metrics import percentile
+
+    summary = {"scenarios": {}}
+    all_latencies = []
+    for name, result in results.items():
+        latencies = result["latencies"]
+        all_latencies += latencies
+        summary["scenarios"][name] = {
+            "requests": len(latencies) + result["errors"],
+            "errors": result["errors"],
+            "throughput": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+        }
+    summary["total"] = {
+        "requests": sum(r["requests"] for r in summary["scenarios"].values()),
+        "errors": sum(r["errors"] for r in summary["scenarios"].values()),
+        "throughput": len(all_latencies) / elapsed,
+        "p50": percentile(all_latencies, 50),
+        "p95": percentile(all_latencies, 95),
+        "p99": percentile(all_latencies, 99),
+    }
+    summary["elapsed"] = elapsed
+    summary["peak_rss_app_mb"] = sampler.peak_app / 2**20
+    summary["peak_rss_total_mb"] = sampler.peak_total / 2**20
+    return summary
+
+
+def print_summary(summary, out):
+    print(f"{'scenario':<24}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}", file=out)
+    rows = list(summary["scenarios"].items()) + [("total", summary["total"])]
+    for name, row in rows:
+        print(
+            f"{name:<24}{row['requests']:>9}{row['errors']:>8}{row['throughput']:>9.2f}"
+            f"{row['p50'] * 1000:>9.0f}{row['p95'] * 1000:>9.0f}{row['p99'] * 1000:>9.0f}",
+            file=out,
+        )
+    print(
+        f"elapsed {summary['elapsed']:.1f}s, peak RSS {summary['peak_rss_app_mb']:.0f} MB app, "
+        f"{summary['peak_rss_total_mb']:.0f} MB including model workers",
+        file=out,
+    )
+
+
+def compare(summary, baseline, tolerance, out):
+    """Print changes against the baseline and return the list of regressions."""
+    if baseline.get("config") != summary.get("config"):
+        print("WARNING: baseline was recorded with a different configuration", file=out)
+    regressions = []
+    rows = list(summary["scenarios"].items()) + [("total", summary["total"])]
+    for name, row in rows:
+        base = baseline["scenarios"].get(name) if name != "total" else baseline.get("total")
+        if not base:
+            continue
+        throughput_change = row["throughput"] / base["throughput"] - 1 if base["throughput"] else 0.0
+        p95_change = row["p95"] / base["p95"] - 1 if base["p95"] else 0.0
+        flags = []
+        if throughput_change < -tolerance:
+            flags.append("throughput")
+        if p95_change > tolerance:
+            flags.append("p95")
+        print(
+            f"{name:<24} throughput {throughput_change:+7.1%}  p95 {p95_change:+7.1%}"
+            f"{'  REGRESSION: ' + ', '.join(flags) if flags else ''}",
+            file=out,
+        )
+        regressions += [f"{name} {flag}" for flag in flags]
+    rss_change = summary["peak_rss_total_mb"] / baseline["peak_rss_total_mb"] - 1 if baseline.get("peak_rss_total_mb") else 0.0
+    print(f"{'peak RSS':<24} {rss_change:+7.1%}{'  REGRESSION' if rss_change > tolerance else ''}", file=out)
+    if rss_change > tolerance:
+        regressions.append("peak RSS")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the app's handlers with stub models")
+    parser.add_argument("--requests", type=int, default=120, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted scenarios, e.g. dark_ir=3,visualize=1")
+    parser.add_argument("--image-size", type=int, nargs=2, default=(640, 480), metavar=("W", "H"))
+    parser.add_argument("--frames", type=int, default=4, help="Images per 3D reconstruction")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="Fraction of requests that resend an earlier image")
+    parser.add_argument("--startup-delay", type=float, default=0.5, help="Stub model load time (s)")
+    parser.add_argument("--delay", type=float, default=0.02, help="Stub compute time per image or frame (s)")
+    parser.add_argument("--batch-overhead", type=float, default=0.01, help="Stub fixed cost per model invocation (s)")
+    parser.add_argument("--no-warmup", action="store_true", help="Include model startup in the measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to the --compare path")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative change before flagging a regression")
+    parser.add_argument("--output", help="Also write the results as JSON to this path")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's own log output")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    stub_args = ["--startup-delay", str(args.startup_delay), "--delay", str(args.delay), "--batch-overhead", str(args.batch_overhead)]
+    # The app reads its configuration at import time, so set it up first.
+    os.environ.update(
+        STUB_MODELS="1",
+        STUB_VGGT_ARGS=f"--startup-delay {args.startup_delay} --delay {args.delay}",
+        CACHE_DIR=os.path.join(work_dir, "cache"),
+        METRICS_PORT="0",
+        VGGT_VISUALIZATION_DEBOUNCE="0",
+    )
+    os.chdir(work_dir)  # the 3D tab creates its upload folders in the working directory
+
+    out = sys.stdout
+    log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with log:
+            from components import bw_to_color, dark_ir, super_resolution
+
+            for module in (super_resolution, dark_ir, bw_to_color):
+                for project in module.projects:
+                    project["stub_args"] = stub_args
+
+            if {"reconstruct", "visualize"} & set(mix):
+                missing = check_3d_dependencies()
+                if missing:
+                    print(f"Skipping 3D scenarios: {missing}", file=out)
+                    mix = {name: weight for name, weight in mix.items() if name not in ("reconstruct", "visualize")}
+            if not mix:
+                raise SystemExit("Nothing to run")
+
+            scenarios = Scenarios(args, work_dir)
+            if not args.no_warmup:
+                # Start every model worker once so startup is not part of the measurement
+                warm_rng = random.Random(-1)
+                for name in mix:
+                    getattr(scenarios, name)(warm_rng)
+                if "visualize" in mix:
+                    for _ in range(args.concurrency - 1):
+                        scenarios.prepare_reconstruction(warm_rng)
+                scenarios.images.clear()
+
+            with RssSampler() as sampler:
+                results, elapsed = run_load(args, mix, scenarios)
+    finally:
+        from model_workers import stop_all
+
+        stop_all()
+        os.chdir(ROOT_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = summarize(results, elapsed, sampler)
+    summary["config"] = {
+        key: getattr(args, key)
+        for key in ("requests", "concurrency", "image_size", "frames", "repeat_ratio", "startup_delay", "delay", "batch_overhead")
+    }
+    summary["config"]["image_size"] = list(summary["config"]["image_size"])
+    summary["config"]["mix"] = mix
+    print_summary(summary, out)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.compare)), exist_ok=True)
+        with open(args.compare, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved baseline to {args.compare}", file=out)
+        return 0
+
+    if os.path.exists(args.compare):
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.compare} (tolerance {args.tolerance:.0%}):", file=out)
+        regressions = compare(summary, baseline, args.tolerance, out)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=out)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,27 @@
+import time
+
+start_time = time.perf_counter()
+
+import threading
+
 import gradio as gr
 
+from constants import PREWARM
 from components import vggt_page
 from components import super_resolution
 from components import dark_ir
 from components import bw_to_color
+from components import pipeline_page
+from components import video_page
+from job_api import start_job_api
+from metrics import report_startup, start_metrics_server
+from model_registry import MODELS
+from model_workers import worker_command
+from prewarm import prewarm
+
+# Heavy dependencies (model venvs, trimesh, vggt.visual_util) are loaded on first
+# use of each tab, so importing the components only pulls in the UI code.
+imports_done = time.perf_counter()
 
 with gr.Blocks() as demo:
     gr.Markdown("# Image Enhancement Model Comparison")
@@ -19,7 +37,33 @@ with gr.Blocks() as demo:
         with gr.Tab("B/W to Color"):
            bw_to_color.bw_to_color()
 
+        with gr.Tab("Pipeline"):
+           pipeline_page.pipeline_page()
+
+        with gr.Tab("Video"):
+           video_page.video_page()
+
         with gr.Tab("3D Reconstruction"):
             vggt_page.vggt_page()
 
-demo.queue(max_size=20).launch(show_error=True, share=True, max_threads=1)
\ No newline at end of file
+ui_built = time.perf_counter()
+
+start_metrics_server()
+start_job_api()
+
+# Per-model concurrency is enforced by the model worker pools (see the
+# "concurrency" key of each project), so Gradio itself does not serialize events.
+demo.queue(max_size=20, default_concurrency_limit=None).launch(show_error=True, share=True, prevent_thread_lock=True)
+
+report_startup({
+    "imports": imports_done - start_time,
+    "ui": ui_built - imports_done,
+    "launch": time.perf_counter() - ui_built,
+})
+
+if PREWARM:
+    # Only models whose worker script is installed (or the stubs) can be prewarmed
+    projects = [project for project in MODELS.values() if worker_command(project) is not None]
+    threading.Thread(target=prewarm, args=(projects,), daemon=True, name="prewarm").start()
+
+demo.block_thread()
@@ -0,0 +1,305 @@
+"""
+Per-stage latency spans and Prometheus-style metrics.
+
+    with request_trace("Dark IR", model="DarkIR"):
+        with span("resize"):
+            ...
+
+Every span is observed in the `stage_seconds{stage=...,model=...}` histogram.
+Spans opened inside a request_trace are also collected into a per-request
+breakdown that is printed when the request finishes (spans run on other
+threads, e.g. in the micro-batcher, only show up in the histograms).
+
+start_metrics_server() serves all metrics in the Prometheus text format on
+http://127.0.0.1:<METRICS_PORT>/metrics.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import METRICS_PORT
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def percentile(values, q, presorted=False):
+    """
+    q-th percentile of values with linear interpolation between the closest
+    ranks, as np.percentile computes it; 0.0 for no values.
+    """
+    if len(values) == 0:
+        return 0.0
+    if not presorted:
+        values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (suffix, label string, value) tuples."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield "", _format_labels(self.labelnames, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {value:.6g}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A gauge set directly, or read from `function()` (a number or {label tuple: number}) at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self):
+        if self.function is None:
+            yield from super().samples()
+            return
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield "", _format_labels(self.labelnames, key), value
+
+
+class CallbackCounter(Gauge):
+    """A counter whose cumulative value is owned elsewhere (e.g. cache statistics)."""
+
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        for key, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield "_bucket", _format_labels(self.labelnames, key, [("le", f"{bound:g}")]), bucket_count
+            yield "_bucket", _format_labels(self.labelnames, key, [("le", "+Inf")]), count
+            yield "_count", _format_labels(self.labelnames, key), count
+            yield "_sum", _format_labels(self.labelnames, key), total
+
+
+stage_seconds = Histogram("stage_seconds", "Time spent in one processing stage.", ["stage", "model"])
+request_seconds = Histogram("request_seconds", "End-to-end time of one UI request.", ["tab", "model"])
+requests_total = Counter("requests_total", "UI requests by outcome.", ["tab", "model", "outcome"])
+in_flight_jobs = Gauge("in_flight_jobs", "Jobs currently running in a model worker or script.", ["model"])
+queue_depth = Gauge("worker_queue_depth", "Jobs waiting for a free model worker.", ["model"])
+startup_seconds = Gauge("startup_seconds", "Time spent in each app startup phase.", ["phase"])
+first_request_seconds = Gauge("first_request_seconds", "Latency of the first request to each tab.", ["tab"])
+
+_first_requests = set()
+_first_requests_lock = threading.Lock()
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Per-request list of (stage, seconds) spans, printed and observed by finish()."""
+
+    def __init__(self, tab, model=""):
+        self.tab = tab
+        self.model = model
+        self.spans = []
+        self.start = time.perf_counter()
+        self.finished = False
+
+    def record(self, stage, seconds):
+        self.spans.append((stage, seconds))
+
+    @contextmanager
+    def activate(self):
+        """Collect spans opened in this block (and the calls it makes) into this trace."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, outcome="ok"):
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.start
+        request_seconds.observe(total, tab=self.tab, model=self.model)
+        requests_total.inc(tab=self.tab, model=self.model, outcome=outcome)
+        with _first_requests_lock:
+            first = self.tab not in _first_requests
+            _first_requests.add(self.tab)
+        if first:
+            first_request_seconds.set(total, tab=self.tab)
+            print(f"First request to {self.tab}: {total:.3f}s")
+        breakdown = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in self.spans)
+        model = f" [{self.model}]" if self.model else ""
+        print(f"TRACE {self.tab}{model}: {outcome} in {total:.3f}s ({breakdown or 'no spans'})")
+
+
+def observe(stage, seconds, model="", trace=None):
+    """Record a duration measured elsewhere (e.g. reported by a worker)."""
+    stage_seconds.observe(seconds, stage=stage, model=model)
+    trace = trace or _current_trace.get()
+    if trace is not None:
+        trace.record(stage, seconds)
+
+
+@contextmanager
+def span(stage, model="", trace=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, model, trace)
+
+
+@contextmanager
+def request_trace(tab, model=""):
+    """
+    Time one UI request and print its per-stage breakdown when it ends.
+    Generator handlers, whose steps may run in different contexts, should
+    create a Trace and use trace.activate() around each step instead.
+    """
+    trace = Trace(tab, model)
+    outcome = "error"
+    try:
+        with trace.activate():
+            yield trace
+        outcome = "ok"
+    finally:
+        trace.finish(outcome)
+
+
+def report_startup(phases):
+    """Record and print {phase: seconds} for app startup."""
+    for phase, seconds in phases.items():
+        startup_seconds.set(seconds, phase=phase)
+    print("Startup: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items())
+          + f" (total {sum(phases.values()):.2f}s)")
+
+
+def render():
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread. Returns the server, or None if disabled."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    try:
+        _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"WARNING: metrics endpoint not started on port {port}: {e}")
+        return None
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    print(f"Metrics available at http://{host}:{port}/metrics")
+    return _server
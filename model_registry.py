@@ -0,0 +1,106 @@
+"""
+Every model the app can run, in one place.
+
+Each entry is the project dict the worker pools, batchers and one-shot
+fallback read (venv, script, worker, args, cwd, concurrency, batching keys),
+plus:
+
+- "worker": where the model's warm worker script is expected; the
+  submodules do not ship one yet, and without it the one-shot "script" runs
+  per request (model_workers.worker_command);
+- "tab": the UI tab (component module) that offers the model;
+- "bound": for image models, the size inputs are resized to fit in;
+- "max_bound": the largest bound a latency target may raise it to (latency_model.py);
+- "memory": estimated host memory of one job, used by admission.py:
+  job_mb + mb_per_megapixel * input megapixels + mb_per_frame * frames.
+  The figures are rough and meant to be tuned for the deployment; the
+  resident weights of warm workers are not included.
+"""
+from constants import BASE_DIR
+
+MODELS = {
+    "X-Restormer": {
+        "venv": BASE_DIR / "X-Restormer/venv/bin/python",
+        "script": BASE_DIR / "X-Restormer/xrestormer/test.py",
+        "worker": BASE_DIR / "X-Restormer/worker.py",
+        "args": ["-opt", "options/test/001_xrestormer_sr.yml"],
+        "cwd": BASE_DIR / "X-Restormer",
+        "model": "X-Restormer",
+        "tab": "super_resolution",
+        "bound": 256,
+        "max_bound": 1024,
+        "concurrency": 2,
+        "batch_window_ms": 20,
+        "max_batch_size": 4,
+        "tile_size": 256,
+        "tile_overlap": 16,
+        "max_tiles_in_flight": 4,
+        # x4 upscaling transformer: activations grow quickly with input size
+        "memory": {"job_mb": 300, "mb_per_megapixel": 4000},
+    },
+    "DarkIR": {
+        "venv": BASE_DIR / "DarkIR/venv_DarkIR/bin/python",
+        "script": BASE_DIR / "DarkIR/inference.py",
+        "worker": BASE_DIR / "DarkIR/worker.py",
+        "args": ["-i", "{input_dir}", "-o", "{output_dir}"],
+        "cwd": BASE_DIR / "DarkIR",  # important: run inside the project folder
+        "model": "DarkIR",
+        "tab": "dark_ir",
+        "bound": 256,
+        "max_bound": 2048,
+        "concurrency": 2,
+        "batch_window_ms": 20,
+        "max_batch_size": 8,
+        "memory": {"job_mb": 200, "mb_per_megapixel": 2000},
+    },
+    "DeOldify": {
+        "venv": BASE_DIR / "DeOldify/venv_DeOldify/bin/python",
+        "script": BASE_DIR / "DeOldify/run.py",
+        "worker": BASE_DIR / "DeOldify/worker.py",
+        "args": [],
+        "cwd": BASE_DIR / "DeOldify",
+        "model": "DeOldify",
+        "tab": "bw_to_color",
+        "bound": 1920,
+        "max_bound": 1920,
+        "concurrency": 1,
+        "batch_window_ms": 0,
+        "max_batch_size": 1,
+        "transport": "shm",
+        # Runs at up to 1920px, so a single job is several megapixels
+        "memory": {"job_mb": 500, "mb_per_megapixel": 1000},
+    },
+    "VGGT": {
+        "venv": BASE_DIR / "vggt/venv/bin/python3",
+        "script": BASE_DIR / "vggt/run.py",
+        "cwd": BASE_DIR / "vggt",
+        "model": "VGGT",
+        "tab": "vggt_page",
+        "concurrency": 1,
+        "memory": {"job_mb": 2000, "mb_per_frame": 350},
+    },
+}
+
+
+def get_project(model):
+    return MODELS.get(model)
+
+
+def projects_for_tab(tab):
+    """Project dicts offered by one UI tab, in registry order."""
+    return [project for project in MODELS.values() if project["tab"] == tab]
+
+
+def image_models():
+    """Names of the models that take a single image (those with a resize bound)."""
+    return [model for model, project in MODELS.items() if "bound" in project]
+
+
+def estimate_memory_mb(project, pixels=0, frames=0):
+    """Estimated host memory in MB of one job over `pixels` input pixels or `frames` frames."""
+    memory = project.get("memory", {})
+    return (
+        memory.get("job_mb", 0)
+        + memory.get("mb_per_megapixel", 0) * pixels / 1e6
+        + memory.get("mb_per_frame", 0) * frames
+    )
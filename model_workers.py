@@ -0,0 +1,388 @@
+"""
+Long-lived model worker processes.
+
+Starting a model venv, importing torch and loading a checkpoint costs far more
+than a single inference, so each model gets a pool of worker processes that
+are started on first use and kept warm. Jobs are sent over the worker's stdin/stdout using
+worker_protocol. A worker that crashes is restarted and the job retried once.
+
+Projects without a "worker" script (or whose script is missing on disk) fall
+back to running their one-shot script with subprocess.run. Scripts whose args
+contain {input_dir}/{output_dir} are pointed at the request's workspace; the
+others are staged through the shared input_128/output_images folders.
+"""
+import atexit
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from admission import image_pixels, memory_scheduler
+from constants import SHM_TRANSPORT, STUB_MODELS, STUB_WORKER, BASE_DIR, WORKER_JOB_TIMEOUT, WORKER_STARTUP_TIMEOUT
+from metrics import in_flight_jobs, observe, queue_depth, span
+from model_registry import estimate_memory_mb
+from remote_workers import remote_pool
+from shared_buffers import read_array, release, write_array
+from worker_protocol import list_images, output_path
+from workspaces import LEGACY_INPUT_DIR, LEGACY_OUTPUT_DIR
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class UnsupportedTransport(WorkerError):
+    pass
+
+
+def worker_command(project):
+    """
+    Return (cmd, cwd) for the project's worker, or None if it has no worker.
+    """
+    if STUB_MODELS:
+        return [sys.executable, str(STUB_WORKER), "--model", project["model"], *project.get("stub_args", [])], BASE_DIR
+
+    worker_script = project.get("worker")
+    if worker_script is None or not os.path.exists(worker_script):
+        return None
+    return [str(project["venv"]), str(worker_script), *project.get("worker_args", [])], project["cwd"]
+
+
+class ModelWorker:
+    """
+    One warm worker process for a single model.
+    Jobs are serialized; use several ModelWorkers for parallelism.
+    """
+
+    def __init__(self, project, max_restarts=1):
+        self.project = project
+        self.model = project["model"]
+        self.max_restarts = max_restarts
+        self.process = None
+        self.replies = None
+        self.load_time = None
+        self.restarts = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _read_replies(self, process, replies):
+        for line in process.stdout:
+            line = line.strip()
+            if line:
+                replies.put(json.loads(line))
+        replies.put(None)  # EOF: the worker exited
+
+    def _wait_reply(self, timeout):
+        try:
+            reply = self.replies.get(timeout=timeout)
+        except queue.Empty:
+            self.stop()
+            raise WorkerError(f"{self.model} worker did not answer within {timeout:.0f}s")
+        if reply is None:
+            returncode = self.process.wait()
+            self.process = None
+            raise WorkerError(f"{self.model} worker exited with code {returncode}")
+        return reply
+
+    def start(self):
+        cmd, cwd = worker_command(self.project)
+        print(f"Starting {self.model} worker: {' '.join(cmd)}")
+        start_time = time.perf_counter()
+        self.process = subprocess.Popen(
+            cmd,
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self.replies = queue.Queue()
+        threading.Thread(
+            target=self._read_replies, args=(self.process, self.replies), daemon=True
+        ).start()
+
+        ready = self._wait_reply(WORKER_STARTUP_TIMEOUT)
+        if not ready.get("ready"):
+            self.stop()
+            raise WorkerError(f"{self.model} worker sent {ready} instead of a ready message")
+        self.load_time = ready.get("load_time")
+        observe("spawn", time.perf_counter() - start_time - self.load_time, self.model)
+        observe("model_load", self.load_time, self.model)
+        print(f"{self.model} worker ready (pid {ready.get('pid')}, load {self.load_time:.2f}s)")
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _send(self, job):
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+
+    def run(self, job, timeout=WORKER_JOB_TIMEOUT):
+        """
+        Send one job and return the worker's reply. Restarts a dead worker
+        and retries up to max_restarts times.
+        """
+        with self._lock:
+            attempts = 0
+            while True:
+                try:
+                    if not self.is_alive():
+                        self.start()
+                    job_id = next(self._ids)
+                    self._send({**job, "id": job_id, "model": self.model})
+                    reply = self._wait_reply(timeout)
+                    break
+                except (WorkerError, BrokenPipeError, OSError) as e:
+                    attempts += 1
+                    if attempts > self.max_restarts:
+                        raise WorkerError(f"{self.model} worker failed: {e}") from e
+                    print(f"WARNING: {e}; restarting {self.model} worker")
+                    self.restarts += 1
+                    self.stop()
+
+        if "infer_time" in reply:
+            observe("inference", reply["infer_time"], self.model)
+        if reply.get("unsupported"):
+            raise UnsupportedTransport(f"{self.model} worker: {reply.get('error')}")
+        if not reply.get("ok"):
+            raise WorkerError(f"{self.model} failed: {reply.get('error')}")
+        return reply
+
+    def stop(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        try:
+            if process.poll() is None:
+                process.stdin.write(json.dumps({"cmd": "shutdown"}) + "\n")
+                process.stdin.flush()
+                process.stdin.close()
+                process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+class WorkerPool:
+    """
+    Up to project["concurrency"] warm workers for one model. Workers are
+    started lazily, so a pool that never sees concurrent requests only ever
+    runs a single process.
+    """
+
+    def __init__(self, project):
+        self.model = project["model"]
+        self.size = max(1, project.get("concurrency", 1))
+        # LIFO: reuse the most recently used (already warm) worker first.
+        self.idle = queue.LifoQueue()
+        for _ in range(self.size):
+            self.idle.put(ModelWorker(project))
+        self.workers = list(self.idle.queue)
+
+    def prewarm(self):
+        """Start one worker ahead of the first job. Returns False if one was already running."""
+        worker = self.idle.get()
+        try:
+            with worker._lock:
+                if worker.is_alive():
+                    return False
+                worker.start()
+                return True
+        finally:
+            self.idle.put(worker)
+
+    def run(self, job):
+        with queue_depth.track(model=self.model):
+            worker = self.idle.get()
+        try:
+            with in_flight_jobs.track(model=self.model):
+                return worker.run(job)
+        finally:
+            self.idle.put(worker)
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+_pools = {}
+_oneshot_limits = {}
+_pools_lock = threading.Lock()
+_legacy_dir_lock = threading.Lock()
+
+
+def get_pool(project):
+    with _pools_lock:
+        pool = _pools.get(project["model"])
+        if pool is None:
+            pool = WorkerPool(project)
+            _pools[project["model"]] = pool
+        return pool
+
+
+def _oneshot_limit(project):
+    with _pools_lock:
+        limit = _oneshot_limits.get(project["model"])
+        if limit is None:
+            limit = threading.Semaphore(max(1, project.get("concurrency", 1)))
+            _oneshot_limits[project["model"]] = limit
+        return limit
+
+
+def stop_all():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.stop()
+        _pools.clear()
+
+
+atexit.register(stop_all)
+
+
+def _run_oneshot(project, input_dir, output_dir):
+    args = project["args"]
+    if any("{input_dir}" in arg for arg in args):
+        args = [arg.format(input_dir=input_dir, output_dir=output_dir) for arg in args]
+        limit = _oneshot_limit(project)
+        with queue_depth.track(model=project["model"]):
+            limit.acquire()
+        try:
+            start_time = time.perf_counter()
+            with in_flight_jobs.track(model=project["model"]), span("subprocess", project["model"]):
+                subprocess.run(
+                    [str(project["venv"]), str(project["script"]), *args],
+                    cwd=project["cwd"],
+                    check=True,
+                )
+            return time.perf_counter() - start_time
+        finally:
+            limit.release()
+
+    # The script only knows the shared input_128/output_images folders, one
+    # run at a time. A job for input_128 itself runs the script in place.
+    model = project["model"]
+    names = list_images(input_dir)
+    in_place = os.path.realpath(input_dir) == os.path.realpath(LEGACY_INPUT_DIR)
+    # Files already in input_128/output_images belong to the user: stage the
+    # job under names of its own so they are never read, overwritten or deleted
+    prefix = "" if in_place else f"job{uuid.uuid4().hex[:12]}_"
+    with _legacy_dir_lock:
+        LEGACY_INPUT_DIR.mkdir(exist_ok=True)
+        LEGACY_OUTPUT_DIR.mkdir(exist_ok=True)
+        staged = []
+        try:
+            if not in_place:
+                for name in names:
+                    shutil.copyfile(os.path.join(input_dir, name), LEGACY_INPUT_DIR / (prefix + name))
+                    staged.append(prefix + name)
+            start_time = time.perf_counter()
+            with in_flight_jobs.track(model=model), span("subprocess", model):
+                subprocess.run(
+                    [str(project["venv"]), str(project["script"]), *args],
+                    cwd=project["cwd"],
+                    check=True,
+                )
+            elapsed = time.perf_counter() - start_time
+            for name in names:
+                result = output_path(LEGACY_OUTPUT_DIR, prefix + name, model)
+                target = output_path(output_dir, name, model)
+                if os.path.realpath(result) != os.path.realpath(target):
+                    shutil.move(result, target)
+            return elapsed
+        finally:
+            for name in staged:
+                (LEGACY_INPUT_DIR / name).unlink(missing_ok=True)
+                if os.path.exists(output_path(LEGACY_OUTPUT_DIR, name, model)):
+                    os.unlink(output_path(LEGACY_OUTPUT_DIR, name, model))
+
+
+def runs_in_legacy_dirs(project):
+    """
+    True if the project runs only as a one-shot script over the shared
+    input_128 folder, so every run processes the whole folder.
+    """
+    if remote_pool(project) is not None or worker_command(project) is not None:
+        return False
+    return not any("{input_dir}" in arg for arg in project["args"])
+
+
+def run_model(project, input_dir, output_dir):
+    """
+    Run the project's model over every image in input_dir, writing
+    <stem>_<model>.png files to output_dir. At most project["concurrency"]
+    jobs per model run at the same time, and every job first reserves its
+    estimated memory from the shared budget (see admission.py). With
+    REMOTE_WORKERS set, jobs go to a worker host that has the model instead
+    (see remote_workers.py). The returned reply's "infer_time" is the
+    model's execution time, without the wait for memory or a worker.
+    """
+    remote = remote_pool(project)
+    if remote is not None:
+        # Memory is admitted on the host that runs the job
+        return remote.run({"input_dir": str(input_dir), "output_dir": str(output_dir)})
+
+    # Unreadable inputs are estimated at the model's default input size
+    pixels = image_pixels(
+        (os.path.join(input_dir, name) for name in list_images(input_dir)), default=project.get("bound", 0) ** 2
+    )
+    with memory_scheduler.admit(project["model"], estimate_memory_mb(project, pixels=pixels)):
+        if worker_command(project) is not None:
+            return get_pool(project).run({"input_dir": str(input_dir), "output_dir": str(output_dir)})
+
+        return {"ok": True, "infer_time": _run_oneshot(project, input_dir, output_dir)}
+
+
+_shm_unsupported = set()
+
+
+def supports_shm(project):
+    """
+    Whether images for this project can go through shared memory: the project
+    asks for it, runs in a worker, and the worker has not refused it before.
+    """
+    return (
+        SHM_TRANSPORT
+        and project.get("transport") == "shm"
+        and project["model"] not in _shm_unsupported
+        and worker_command(project) is not None
+        and remote_pool(project) is None
+    )
+
+
+def run_model_arrays(project, arrays, timings=None):
+    """
+    Run the model on {name: HxWxC uint8 array} through shared-memory buffers and
+    return the output arrays under the same names, or None if the worker does
+    not support the shm transport (the caller then uses run_model with files).
+    If `timings` is a dict, its "infer_time" is set to the worker's reported
+    execution time.
+    """
+    model = project["model"]
+    with span("encode", model):
+        inputs = {name: write_array(array) for name, array in arrays.items()}
+    pixels = sum(array.shape[0] * array.shape[1] for array in arrays.values())
+    try:
+        with memory_scheduler.admit(model, estimate_memory_mb(project, pixels=pixels)):
+            reply = get_pool(project).run({"transport": "shm", "inputs": inputs})
+    except UnsupportedTransport as e:
+        print(f"WARNING: {e}; falling back to PNG files")
+        _shm_unsupported.add(model)
+        return None
+    finally:
+        for descriptor in inputs.values():
+            release(descriptor)
+
+    if timings is not None:
+        timings["infer_time"] = reply.get("infer_time")
+    outputs = {}
+    with span("decode", model):
+        for name, descriptor in reply["outputs"].items():
+            outputs[name] = read_array(descriptor)
+            release(descriptor)  # the mapping outlives the unlinked file
+    return outputs
@@ -0,0 +1,170 @@
+"""
+Chained restoration pipelines: an ordered list of image models run as one job,
+e.g. DarkIR -> DeOldify -> X-Restormer.
+
+Each stage hands its output to the next as a decoded image in memory. Stages
+ask their worker for the shared-memory transport (see model_workers.py) and
+only fall back to the worker's PNG files when it does not support it.
+Intermediate outputs are not written to the result cache; only the final
+output is cached, under a key for the whole chain. The input is resized to the
+first stage's bound like the single-model tabs do; later stages only shrink
+an image that exceeds their bound and never upscale it.
+
+A stage holds its model's worker slot only while it runs, so while one request
+is in its last stage the next request's first stage can already run. For a
+stream of images, Pipeline.map runs one thread per stage connected by bounded
+queues, so every model stays busy at once.
+"""
+import threading
+import time
+from queue import Empty, Full, Queue
+
+from PIL import ImageOps
+
+from components.image_model import process_image
+from metrics import observe
+from model_registry import get_project
+from result_cache import result_cache
+
+# Images waiting between two stages in Pipeline.map
+PIPELINE_QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+class PipelineJob:
+    def __init__(self, image):
+        self.input_image = image
+        self.output_image = None
+        self.timings = []  # (model, input size, output size, seconds) per stage
+        self.cached = False
+        self.error = None
+        self.key = None
+
+    def report(self, name):
+        if self.cached:
+            return f"Pipeline: {name} (cached)"
+        lines = [f"Pipeline: {name} in {sum(t[3] for t in self.timings):.2f}s"]
+        for i, (model, in_size, out_size, seconds) in enumerate(self.timings, 1):
+            lines.append(f"{i}. {model}: {in_size[0]}x{in_size[1]} -> {out_size[0]}x{out_size[1]} in {seconds:.2f}s")
+        return "\n".join(lines)
+
+
+class Pipeline:
+    def __init__(self, models, cache=True):
+        if not models:
+            raise ValueError("A pipeline needs at least one model")
+        self.projects = []
+        for model in models:
+            project = get_project(model)
+            if project is None or "bound" not in project:
+                raise ValueError(f"Not an image model: {model}")
+            self.projects.append(project)
+        self.models = list(models)
+        self.name = " -> ".join(self.models)
+        self.cache = cache
+
+    def _cache_key(self, image):
+        return result_cache.key(image, "pipeline:" + "+".join(self.models), self.projects[0]["bound"])
+
+    def start(self, image):
+        """Resize the input for the first stage and look the whole chain up in the cache (if enabled)."""
+        bound = self.projects[0]["bound"]
+        job = PipelineJob(ImageOps.contain(image, (bound, bound)))
+        if not self.cache:
+            job.output_image = job.input_image
+            return job
+        job.key = self._cache_key(job.input_image)
+        cached = result_cache.get(job.key)
+        job.cached = cached is not None
+        job.output_image = cached if job.cached else job.input_image
+        return job
+
+    def run_stage(self, index, job):
+        """Run stage `index` on the job's current image, in memory."""
+        project = self.projects[index]
+        image = job.output_image
+        bound = min(project["bound"], max(image.size))
+        start_time = time.perf_counter()
+        # Ask for shared memory even for file-based models; workers that refuse fall back to PNG files
+        _, output_image, _ = process_image(dict(project, transport="shm"), image, bound, cache=False)
+        seconds = time.perf_counter() - start_time
+        observe("pipeline_stage", seconds, project["model"])
+        job.timings.append((project["model"], image.size, output_image.size, seconds))
+        job.output_image = output_image
+
+    def finish(self, job):
+        if self.cache and not job.cached and job.error is None:
+            result_cache.put(job.key, job.output_image)
+        return job
+
+    def run(self, image):
+        """Run every stage on one image in the calling thread and return the finished PipelineJob."""
+        job = self.start(image)
+        if not job.cached:
+            for index in range(len(self.projects)):
+                self.run_stage(index, job)
+        return self.finish(job)
+
+    def map(self, images, queue_size=PIPELINE_QUEUE_SIZE):
+        """
+        Yield a finished PipelineJob per input image, in order, with the stages
+        running concurrently on consecutive images. A failed image yields a job
+        with .error set; the remaining images still run.
+        """
+        stop = threading.Event()
+        queues = [Queue(queue_size) for _ in range(len(self.projects) + 1)]
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except Full:
+                    pass
+
+        def feed():
+            try:
+                for image in images:
+                    job = PipelineJob(image)
+                    try:
+                        job = self.start(image)
+                    except Exception as e:
+                        job.error = e
+                    put(queues[0], job)
+            except Exception as e:
+                put(queues[0], e)  # the input iterator itself failed
+            put(queues[0], _DONE)
+
+        def stage(index):
+            while not stop.is_set():
+                try:
+                    job = queues[index].get(timeout=0.1)
+                except Empty:
+                    continue
+                if isinstance(job, PipelineJob) and not job.cached and job.error is None:
+                    try:
+                        self.run_stage(index, job)
+                    except Exception as e:
+                        job.error = e
+                put(queues[index + 1], job)
+                if job is _DONE:
+                    return
+
+        threads = [threading.Thread(target=feed, daemon=True, name="pipeline-feed")]
+        threads += [
+            threading.Thread(target=stage, args=(i,), daemon=True, name=f"pipeline-{model}")
+            for i, model in enumerate(self.models)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                job = queues[-1].get()
+                if job is _DONE:
+                    return
+                if isinstance(job, Exception):
+                    raise job
+                yield self.finish(job)
+        finally:
+            stop.set()
@@ -0,0 +1,51 @@
+"""
+Background prewarm after launch.
+
+Starts one worker for every model that has a worker script and imports the
+3D scene dependencies, in parallel, so the first request to each tab does not
+pay for process startup, checkpoint loading or slow imports. Enabled with
+PREWARM=1; failures are logged and the tab falls back to starting on demand.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import observe
+from model_workers import get_pool, worker_command
+
+
+def _prewarm_model(project):
+    model = project["model"]
+    if worker_command(project) is None:
+        return
+    start_time = time.perf_counter()
+    try:
+        started = get_pool(project).prewarm()
+    except Exception as e:
+        print(f"WARNING: prewarming {model} failed: {e}")
+        return
+    if started:
+        observe("prewarm", time.perf_counter() - start_time, model)
+        print(f"Prewarmed {model} worker in {time.perf_counter() - start_time:.2f}s")
+
+
+def _prewarm_3d():
+    from components.vggt_index import import_scene_dependencies
+
+    start_time = time.perf_counter()
+    try:
+        import_scene_dependencies()
+    except ImportError as e:
+        print(f"WARNING: prewarming the 3D tab failed: {e}")
+        return
+    observe("prewarm", time.perf_counter() - start_time, "VGGT")
+    print(f"Imported 3D scene dependencies in {time.perf_counter() - start_time:.2f}s")
+
+
+def prewarm(projects):
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max(1, len(projects) + 1), thread_name_prefix="prewarm") as pool:
+        futures = [pool.submit(_prewarm_model, project) for project in projects]
+        futures.append(pool.submit(_prewarm_3d))
+        for future in futures:
+            future.result()
+    print(f"Prewarm finished in {time.perf_counter() - start_time:.2f}s")
@@ -0,0 +1,215 @@
+"""
+Dispatch model jobs to worker hosts over HTTP (see worker_host.py).
+
+Set REMOTE_WORKERS to a comma-separated list of host:port. Every host
+advertises the models it has installed, with their concurrency, on GET /health;
+hosts are checked every REMOTE_HEALTH_INTERVAL seconds. A job for a model that
+some healthy host advertises goes to the least loaded one (fewest jobs in
+flight from this app per unit of concurrency) instead of a local worker. If a
+host cannot be reached or fails mid-job it is marked down until its next good
+health check and the job is retried on another host, up to REMOTE_RETRIES
+times. Models no healthy host advertises keep running locally.
+
+RPC:
+    GET  /health -> {"host", "pid", "models": {model: {"capacity", "in_flight"}}}
+    POST /run    {"model": "DarkIR", "images": {name: base64}}
+                 -> {"ok": true, "outputs": {name: base64}, "infer_time": s}
+                 or {"ok": false, "error": "..."}
+Images are sent as the files of the job's input_dir and come back as the
+worker's output PNGs, so nothing is decoded on either side of the wire.
+"""
+import base64
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from constants import REMOTE_WORKERS, WORKER_JOB_TIMEOUT
+from metrics import Counter, Gauge, in_flight_jobs, observe
+from worker_protocol import list_images, output_path
+
+REMOTE_HEALTH_INTERVAL = float(os.environ.get("REMOTE_HEALTH_INTERVAL", "5"))
+REMOTE_HEALTH_TIMEOUT = float(os.environ.get("REMOTE_HEALTH_TIMEOUT", "2"))
+REMOTE_RETRIES = int(os.environ.get("REMOTE_RETRIES", "2"))
+
+remote_retries = Counter("remote_retries_total", "Remote jobs retried on another host after a host failure.", ["model"])
+
+
+class RemoteWorkerError(RuntimeError):
+    pass
+
+
+class RemoteHost:
+    def __init__(self, address):
+        self.address = address
+        self.url = address if address.startswith("http") else f"http://{address}"
+        self.healthy = False
+        self.models = {}  # model -> advertised concurrency
+        self.in_flight = 0
+        self.last_error = None
+
+    def check(self):
+        try:
+            with urllib.request.urlopen(f"{self.url}/health", timeout=REMOTE_HEALTH_TIMEOUT) as response:
+                health = json.load(response)
+            models = {model: max(1, int(info.get("capacity", 1))) for model, info in health["models"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.mark_down(f"bad health check: {e!r}")
+            return
+        self.models = models
+        if not self.healthy:
+            print(f"Remote worker host {self.address} is up with {', '.join(self.models) or 'no models'}")
+        self.healthy = True
+
+    def mark_down(self, error):
+        if self.healthy:
+            print(f"WARNING: remote worker host {self.address} is down: {error}")
+        self.healthy = False
+        self.last_error = str(error)
+
+    def load(self, model):
+        return self.in_flight / self.models[model]
+
+    def run(self, model, images, timeout):
+        """POST one job; returns (outputs, infer_time). Raises OSError if the host failed."""
+        body = json.dumps({
+            "model": model,
+            "images": {name: base64.b64encode(data).decode() for name, data in images.items()},
+        }).encode()
+        request = urllib.request.Request(
+            f"{self.url}/run", data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    reply = json.load(response)
+            except urllib.error.HTTPError as e:
+                if e.code not in (404, 500):
+                    raise  # 502-504 and the like: the host itself is in trouble
+                reply = json.load(e)
+                if e.code == 404:
+                    raise ConnectionError(f"model no longer installed: {reply.get('error')}")
+            if not reply.get("ok"):
+                raise RemoteWorkerError(f"{model} failed on {self.address}: {reply.get('error')}")
+            outputs = {name: base64.b64decode(data) for name, data in reply["outputs"].items()}
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            # Not a worker host reply (e.g. a proxy error page): treat it as a host failure
+            raise ConnectionError(f"bad reply from {self.address}: {e!r}") from e
+        return outputs, reply.get("infer_time")
+
+
+class RemotePool:
+    """Sends one model's jobs to the least loaded healthy host that has it."""
+
+    def __init__(self, model, workers):
+        self.model = model
+        self.workers = workers
+
+    def run(self, job, timeout=WORKER_JOB_TIMEOUT):
+        if job.get("transport") == "shm":
+            raise RemoteWorkerError("shared-memory jobs cannot run on a remote host")
+        input_dir, output_dir = job["input_dir"], job["output_dir"]
+        images = {}
+        for name in list_images(input_dir):
+            with open(os.path.join(input_dir, name), "rb") as f:
+                images[name] = f.read()
+
+        tried = set()
+        while True:
+            host = self.workers.choose(self.model, exclude=tried)
+            if host is None:
+                raise RemoteWorkerError(
+                    f"no remote host could run {self.model}"
+                    + (f" (tried {', '.join(h.address for h in tried)})" if tried else "")
+                )
+            with self.workers.lock:
+                host.in_flight += 1
+            start_time = time.perf_counter()
+            try:
+                with in_flight_jobs.track(model=self.model):
+                    outputs, infer_time = host.run(self.model, images, timeout)
+                break
+            except OSError as e:  # connection refused or reset, timeout, 502-504
+                host.mark_down(e)
+                tried.add(host)
+                if len(tried) > REMOTE_RETRIES:
+                    raise RemoteWorkerError(f"{self.model} failed on {len(tried)} remote hosts; last error: {e}") from e
+                remote_retries.inc(model=self.model)
+                print(f"WARNING: {self.model} job failed on {host.address} ({e}); retrying on another host")
+            finally:
+                with self.workers.lock:
+                    host.in_flight -= 1
+                observe("remote_rpc", time.perf_counter() - start_time, self.model)
+
+        if infer_time is not None:
+            observe("inference", infer_time, self.model)
+        for name, data in outputs.items():
+            with open(output_path(output_dir, name, self.model), "wb") as f:
+                f.write(data)
+        return {"ok": True, "host": host.address, "infer_time": infer_time}
+
+
+class RemoteWorkers:
+    def __init__(self, addresses):
+        self.hosts = [RemoteHost(address) for address in addresses]
+        self.lock = threading.Lock()
+        self._started = False
+        self._checked = threading.Event()
+        self._pools = {}
+
+    def _start(self):
+        with self.lock:
+            first = not self._started
+            self._started = True
+        if not first:
+            self._checked.wait()
+            return
+        # The first lookups wait for one round of checks so the first jobs are routed correctly
+        self.check_all()
+        self._checked.set()
+        threading.Thread(target=self._health_loop, daemon=True, name="remote-health").start()
+
+    def check_all(self):
+        threads = [threading.Thread(target=host.check) for host in self.hosts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(REMOTE_HEALTH_INTERVAL)
+            self.check_all()
+
+    def choose(self, model, exclude=()):
+        """The healthy host with the lowest load for model, or None."""
+        with self.lock:
+            candidates = [
+                host for host in self.hosts
+                if host.healthy and model in host.models and host not in exclude
+            ]
+            return min(candidates, key=lambda host: host.load(model), default=None)
+
+    def pool(self, model):
+        """A RemotePool for model if any healthy host advertises it, else None (run locally)."""
+        if not self.hosts:
+            return None
+        self._start()
+        if self.choose(model) is None:
+            return None
+        with self.lock:
+            return self._pools.setdefault(model, RemotePool(model, self))
+
+
+remote_workers = RemoteWorkers(REMOTE_WORKERS)
+
+Gauge(
+    "remote_host_up", "Whether a remote worker host passed its last health check.", ["host"],
+    function=lambda: {(host.address,): float(host.healthy) for host in remote_workers.hosts},
+)
+
+
+def remote_pool(project):
+    return remote_workers.pool(project["model"])
@@ -1,30 +1,101 @@
+import argparse
 import os
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from PIL import Image
-import sys
 
-def resize_images(input_dir, output_dir, max_size):
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+# thumbnail() lets the JPEG decoder scale down by 1/2, 1/4 or 1/8 while
+# decoding, but keeps at least this many times the target size for the final
+# resample so the result is not aliased (Pillow's default)
+REDUCING_GAP = 2.0
+
+
+def iter_images(input_dir):
+    """Yield image paths one at a time so huge folders are never listed in memory."""
+    with os.scandir(input_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in IMAGE_SUFFIXES:
+                yield Path(entry.path)
+
+
+def is_up_to_date(img_file, output_file, max_size):
+    """
+    The output is current if it is newer than the source and has the size
+    thumbnail() would produce. Only image headers are read.
+    """
+    try:
+        if output_file.stat().st_mtime < img_file.stat().st_mtime:
+            return False
+        with Image.open(img_file) as src, Image.open(output_file) as dst:
+            if max(src.size) <= max_size:
+                return dst.size == src.size
+            return max(dst.size) == max_size
+    except OSError:
+        return False
+
+
+def resize_one(img_file, output_path, max_size):
+    output_file = output_path / img_file.name
+    if is_up_to_date(img_file, output_file, max_size):
+        return None
+
+    with Image.open(img_file) as img:
+        img.thumbnail((max_size, max_size), reducing_gap=REDUCING_GAP)
+        tmp_file = output_file.with_name(f".{output_file.name}.tmp")
+        img.save(tmp_file, format=Image.registered_extensions()[output_file.suffix.lower()])
+        os.replace(tmp_file, output_file)
+        return f"Saved {output_file} ({img.size[0]}x{img.size[1]})"
+
+
+def resize_images(input_dir, output_dir, max_size, workers=None):
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
 
-    for img_file in input_path.glob("*"):
-        if img_file.suffix.lower() not in [".jpg", ".jpeg", ".png"]:
-            continue
+    workers = workers or os.cpu_count()
+    max_in_flight = workers * 4
+    saved = skipped = 0
+    failed = []
 
-        with Image.open(img_file) as img:
-            img.thumbnail((max_size, max_size))
-            output_file = output_path / img_file.name
-            img.save(output_file)
-            print(f"Saved {output_file} ({img.size[0]}x{img.size[1]})")
+    with ProcessPoolExecutor(workers) as pool:
+        in_flight = {}
 
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: python resize_images.py <input_dir> <output_dir> <max_size>")
-        sys.exit(1)
+        def drain(return_when):
+            nonlocal saved, skipped
+            done, _ = wait(in_flight, return_when=return_when)
+            for future in done:
+                img_file = in_flight.pop(future)
+                try:
+                    message = future.result()
+                except Exception as e:
+                    # One unreadable image must not abort the rest of the run
+                    failed.append(img_file)
+                    print(f"Failed to resize {img_file}: {e}")
+                    continue
+                if message is None:
+                    skipped += 1
+                else:
+                    saved += 1
+                    print(message)
 
-    input_dir = sys.argv[1]
-    output_dir = sys.argv[2]
-    max_size = int(sys.argv[3])
+        for img_file in iter_images(input_path):
+            in_flight[pool.submit(resize_one, img_file, output_path, max_size)] = img_file
+            if len(in_flight) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+        if in_flight:
+            drain(ALL_COMPLETED)
+
+    print(f"Resized {saved} images, {skipped} already up to date, {len(failed)} failed")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(usage="python resize_images.py <input_dir> <output_dir> <max_size> [--workers N]")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("max_size", type=int)
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: all cores)")
+    args = parser.parse_args()
 
-    resize_images(input_dir, output_dir, max_size)
+    failed = resize_images(args.input_dir, args.output_dir, args.max_size, args.workers)
+    raise SystemExit(1 if failed else 0)
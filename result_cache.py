@@ -0,0 +1,163 @@
+"""
+Content-addressed cache for restoration outputs.
+
+Keys are a hash of the resized input pixels plus the model name and resize
+bound, so re-submitting the same image (or one that resizes to the same
+pixels) returns the stored output without running the model again.
+
+Two tiers: an in-memory LRU of decoded images and an on-disk LRU of PNGs under
+cache/results. Both are bounded by a byte budget and evict least recently used
+entries first.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from constants import CACHE_DIR
+from metrics import CallbackCounter, Gauge
+
+RESULT_CACHE_DIR = CACHE_DIR / "results"
+RESULT_CACHE_MEMORY_MB = float(os.environ.get("RESULT_CACHE_MEMORY_MB", "256"))
+RESULT_CACHE_DISK_MB = float(os.environ.get("RESULT_CACHE_DISK_MB", "2048"))
+
+
+def image_nbytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+class ResultCache:
+    def __init__(self, directory, memory_budget, disk_budget):
+        self.directory = directory
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory = OrderedDict()  # key -> PIL image
+        self.memory_bytes = 0
+        self.disk = OrderedDict()  # key -> file size
+        self.disk_bytes = 0
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = sorted(self.directory.glob("*.png"), key=lambda p: p.stat().st_mtime)
+        for path in entries:
+            size = path.stat().st_size
+            self.disk[path.stem] = size
+            self.disk_bytes += size
+        self._evict_disk()
+
+    @staticmethod
+    def key(image, model, bound):
+        digest = hashlib.sha256()
+        digest.update(f"{model}|{bound}|{image.mode}|{image.width}x{image.height}|".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return self.directory / f"{key}.png"
+
+    def _evict_memory(self):
+        while self.memory_bytes > self.memory_budget and self.memory:
+            _, image = self.memory.popitem(last=False)
+            self.memory_bytes -= image_nbytes(image)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        while self.disk_bytes > self.disk_budget and self.disk:
+            key, size = self.disk.popitem(last=False)
+            self._path(key).unlink(missing_ok=True)
+            self.disk_bytes -= size
+            self.evictions += 1
+
+    def _remember(self, key, image):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return
+        self.memory[key] = image
+        self.memory_bytes += image_nbytes(image)
+        self._evict_memory()
+
+    def get(self, key):
+        """Return the cached output image for key, or None."""
+        with self._lock:
+            image = self.memory.get(key)
+            if image is not None:
+                self.memory.move_to_end(key)
+                self.hits_memory += 1
+                return image
+
+            if key not in self.disk:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                with Image.open(path) as stored:
+                    image = stored.copy()
+            except OSError:
+                self.disk_bytes -= self.disk.pop(key)
+                self.misses += 1
+                return None
+            self.disk.move_to_end(key)
+            os.utime(path)  # keeps disk LRU order across restarts
+            self.hits_disk += 1
+            self._remember(key, image)
+            return image
+
+    def put(self, key, image):
+        """Store an output image in both tiers."""
+        with self._lock:
+            self._remember(key, image)
+            if key in self.disk:
+                return
+
+        # Encode outside the lock; the rename makes the entry appear atomically.
+        path = self._path(key)
+        tmp_path = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        image.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            if key in self.disk:
+                return
+            self.disk[key] = size
+            self.disk_bytes += size
+            self._evict_disk()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory_bytes,
+                "disk_entries": len(self.disk),
+                "disk_bytes": self.disk_bytes,
+            }
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_DIR,
+    memory_budget=int(RESULT_CACHE_MEMORY_MB * 1024 * 1024),
+    disk_budget=int(RESULT_CACHE_DISK_MB * 1024 * 1024),
+)
+
+CallbackCounter(
+    "result_cache_lookups_total", "Result cache lookups by outcome.", ["outcome"],
+    function=lambda: {
+        (outcome,): result_cache.stats()[key]
+        for outcome, key in (("hit_memory", "hits_memory"), ("hit_disk", "hits_disk"), ("miss", "misses"))
+    },
+)
+CallbackCounter("result_cache_evictions_total", "Entries evicted from the result cache.", function=lambda: result_cache.stats()["evictions"])
+Gauge(
+    "result_cache_bytes", "Bytes held by the result cache.", ["tier"],
+    function=lambda: {("memory",): result_cache.stats()["memory_bytes"], ("disk",): result_cache.stats()["disk_bytes"]},
+)
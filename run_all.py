@@ -1,27 +1,178 @@
-import subprocess
+"""
+Run every model over a folder of images.
+
+Models run in parallel on a bounded pool; each model is additionally capped at
+its project["concurrency"] jobs. Images are processed in chunks and every
+finished image is recorded in a manifest next to the outputs, so an
+interrupted or partially failed run resumes with only the missing work.
+Models that can only run their script over the whole input_128 folder are
+run once per invocation instead of once per chunk.
+
+    python run_all.py [--input-dir input_128] [--output-dir output_images] [--workers 4]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import zip_longest
 from pathlib import Path
 
+from metrics import percentile
+from model_registry import MODELS
+from model_workers import run_model, runs_in_legacy_dirs
+from worker_protocol import list_images, output_path
+from workspaces import LEGACY_INPUT_DIR, request_workspace
+
 BASE_DIR = Path(__file__).resolve().parent
 
-projects = [
-    {
-        "venv": BASE_DIR / "DarkIR/venv_DarkIR/bin/python",
-        "script": BASE_DIR / "DarkIR/inference.py",
-        "args": ["-i", "../input_128/", "-o", "../output_images/"],
-        "cwd": BASE_DIR / "DarkIR",  # important: run inside the project folder
-    },
-    {
-        "venv": BASE_DIR / "X-Restormer/venv/bin/python",
-        "script": BASE_DIR / "X-Restormer/xrestormer/test.py",
-        "args": ["-opt", "options/test/001_xrestormer_sr.yml"],
-        "cwd": BASE_DIR / "X-Restormer",
-    },
-]
-
-for proj in projects:
-    print(f"Running {proj['script']}...")
-    subprocess.run(
-        [str(proj["venv"]), str(proj["script"]), *proj["args"]],
-        cwd=proj["cwd"],
-        check=True,
-    )
\ No newline at end of file
+projects = [MODELS["DarkIR"], MODELS["X-Restormer"]]
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+class Manifest:
+    """
+    {model: {image name: {"size", "mtime", "seconds"}}} persisted as JSON.
+    An image counts as done while its source is unchanged and its output exists.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if path.exists():
+            with open(path) as f:
+                self.entries = json.load(f)
+
+    def is_done(self, model, name, input_dir, output_dir):
+        entry = self.entries.get(model, {}).get(name)
+        if entry is None:
+            return False
+        if {"size": entry["size"], "mtime": entry["mtime"]} != source_signature(input_dir / name):
+            return False
+        return os.path.exists(output_path(output_dir, name, model))
+
+    def record(self, model, signatures, seconds_per_image):
+        """Record images as done, with the source signatures taken before they were run."""
+        with self._lock:
+            done = self.entries.setdefault(model, {})
+            for name, signature in signatures.items():
+                done[name] = {**signature, "seconds": seconds_per_image}
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def run_chunk(project, names, input_dir, output_dir, limit):
+    """
+    Run one chunk of images in its own workspace; returns (elapsed seconds,
+    source signatures taken before the run).
+    """
+    model = project["model"]
+    with limit, request_workspace(model) as (chunk_input, chunk_output):
+        signatures = {name: source_signature(input_dir / name) for name in names}
+        for name in names:
+            shutil.copyfile(input_dir / name, chunk_input / name)
+        start = time.perf_counter()
+        run_model(project, chunk_input, chunk_output)
+        elapsed = time.perf_counter() - start
+        for name in names:
+            shutil.move(output_path(chunk_output, name, model), output_path(output_dir, name, model))
+    return elapsed, signatures
+
+
+def run_folder(project, names, input_dir, output_dir, limit):
+    """
+    Run a script that only reads input_128 once over input_dir, which must be
+    input_128; it processes every image there, so all of them are returned as done.
+    """
+    with limit:
+        signatures = {name: source_signature(input_dir / name) for name in list_images(input_dir)}
+        start = time.perf_counter()
+        run_model(project, input_dir, output_dir)
+        return time.perf_counter() - start, signatures
+
+
+def run_all(input_dir, output_dir, workers, models=None):
+    input_dir = Path(input_dir).resolve()
+    output_dir = Path(output_dir).resolve()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(output_dir / "manifest.json")
+    images = list_images(input_dir)
+
+    selected = [p for p in projects if models is None or p["model"] in models]
+    stats = {p["model"]: {"images": 0, "failed": 0, "skipped": 0, "per_image": []} for p in selected}
+    run_start = time.perf_counter()
+
+    chunks_per_model = []
+    for project in selected:
+        model = project["model"]
+        limit = threading.Semaphore(max(1, project.get("concurrency", 1)))
+        todo = [name for name in images if not manifest.is_done(model, name, input_dir, output_dir)]
+        stats[model]["skipped"] = len(images) - len(todo)
+        print(f"{model}: {len(todo)} to process, {stats[model]['skipped']} already done")
+
+        if runs_in_legacy_dirs(project):
+            # Every run of the script covers all of input_128, so run it once
+            run = run_folder if input_dir == LEGACY_INPUT_DIR.resolve() else run_chunk
+            chunks_per_model.append([(run, project, todo, limit)] if todo else [])
+            continue
+        chunk_size = max(1, project.get("max_batch_size", 1))
+        chunks_per_model.append([
+            (run_chunk, project, todo[i:i + chunk_size], limit) for i in range(0, len(todo), chunk_size)
+        ])
+
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {}
+        # Interleave models so pool threads are not all stuck behind one model's limit.
+        for round_ in zip_longest(*chunks_per_model):
+            for chunk in round_:
+                if chunk is None:
+                    continue
+                run, project, names, limit = chunk
+                future = pool.submit(run, project, names, input_dir, output_dir, limit)
+                futures[future] = (project["model"], names)
+
+        for future in as_completed(futures):
+            model, names = futures[future]
+            try:
+                elapsed, signatures = future.result()
+            except Exception as e:
+                stats[model]["failed"] += len(names)
+                print(f"ERROR: {model} failed on {', '.join(names)}: {e}")
+                continue
+            # A folder run also redoes (and records) images that were already done
+            seconds_per_image = elapsed / len(signatures)
+            manifest.record(model, signatures, seconds_per_image)
+            stats[model]["images"] += len(names)
+            stats[model]["per_image"].extend([seconds_per_image] * len(names))
+
+    wall = time.perf_counter() - run_start
+    print(f"\nFinished in {wall:.1f}s")
+    for model, s in stats.items():
+        rate = s["images"] / wall if wall > 0 else 0.0
+        print(
+            f"{model}: {s['images']} done, {s['skipped']} skipped, {s['failed']} failed, "
+            f"{rate:.2f} images/s, p50 {percentile(s['per_image'], 50):.3f}s, p95 {percentile(s['per_image'], 95):.3f}s per image"
+        )
+    return all(s["failed"] == 0 for s in stats.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run all models over a folder of images")
+    parser.add_argument("--input-dir", default=BASE_DIR / "input_128")
+    parser.add_argument("--output-dir", default=BASE_DIR / "output_images")
+    parser.add_argument("--workers", type=int, default=4, help="Chunks running at the same time across all models")
+    parser.add_argument("--models", nargs="+", help="Only run these models")
+    args = parser.parse_args()
+
+    ok = run_all(args.input_dir, args.output_dir, args.workers, args.models)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,49 @@
+"""
+Raw pixel buffers passed between the app and model workers through
+memory-mapped files in /dev/shm (RAM-backed on Linux), instead of encoding and
+decoding PNGs on disk. Only a small descriptor travels over the control channel:
+
+    {"path": "/dev/shm/iro_<uuid>.raw", "shape": [h, w, 3], "dtype": "uint8", "offset": 0}
+
+The side that creates a buffer hands ownership to the other side, which calls
+release() once it has read it. Needs numpy, which every model venv has.
+"""
+import os
+import tempfile
+import uuid
+
+import numpy as np
+
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def write_array(array):
+    """Copy `array` into a new shared buffer and return its descriptor."""
+    array = np.ascontiguousarray(array)
+    path = os.path.join(SHM_DIR, f"iro_{uuid.uuid4().hex}.raw")
+    buffer = np.memmap(path, dtype=array.dtype, mode="w+", shape=array.shape)
+    buffer[...] = array
+    buffer.flush()
+    del buffer
+    return {"path": path, "shape": list(array.shape), "dtype": array.dtype.str, "offset": 0}
+
+
+def read_array(descriptor):
+    """
+    Map the buffer described by `descriptor` read-only. The mapping stays valid
+    after release() unlinks the file.
+    """
+    return np.memmap(
+        descriptor["path"],
+        dtype=np.dtype(descriptor["dtype"]),
+        mode="r",
+        offset=descriptor.get("offset", 0),
+        shape=tuple(descriptor["shape"]),
+    )
+
+
+def release(descriptor):
+    try:
+        os.unlink(descriptor["path"])
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,74 @@
+"""
+Helpers for Gradio generator handlers that stream progress while a job runs.
+
+The handler starts the blocking work with run_in_background(), then calls
+wait(future) in a loop and yields a status update every STREAM_INTERVAL
+seconds until the work is done. The work runs in a copy of the handler's
+context, so spans still land on the request's trace.
+"""
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import Future, TimeoutError
+
+# Seconds between progress updates sent to the browser
+STREAM_INTERVAL = float(os.environ.get("STREAM_INTERVAL", "0.5"))
+
+# Progress lines in model script output, read as frames done/total: "Processed frame 3/12",
+# "Processing 3/12", or a tqdm bar ("...| 3/12 [00:01<00:03, ...]")
+FRAME_PROGRESS = re.compile(
+    r"(?:\b(?:processed|processing|frames?)\b\D{0,16}?(\d+)\s*/\s*(\d+)\b)|(?:\|\s*(\d+)/(\d+)\s*\[)",
+    re.IGNORECASE,
+)
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) in a daemon thread and return a Future for its result."""
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(fn, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name=f"background-{getattr(fn, '__name__', 'job')}").start()
+    return future
+
+
+def wait(future, interval=STREAM_INTERVAL):
+    """Wait up to `interval` seconds; returns whether the future is done."""
+    try:
+        future.exception(timeout=interval)
+    except TimeoutError:
+        return False
+    return True
+
+
+def eta_text(elapsed, predicted=None, done=0, total=0):
+    """'4.2s elapsed, about 3s left' from progress counts or a predicted duration."""
+    text = f"{elapsed:.1f}s elapsed"
+    if total and done:
+        remaining = elapsed / done * (total - done)
+    elif predicted is not None:
+        remaining = predicted - elapsed
+    else:
+        return text
+    if remaining <= 0:
+        return text + ", finishing"
+    return text + f", about {remaining:.0f}s left" if remaining >= 1.5 else text + ", about 1s left"
+
+
+def frame_progress(line):
+    """(done, total) from a progress line of a model script, or (None, None)."""
+    match = FRAME_PROGRESS.search(line)
+    if match is None:
+        return None, None
+    done, total = (int(value) for value in match.groups() if value is not None)
+    if total <= 0 or done > total:
+        return None, None
+    return done, total
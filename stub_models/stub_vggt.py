@@ -0,0 +1,81 @@
+"""
+Stand-in for vggt/run.py. Writes a synthetic predictions.npz with the same
+keys and shapes the real model produces, so the 3D tab can be exercised
+without the vggt submodule, its venv or a GPU.
+
+    python stub_models/stub_vggt.py --input_dir images --output_dir results --startup-delay 2 --delay 0.2
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def synthetic_predictions(num_frames, height, width, seed=0):
+    """A wavy surface seen from cameras on a short arc, with noisy confidences."""
+    rng = np.random.default_rng(seed)
+    v, u = np.meshgrid(np.linspace(-1, 1, height, dtype=np.float32), np.linspace(-1, 1, width, dtype=np.float32), indexing="ij")
+    depth = 3 + 0.2 * np.sin(4 * u) * np.cos(3 * v)
+
+    extrinsic = np.zeros((num_frames, 3, 4), dtype=np.float32)
+    world_points = np.empty((num_frames, height, width, 3), dtype=np.float32)
+    for i in range(num_frames):
+        angle = 0.1 * (i - num_frames / 2)
+        rotation = np.array(
+            [[np.cos(angle), 0, np.sin(angle)], [0, 1, 0], [-np.sin(angle), 0, np.cos(angle)]], dtype=np.float32
+        )
+        extrinsic[i, :, :3] = rotation
+        camera_points = np.stack([u * depth, v * depth, depth], axis=-1)
+        world_points[i] = camera_points @ rotation  # inverse rotation: world = R^T x
+
+    conf = (1 + rng.gamma(2.0, 1.0, size=(num_frames, height, width))).astype(np.float32)
+    images = np.stack(
+        [np.broadcast_to((u + 1) / 2, (num_frames, height, width)),
+         np.broadcast_to((v + 1) / 2, (num_frames, height, width)),
+         rng.random((num_frames, height, width), dtype=np.float32)],
+        axis=1,
+    ).astype(np.float32)
+    intrinsic = np.tile(
+        np.array([[width, 0, width / 2], [0, width, height / 2], [0, 0, 1]], dtype=np.float32), (num_frames, 1, 1)
+    )
+
+    return {
+        "pose_enc": np.zeros((num_frames, 9), dtype=np.float32),
+        "depth": np.broadcast_to(depth[None, ..., None], (num_frames, height, width, 1)).copy(),
+        "depth_conf": conf,
+        "world_points": world_points,
+        "world_points_conf": conf * 0.9,
+        "images": images,
+        "extrinsic": extrinsic,
+        "intrinsic": intrinsic,
+        "world_points_from_depth": world_points + rng.normal(0, 0.005, world_points.shape).astype(np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_dir", required=True)
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="Fake model load time (s)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Fake compute time per frame (s)")
+    parser.add_argument("--resolution", type=int, default=128, help="Prediction height and width (px)")
+    args = parser.parse_args()
+
+    frames = [name for name in os.listdir(args.input_dir) if os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES]
+    print("Loading model...", flush=True)
+    time.sleep(args.startup_delay)
+    for i in range(len(frames)):
+        time.sleep(args.delay)
+        print(f"Processed frame {i + 1}/{len(frames)}", flush=True)
+
+    predictions = synthetic_predictions(max(1, len(frames)), args.resolution, args.resolution)
+    os.makedirs(args.output_dir, exist_ok=True)
+    np.savez(os.path.join(args.output_dir, "predictions.npz"), **predictions)
+    print(f"Wrote stub predictions for {len(frames)} frames to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Stand-in for a real model worker. Speaks worker_protocol without loading any
+model, so the worker plumbing can be exercised without the submodules or a GPU.
+
+Each input image is copied to <stem>_<model>.png in the job's output_dir
+(or returned unchanged for shared-memory jobs).
+
+    python stub_models/stub_worker.py --model DarkIR --startup-delay 2 --delay 0.1 --batch-overhead 0.05
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worker_protocol import list_images, output_path, serve
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="Fake checkpoint load time (s)")
+    parser.add_argument("--delay", type=float, default=0.0, help="Fake compute time per image (s)")
+    parser.add_argument("--batch-overhead", type=float, default=0.0, help="Fake fixed cost per job (s)")
+    parser.add_argument("--crash-after", type=int, default=0, help="Exit after this many jobs (0 = never)")
+    args = parser.parse_args()
+
+    jobs_done = 0
+
+    def load_model():
+        time.sleep(args.startup_delay)
+        return args.model
+
+    def count_job():
+        nonlocal jobs_done
+        jobs_done += 1
+        if args.crash_after and jobs_done > args.crash_after:
+            os._exit(1)
+
+    def handle_job(job, model):
+        count_job()
+        time.sleep(args.batch_overhead)
+        names = list_images(job["input_dir"])
+        os.makedirs(job["output_dir"], exist_ok=True)
+        for name in names:
+            time.sleep(args.delay)
+            shutil.copyfile(
+                os.path.join(job["input_dir"], name),
+                output_path(job["output_dir"], name, job.get("model", model)),
+            )
+        return {"processed": len(names)}
+
+    def handle_arrays(arrays, model):
+        count_job()
+        time.sleep(args.batch_overhead + args.delay * len(arrays))
+        return {name: array.copy() for name, array in arrays.items()}
+
+    serve(handle_job, load_model, handle_arrays)
+
+
+if __name__ == "__main__":
+    main()
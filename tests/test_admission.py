@@ -0,0 +1,63 @@
+import threading
+import time
+
+from PIL import Image
+
+from admission import MemoryScheduler, image_pixels
+
+
+def run_jobs(scheduler, jobs, hold=0.05):
+    """Start (model, mb) jobs in order and return the order in which they were admitted."""
+    order = []
+    lock = threading.Lock()
+
+    def job(name, model, mb):
+        with scheduler.admit(model, mb):
+            with lock:
+                order.append(name)
+            time.sleep(hold)
+
+    threads = []
+    for name, model, mb in jobs:
+        thread = threading.Thread(target=job, args=(name, model, mb))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.005)  # queue in submission order
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_jobs_within_budget_run_together():
+    scheduler = MemoryScheduler(100)
+    start = time.perf_counter()
+    run_jobs(scheduler, [("a", "A", 40), ("b", "B", 40)], hold=0.2)
+    assert time.perf_counter() - start < 0.35
+    assert scheduler.stats()["delayed"] == 0
+
+
+def test_models_take_turns_when_memory_is_short():
+    scheduler = MemoryScheduler(100)
+    order = run_jobs(scheduler, [
+        ("a1", "A", 100), ("a2", "A", 100), ("a3", "A", 100), ("b1", "B", 100),
+    ])
+    assert order.index("b1") < order.index("a3")
+
+
+def test_oversized_job_runs_alone():
+    scheduler = MemoryScheduler(100)
+    order = run_jobs(scheduler, [("small", "A", 10), ("huge", "B", 500)])
+    assert order == ["small", "huge"]
+    assert scheduler.stats()["reserved_mb"] == 0
+
+
+def test_negative_budget_disables_admission():
+    scheduler = MemoryScheduler(-1)
+    with scheduler.admit("A", 1e9):
+        assert scheduler.stats()["running"] == 0
+
+
+def test_image_pixels_counts_unreadable_files_as_default(tmp_path):
+    Image.new("RGB", (30, 20)).save(tmp_path / "a.png")
+    (tmp_path / "b.png").write_bytes(b"not an image")
+    assert image_pixels([tmp_path / "a.png", tmp_path / "b.png"], default=100) == 700
@@ -0,0 +1,62 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import batching
+from worker_protocol import list_images, output_path
+
+PROJECT = {"model": "Echo", "batch_window_ms": 50, "max_batch_size": 4, "concurrency": 1}
+
+
+@pytest.fixture
+def model_runs(monkeypatch):
+    """run_model stand-in that copies every input to its output and records the batch sizes."""
+    runs = []
+    lock = threading.Lock()
+
+    def run_model(project, input_dir, output_dir):
+        names = list_images(input_dir)
+        with lock:
+            runs.append(len(names))
+        if project.get("fail"):
+            raise RuntimeError("model crashed")
+        time.sleep(0.02)
+        for name in names:
+            shutil.copyfile(os.path.join(input_dir, name), output_path(output_dir, name, project["model"]))
+        return {"ok": True, "infer_time": 0.02 * len(names)}
+
+    monkeypatch.setattr(batching, "run_model", run_model)
+    return runs
+
+
+def submit_all(batcher, tmp_path, count):
+    futures = []
+    for i in range(count):
+        input_file = tmp_path / f"in{i}.png"
+        input_file.write_bytes(f"image {i}".encode())
+        futures.append((i, batcher.submit(input_file, tmp_path / f"out{i}.png")))
+    return futures
+
+
+def test_concurrent_requests_share_invocations(model_runs, tmp_path):
+    batcher = batching.MicroBatcher(PROJECT)
+    futures = submit_all(batcher, tmp_path, 10)
+
+    for i, future in futures:
+        # Each request gets its batch's model time, not its time in the queue
+        assert future.result(timeout=5) in {0.02 * size for size in model_runs}
+        assert open(tmp_path / f"out{i}.png", "rb").read() == f"image {i}".encode()
+    assert sum(model_runs) == 10
+    assert max(model_runs) == 4 and len(model_runs) < 10
+
+
+def test_model_failure_fails_every_request_in_the_batch(model_runs, tmp_path):
+    batcher = batching.MicroBatcher(dict(PROJECT, fail=True))
+    futures = submit_all(batcher, tmp_path, 3)
+
+    for _, future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(timeout=5)
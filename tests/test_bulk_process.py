@@ -0,0 +1,92 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image, ImageOps
+
+import bulk_process
+from bulk_process import Checkpoint, iter_inputs, output_file
+
+
+class InvertPipeline:
+    """Pipeline stand-in that inverts images and fails on pure black ones."""
+
+    runs = 0
+
+    def __init__(self, models, cache=True):
+        self.models = list(models)
+        self.name = " -> ".join(self.models)
+
+    def run(self, image):
+        InvertPipeline.runs += 1
+        if image.getextrema() == ((0, 0), (0, 0), (0, 0)):
+            raise RuntimeError("black image")
+        return SimpleNamespace(output_image=ImageOps.invert(image))
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_process, "Pipeline", InvertPipeline)
+    InvertPipeline.runs = 0
+    source = tmp_path / "archive"
+    (source / "sub").mkdir(parents=True)
+    Image.new("RGB", (8, 8), (10, 20, 30)).save(source / "a.png")
+    Image.new("RGB", (8, 8), (40, 50, 60)).save(source / "a.jpg")
+    Image.new("RGB", (8, 8), (70, 80, 90)).save(source / "sub" / "b.png")
+    return source
+
+
+def run(source, output_dir):
+    return bulk_process.bulk_process(str(source), str(output_dir), ["Invert"], 2, 1, 4, 4, 60)
+
+
+def test_outputs_mirror_the_tree_and_keep_suffixes(archive, tmp_path):
+    assert run(archive, tmp_path / "out")
+    outputs = sorted(
+        os.path.relpath(os.path.join(root, name), tmp_path / "out")
+        for root, _, files in os.walk(tmp_path / "out") for name in files if name.endswith(".png")
+    )
+    assert outputs == ["a.jpg_Invert.png", "a.png_Invert.png", os.path.join("sub", "b.png_Invert.png")]
+    with Image.open(tmp_path / "out" / "a.png_Invert.png") as image:
+        assert image.getpixel((0, 0)) == (245, 235, 225)
+
+
+def test_rerun_resumes_and_retries_changed_or_failed_images(archive, tmp_path):
+    Image.new("RGB", (8, 8)).save(archive / "black.png")
+    assert not run(archive, tmp_path / "out")
+    assert InvertPipeline.runs == 4
+
+    assert not run(archive, tmp_path / "out")
+    assert InvertPipeline.runs == 5  # only the failed image again
+
+    Image.new("RGB", (8, 8), (1, 2, 3)).save(archive / "sub" / "b.png")
+    os.utime(archive / "sub" / "b.png", ns=(1, 1))
+    os.remove(archive / "black.png")
+    assert run(archive, tmp_path / "out")
+    assert InvertPipeline.runs == 6  # the changed image
+
+
+def test_checkpoint_survives_reopening(tmp_path):
+    source = tmp_path / "x.png"
+    source.write_bytes(b"data")
+    checkpoint = Checkpoint(tmp_path / "checkpoint.txt")
+    checkpoint.record("x.png", bulk_process.source_signature(source))
+    checkpoint.close()
+    assert Checkpoint(tmp_path / "checkpoint.txt").is_done(source, "x.png")
+    assert not Checkpoint(tmp_path / "checkpoint.txt").is_done(tmp_path / "missing.png", "missing.png")
+
+
+def test_list_file_entries_are_normalized(tmp_path):
+    list_file = tmp_path / "lists" / "files.txt"
+    list_file.parent.mkdir()
+    list_file.write_text("# comment\nimages/./a.jpg\n../x.jpg\n/data/y.png\n")
+    assert [rel for _, rel in iter_inputs(str(list_file))] == [
+        os.path.join("images", "a.jpg"), os.path.join("..", "x.jpg"), os.path.join("data", "y.png"),
+    ]
+
+
+def test_output_file_rejects_paths_outside_the_output_dir(tmp_path):
+    out = str(tmp_path / "out")
+    assert output_file(out, os.path.join("sub", "a.jpg"), "DarkIR") == os.path.join(out, "sub", "a.jpg_DarkIR.png")
+    with pytest.raises(ValueError):
+        output_file(out, os.path.join("..", "x.jpg"), "DarkIR")
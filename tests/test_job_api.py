@@ -0,0 +1,41 @@
+import time
+
+from job_api import Job, JobManager
+
+
+def finished_job(manager, tmp_path, status="done"):
+    job = Job("DarkIR", b"payload")
+    job.cleanup_dir = tmp_path / job.id
+    job.cleanup_dir.mkdir()
+    manager.jobs[job.id] = job
+    job.set_status(status)
+    return job
+
+
+def test_lookup_purges_expired_jobs(tmp_path):
+    manager = JobManager(ttl=0.01)
+    job = finished_job(manager, tmp_path)
+    time.sleep(0.02)
+
+    assert manager.get(job.id) is None
+    assert not job.cleanup_dir.exists()
+
+
+def test_unfinished_and_fresh_jobs_are_kept(tmp_path):
+    manager = JobManager(ttl=60)
+    done = finished_job(manager, tmp_path)
+    queued = Job("DarkIR", b"payload")
+    manager.jobs[queued.id] = queued
+
+    assert manager.get(done.id) is done
+    assert manager.get(queued.id) is queued
+
+
+def test_full_queue_rejects_whole_submission():
+    manager = JobManager(capacity=2)
+    queue = manager.queues["DarkIR"]
+    queue.workers = 0  # keep the jobs queued
+
+    assert manager.submit("DarkIR", [b"a", b"b", b"c"]) is None
+    assert manager.jobs == {}
+    assert len(manager.submit("DarkIR", [b"a", b"b"])) == 2
@@ -0,0 +1,71 @@
+import time
+import uuid
+
+import pytest
+from PIL import Image
+
+from latency_model import MIN_BOUND, LatencyModel, choose_bound, predict_seconds, record_run
+
+
+def project(bound=256, max_bound=1024):
+    return {"model": f"Test-{uuid.uuid4().hex}", "bound": bound, "max_bound": max_bound, "concurrency": 1}
+
+
+def test_fit_recovers_linear_cost():
+    model = LatencyModel()
+    for pixels in (10_000, 40_000, 90_000, 160_000):
+        model.record(pixels, 0.5 + 1e-5 * pixels)
+    a, b = model.fit()
+    assert a == pytest.approx(0.5) and b == pytest.approx(1e-5)
+
+
+def test_fit_at_one_size_is_proportional():
+    model = LatencyModel()
+    assert model.fit() is None
+    for _ in range(5):
+        model.record(65_536, 2.0)
+    a, b = model.fit()
+    assert a == 0.0 and b * 65_536 == pytest.approx(2.0)
+
+
+def test_choose_bound_uses_default_without_history():
+    p = project()
+    assert choose_bound(p, Image.new("RGB", (2000, 1000)), 1.0) == (256, None)
+    assert predict_seconds(p, Image.new("RGB", (2000, 1000)), 256) is None
+
+
+def test_choose_bound_fits_target():
+    p = project()
+    for side in (256, 512, 1024):
+        record_run(p["model"], side * side, 1e-6 * side * side)
+    image = Image.new("RGB", (2000, 2000))
+
+    bound, predicted = choose_bound(p, image, 0.5)
+    assert predicted <= 0.5
+    assert bound < 1024 and 1e-6 * (bound + 32) ** 2 > 0.5  # the largest step that fits
+    assert predict_seconds(p, image, bound) == pytest.approx(predicted)
+    assert choose_bound(p, image, 100)[0] == 1024  # capped at max_bound
+    assert choose_bound(p, image, 1e-9)[0] == MIN_BOUND
+
+
+def test_choose_bound_does_not_upscale_past_default():
+    p = project()
+    for side in (256, 512):
+        record_run(p["model"], side * side, 1e-6 * side * side)
+    assert choose_bound(p, Image.new("RGB", (100, 80)), 100)[0] == 256
+
+
+def test_requests_record_model_time_not_queue_wait(monkeypatch):
+    from components import image_model
+    from latency_model import latency_model
+
+    def run_batched(project, input_file, output_file):
+        time.sleep(0.2)  # batch window and wait for a worker
+        Image.open(input_file).save(output_file)
+        return 0.01
+
+    monkeypatch.setattr(image_model, "supports_shm", lambda project: False)
+    monkeypatch.setattr(image_model, "run_batched", run_batched)
+    p = project()
+    image_model.process_image(p, Image.new("RGB", (512, 256)), 256, cache=False)
+    assert list(latency_model(p["model"]).samples) == [(256 * 128, 0.01)]
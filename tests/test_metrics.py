@@ -0,0 +1,11 @@
+import pytest
+
+from metrics import percentile
+
+
+def test_percentile_interpolates_like_numpy():
+    assert percentile([], 50) == 0.0
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([0, 10], 95) == pytest.approx(9.5)
+    assert percentile([1, 2, 3], 100, presorted=True) == 3
@@ -0,0 +1,91 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from constants import BASE_DIR, STUB_WORKER
+from model_workers import ModelWorker, WorkerError, WorkerPool
+from worker_protocol import output_path
+
+
+def stub_project(*worker_args, concurrency=1):
+    return {
+        "model": "Stub",
+        "venv": sys.executable,
+        "worker": STUB_WORKER,
+        "worker_args": ["--model", "Stub", *worker_args],
+        "cwd": BASE_DIR,
+        "concurrency": concurrency,
+    }
+
+
+@pytest.fixture
+def workers():
+    started = []
+    yield started
+    for worker in started:
+        worker.stop()
+
+
+def job(tmp_path, name):
+    input_dir = tmp_path / name / "input"
+    output_dir = tmp_path / name / "output"
+    input_dir.mkdir(parents=True)
+    output_dir.mkdir()
+    Image.new("RGB", (8, 8), "red").save(input_dir / f"{name}.png")
+    return {"input_dir": str(input_dir), "output_dir": str(output_dir)}
+
+
+def test_job_round_trip_reuses_the_warm_worker(tmp_path, workers):
+    worker = ModelWorker(stub_project())
+    workers.append(worker)
+
+    first = worker.run(job(tmp_path, "a"))
+    pid = worker.process.pid
+    second = worker.run(job(tmp_path, "b"))
+
+    assert first["ok"] and first["processed"] == 1 and "infer_time" in first
+    assert second["ok"] and worker.process.pid == pid and worker.restarts == 0
+    with Image.open(output_path(tmp_path / "b" / "output", "b.png", "Stub")) as img:
+        assert img.size == (8, 8)
+
+
+def test_crashed_worker_is_restarted_and_the_job_retried(tmp_path, workers):
+    worker = ModelWorker(stub_project("--crash-after", "1"))
+    workers.append(worker)
+
+    worker.run(job(tmp_path, "a"))
+    pid = worker.process.pid
+    reply = worker.run(job(tmp_path, "b"))
+
+    assert reply["ok"] and worker.restarts == 1 and worker.process.pid != pid
+    assert (tmp_path / "b" / "output" / "b_Stub.png").exists()
+
+
+def test_crash_beyond_max_restarts_fails_the_job(tmp_path, workers):
+    # Every restarted worker crashes on its first job
+    worker = ModelWorker(stub_project("--crash-after", "-1"), max_restarts=1)
+    workers.append(worker)
+    with pytest.raises(WorkerError, match="exited with code 1"):
+        worker.run(job(tmp_path, "a"))
+    assert worker.restarts == 1
+
+
+def test_timeout_stops_the_worker(tmp_path, workers):
+    worker = ModelWorker(stub_project("--delay", "1.5"), max_restarts=0)
+    workers.append(worker)
+    with pytest.raises(WorkerError, match="did not answer"):
+        worker.run(job(tmp_path, "a"), timeout=0.5)
+    assert not worker.is_alive()
+
+
+def test_pool_runs_jobs_on_parallel_workers(tmp_path):
+    pool = WorkerPool(stub_project("--delay", "0.2", concurrency=2))
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            replies = list(executor.map(pool.run, [job(tmp_path, "a"), job(tmp_path, "b")]))
+        assert all(reply["ok"] for reply in replies)
+        assert len({worker.process.pid for worker in pool.workers}) == 2
+    finally:
+        pool.stop()
@@ -0,0 +1,102 @@
+import uuid
+
+import pytest
+from PIL import Image
+
+import model_workers
+import pipeline
+from model_workers import WorkerError
+from pipeline import Pipeline
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def stub_models(tmp_path, monkeypatch):
+    """Register image models served by the stub worker; returns a function that adds one."""
+    projects = {}
+    monkeypatch.setattr(model_workers, "STUB_MODELS", True)
+    monkeypatch.setattr(pipeline, "get_project", projects.get)
+    cache = ResultCache(tmp_path / "cache", memory_budget=1 << 24, disk_budget=1 << 24)
+    monkeypatch.setattr(pipeline, "result_cache", cache)
+
+    def add(bound, *stub_args):
+        model = f"Stub{uuid.uuid4().hex[:8]}"
+        projects[model] = {"model": model, "bound": bound, "concurrency": 1, "stub_args": list(stub_args)}
+        return model
+
+    yield add
+    model_workers.stop_all()
+
+
+def red(size=(200, 100)):
+    return Image.new("RGB", size, (200, 30, 30))
+
+
+def test_stages_hand_off_and_shrink(stub_models):
+    first, second = stub_models(64), stub_models(32)
+    job = Pipeline([first, second]).run(red())
+
+    assert job.error is None and not job.cached
+    assert [t[:3] for t in job.timings] == [
+        (first, (64, 32), (64, 32)),
+        (second, (64, 32), (32, 16)),
+    ]
+    assert job.output_image.size == (32, 16)
+    assert job.output_image.getpixel((5, 5)) == (200, 30, 30)
+
+
+def test_later_stages_never_upscale(stub_models):
+    first, second = stub_models(32), stub_models(64)
+    job = Pipeline([first, second]).run(red())
+    assert [t[2] for t in job.timings] == [(32, 16), (32, 16)]
+
+
+def test_only_the_whole_chain_is_cached(stub_models, monkeypatch):
+    models = [stub_models(64), stub_models(32)]
+    stages = []
+    process_image = pipeline.process_image
+
+    def counting_process_image(project, *args, **kwargs):
+        stages.append(project["model"])
+        return process_image(project, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "process_image", counting_process_image)
+
+    first = Pipeline(models).run(red())
+    again = Pipeline(models).run(red())
+
+    assert stages == models
+    assert again.cached and again.timings == []
+    assert again.output_image.tobytes() == first.output_image.tobytes()
+    assert len(pipeline.result_cache.memory) == 1
+
+    # Without the cache every stage runs again
+    uncached = Pipeline(models, cache=False).run(red())
+    assert not uncached.cached and stages == models * 2
+
+
+def test_failed_stage_sets_the_job_error(stub_models):
+    # The second stage's worker crashes on every job, including the retry
+    models = [stub_models(64), stub_models(32, "--crash-after", "-1")]
+
+    with pytest.raises(WorkerError):
+        Pipeline(models).run(red())
+
+    jobs = list(Pipeline(models).map([red(), red((100, 100))]))
+    assert [job.input_image.size for job in jobs] == [(64, 32), (64, 64)]
+    assert all(isinstance(job.error, WorkerError) for job in jobs)
+    assert [len(job.timings) for job in jobs] == [1, 1]
+    assert len(pipeline.result_cache.memory) == 0
+
+
+def test_map_keeps_order_across_stages(stub_models):
+    models = [stub_models(64, "--delay", "0.05"), stub_models(32)]
+    sizes = [(200, 100), (100, 200), (150, 150), (90, 30)]
+    jobs = list(Pipeline(models).map(red(size) for size in sizes))
+    assert [job.output_image.size for job in jobs] == [(32, 16), (16, 32), (32, 32), (32, 10)]
+    assert all(job.error is None for job in jobs)
+
+
+def test_rejects_unknown_models(stub_models):
+    with pytest.raises(ValueError, match="Not an image model"):
+        Pipeline(["Missing"])
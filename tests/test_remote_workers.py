@@ -0,0 +1,113 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from remote_workers import RemoteHost, RemotePool, RemoteWorkers, RemoteWorkerError
+
+
+def serve(health, run):
+    """A fake worker host answering GET /health and POST /run with (status, body) from the callables."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, body):
+            body = body if isinstance(body, bytes) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            self.reply(*health())
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.reply(*run(request))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    return server, f"127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def hosts():
+    servers = []
+
+    def start(health, run=lambda request: (500, b"unused")):
+        server, address = serve(health, run)
+        servers.append(server)
+        return address
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+HEALTHY = lambda: (200, {"models": {"DarkIR": {"capacity": 2}}})  # noqa: E731
+
+
+def echo(request):
+    return 200, {"ok": True, "outputs": dict(request["images"]), "infer_time": 0.1}
+
+
+def job(tmp_path):
+    (tmp_path / "in").mkdir()
+    (tmp_path / "out").mkdir()
+    (tmp_path / "in" / "a.png").write_bytes(b"pixels")
+    return {"input_dir": str(tmp_path / "in"), "output_dir": str(tmp_path / "out")}
+
+
+@pytest.mark.parametrize("health", [
+    lambda: (200, {"host": "x"}),
+    lambda: (200, b"<html>not json</html>"),
+    lambda: (200, {"models": ["DarkIR"]}),
+    lambda: (503, b"down"),
+])
+def test_bad_health_marks_host_down(hosts, health):
+    host = RemoteHost(hosts(health))
+    host.healthy = True
+    host.check()
+    assert not host.healthy and host.last_error
+
+
+def test_healthy_host_advertises_models(hosts):
+    host = RemoteHost(hosts(HEALTHY))
+    host.check()
+    assert host.healthy and host.models == {"DarkIR": 2}
+
+
+def test_non_json_error_reply_is_retried_on_another_host(hosts, tmp_path):
+    broken = hosts(HEALTHY, lambda request: (500, b"<html>Internal Server Error</html>"))
+    good = hosts(HEALTHY, echo)
+    workers = RemoteWorkers([broken, good])
+    workers.check_all()
+    workers.hosts[1].in_flight = 1  # make the broken host the first choice
+
+    result = RemotePool("DarkIR", workers).run(job(tmp_path))
+
+    assert result["host"] == good
+    assert not workers.hosts[0].healthy
+    assert (tmp_path / "out" / "a_DarkIR.png").read_bytes() == b"pixels"
+
+
+def test_model_error_is_not_retried(hosts, tmp_path):
+    failing = hosts(HEALTHY, lambda request: (500, {"ok": False, "error": "out of memory"}))
+    workers = RemoteWorkers([failing])
+    workers.check_all()
+
+    with pytest.raises(RemoteWorkerError, match="out of memory"):
+        RemotePool("DarkIR", workers).run(job(tmp_path))
+    assert workers.hosts[0].healthy
+
+
+def test_malformed_reply_is_a_host_failure(hosts, tmp_path):
+    garbled = hosts(HEALTHY, lambda request: (200, {"ok": True, "outputs": "a.png"}))
+    workers = RemoteWorkers([garbled])
+    workers.check_all()
+    with pytest.raises(RemoteWorkerError, match="no remote host"):
+        RemotePool("DarkIR", workers).run(job(tmp_path))
+    assert not workers.hosts[0].healthy
@@ -0,0 +1,32 @@
+from PIL import Image
+
+from resize_images import resize_images
+
+
+def test_corrupt_image_is_reported_and_the_rest_resized(tmp_path):
+    input_dir = tmp_path / "in"
+    output_dir = tmp_path / "out"
+    input_dir.mkdir()
+    Image.new("RGB", (400, 200), "red").save(input_dir / "good.jpg")
+    Image.new("RGB", (50, 30), "blue").save(input_dir / "small.png")
+    (input_dir / "broken.jpg").write_bytes(b"not a jpeg")
+
+    failed = resize_images(input_dir, output_dir, 100, workers=2)
+
+    assert [path.name for path in failed] == ["broken.jpg"]
+    with Image.open(output_dir / "good.jpg") as img:
+        assert img.size == (100, 50)
+    with Image.open(output_dir / "small.png") as img:
+        assert img.size == (50, 30)
+    assert not (output_dir / "broken.jpg").exists()
+
+
+def test_up_to_date_outputs_are_skipped(tmp_path, capsys):
+    input_dir = tmp_path / "in"
+    input_dir.mkdir()
+    Image.new("RGB", (400, 200), "red").save(input_dir / "good.jpg")
+
+    resize_images(input_dir, tmp_path / "out", 100, workers=1)
+    capsys.readouterr()
+    assert resize_images(input_dir, tmp_path / "out", 100, workers=1) == []
+    assert "Resized 0 images, 1 already up to date, 0 failed" in capsys.readouterr().out
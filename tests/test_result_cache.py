@@ -0,0 +1,47 @@
+from PIL import Image
+
+from result_cache import ResultCache
+
+
+def solid(color, size=(16, 16)):
+    return Image.new("RGB", size, color)
+
+
+def test_key_depends_on_pixels_model_and_bound():
+    key = ResultCache.key(solid("red"), "DarkIR", 256)
+    assert key == ResultCache.key(solid("red"), "DarkIR", 256)
+    assert key != ResultCache.key(solid("blue"), "DarkIR", 256)
+    assert key != ResultCache.key(solid("red"), "DeOldify", 256)
+    assert key != ResultCache.key(solid("red"), "DarkIR", 512)
+
+
+def test_memory_and_disk_tiers(tmp_path):
+    cache = ResultCache(tmp_path, memory_budget=1 << 20, disk_budget=1 << 20)
+    assert cache.get("a") is None
+    cache.put("a", solid("red"))
+    assert cache.get("a").getpixel((0, 0)) == (255, 0, 0)
+
+    reopened = ResultCache(tmp_path, memory_budget=1 << 20, disk_budget=1 << 20)
+    assert reopened.get("a").getpixel((0, 0)) == (255, 0, 0)
+    stats = reopened.stats()
+    assert stats["hits_disk"] == 1 and stats["memory_entries"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    entry = 16 * 16 * 3
+    cache = ResultCache(tmp_path, memory_budget=2 * entry, disk_budget=1 << 20)
+    cache.put("a", solid("red"))
+    cache.put("b", solid("green"))
+    cache.get("a")
+    cache.put("c", solid("blue"))
+    assert list(cache.memory) == ["a", "c"]
+    assert cache.get("b") is not None  # still on disk
+    assert cache.stats()["hits_disk"] == 1
+
+
+def test_disk_tier_stays_within_budget(tmp_path):
+    cache = ResultCache(tmp_path, memory_budget=0, disk_budget=1)
+    cache.put("a", solid("red"))
+    cache.put("b", solid("green"))
+    assert cache.stats()["disk_entries"] <= 1
+    assert len(list(tmp_path.glob("*.png"))) <= 1
@@ -0,0 +1,77 @@
+import json
+import sys
+
+import pytest
+
+import model_workers
+import run_all
+
+LEGACY_SCRIPT = """
+import os, shutil, sys
+input_dir, output_dir, model, runs = sys.argv[1:]
+with open(runs, "a") as f:
+    f.write(" ".join(sorted(os.listdir(input_dir))) + "\\n")
+for name in os.listdir(input_dir):
+    stem = os.path.splitext(name)[0]
+    shutil.copyfile(os.path.join(input_dir, name), os.path.join(output_dir, f"{stem}_{model}.png"))
+"""
+
+
+@pytest.fixture
+def legacy(tmp_path, monkeypatch):
+    """A one-shot project that only knows the shared input_128/output_images folders."""
+    input_128 = tmp_path / "input_128"
+    output_images = tmp_path / "output_images"
+    input_128.mkdir()
+    output_images.mkdir()
+    monkeypatch.setattr(model_workers, "LEGACY_INPUT_DIR", input_128)
+    monkeypatch.setattr(model_workers, "LEGACY_OUTPUT_DIR", output_images)
+    monkeypatch.setattr(run_all, "LEGACY_INPUT_DIR", input_128)
+    script = tmp_path / "legacy.py"
+    script.write_text(LEGACY_SCRIPT)
+    runs = tmp_path / "runs.txt"
+    project = {
+        "model": "Legacy",
+        "venv": sys.executable,
+        "script": script,
+        "args": [str(input_128), str(output_images), "Legacy", str(runs)],
+        "cwd": tmp_path,
+    }
+    assert model_workers.runs_in_legacy_dirs(project)
+    return project, input_128, output_images, runs
+
+
+def test_staging_never_reads_or_touches_existing_files(tmp_path, legacy):
+    project, input_128, output_images, _ = legacy
+    (input_128 / "0.png").write_bytes(b"stale")
+    (output_images / "0_Legacy.png").write_bytes(b"old output")
+    job_input = tmp_path / "job_in"
+    job_output = tmp_path / "job_out"
+    job_input.mkdir()
+    job_output.mkdir()
+    (job_input / "0.png").write_bytes(b"fresh")
+
+    model_workers.run_model(project, job_input, job_output)
+
+    assert (job_output / "0_Legacy.png").read_bytes() == b"fresh"
+    assert (input_128 / "0.png").read_bytes() == b"stale"
+    assert sorted(p.name for p in input_128.iterdir()) == ["0.png"]
+    # The script reran the user's own file, but none of the job's files are left behind
+    assert sorted(p.name for p in output_images.iterdir()) == ["0_Legacy.png"]
+
+
+def test_folder_model_runs_once_over_input_128(legacy, monkeypatch):
+    project, input_128, output_images, runs = legacy
+    monkeypatch.setattr(run_all, "projects", [project])
+    for i in range(10):
+        (input_128 / f"{i}.png").write_bytes(bytes([i]))
+
+    assert run_all.run_all(input_128, output_images, workers=4)
+    assert len(runs.read_text().splitlines()) == 1
+    assert (output_images / "3_Legacy.png").read_bytes() == bytes([3])
+    manifest = json.loads((output_images / "manifest.json").read_text())
+    assert len(manifest["Legacy"]) == 10
+
+    # Nothing changed, so a second run does not start the script
+    assert run_all.run_all(input_128, output_images, workers=4)
+    assert len(runs.read_text().splitlines()) == 1
@@ -0,0 +1,112 @@
+import json
+import struct
+
+import numpy as np
+
+from components.scene_export import (
+    CHUNK_BIN,
+    CHUNK_JSON,
+    GLB_MAGIC,
+    write_compact_npz,
+    write_ply,
+    write_quantized_glb,
+)
+
+
+def points(count=1000):
+    rng = np.random.default_rng(0)
+    vertices = rng.normal(size=(count, 3)).astype(np.float32) * [1.0, 2.0, 0.5]
+    colors = rng.integers(0, 256, size=(count, 3), dtype=np.uint8)
+    return vertices, colors
+
+
+def read_glb(path):
+    data = open(path, "rb").read()
+    magic, version, total = struct.unpack_from("<III", data, 0)
+    assert (magic, version, total) == (GLB_MAGIC, 2, len(data))
+    json_length, json_type = struct.unpack_from("<II", data, 12)
+    assert json_type == CHUNK_JSON
+    gltf = json.loads(data[20:20 + json_length])
+    if len(data) == 20 + json_length:
+        return gltf, None
+    bin_length, bin_type = struct.unpack_from("<II", data, 20 + json_length)
+    assert bin_type == CHUNK_BIN
+    start = 28 + json_length
+    return gltf, data[start:start + bin_length]
+
+
+def test_quantized_glb_round_trip(tmp_path):
+    vertices, colors = points()
+    path = tmp_path / "scene.glb"
+    write_quantized_glb(path, vertices, colors)
+
+    gltf, binary = read_glb(path)
+    assert gltf["extensionsRequired"] == ["KHR_mesh_quantization"]
+    node = gltf["nodes"][0]
+    primitive = gltf["meshes"][node["mesh"]]["primitives"][0]
+    position = gltf["accessors"][primitive["attributes"]["POSITION"]]
+    view = gltf["bufferViews"][position["bufferView"]]
+    assert position["componentType"] == 5123 and view["byteStride"] == 8
+    quantized = np.frombuffer(binary, np.uint16, 4 * position["count"], view["byteOffset"]).reshape(-1, 4)[:, :3]
+    decoded = np.array(node["translation"]) + quantized * np.array(node["scale"])
+    step = np.array(node["scale"])
+    assert np.all(np.abs(decoded - vertices) <= step / 2 + 1e-6)
+
+    color = gltf["accessors"][primitive["attributes"]["COLOR_0"]]
+    rgba = np.frombuffer(binary, np.uint8, 4 * color["count"], gltf["bufferViews"][color["bufferView"]]["byteOffset"])
+    assert np.array_equal(rgba.reshape(-1, 4)[:, :3], colors)
+    # 8 bytes of padded positions and 4 bytes of color per point
+    assert len(binary) == 12 * len(vertices)
+
+
+def test_cameras_without_points(tmp_path):
+    camera = (np.eye(3, dtype=np.float32), np.array([[0, 1, 2]]), np.full((3, 4), 255, np.uint8))
+    write_quantized_glb(tmp_path / "cameras.glb", np.zeros((0, 3)), np.zeros((0, 3), np.uint8), [camera])
+    gltf, binary = read_glb(tmp_path / "cameras.glb")
+    assert "extensionsRequired" not in gltf and len(gltf["meshes"]) == 1
+    assert gltf["buffers"] == [{"byteLength": len(binary)}] and len(binary) > 0
+
+
+def test_ply_layout(tmp_path):
+    vertices, colors = points(10)
+    path = tmp_path / "points.ply"
+    write_ply(path, vertices, colors)
+    data = open(path, "rb").read()
+    header, body = data.split(b"end_header\n", 1)
+    assert b"element vertex 10" in header
+    records = np.frombuffer(body, dtype=[("xyz", "<f4", 3), ("rgb", "u1", 3)])
+    assert np.array_equal(records["xyz"], vertices)
+    assert np.array_equal(records["rgb"], colors)
+
+
+def test_compact_npz_round_trip(tmp_path):
+    vertices, colors = points()
+    path = tmp_path / "points.npz"
+    write_compact_npz(path, vertices, colors)
+    with np.load(path) as data:
+        decoded = data["bbox_min"] + data["positions"] * data["bbox_scale"]
+        stored_colors = data["colors"]
+        step = np.max(data["bbox_scale"])
+    # Points are reordered; the random colors are unique, so match points up by color
+    original = np.lexsort(colors.T)
+    restored = np.lexsort(stored_colors.T)
+    assert np.array_equal(colors[original], stored_colors[restored])
+    assert np.allclose(vertices[original], decoded[restored], atol=step)
+
+
+def test_empty_exports(tmp_path):
+    vertices = np.zeros((0, 3), dtype=np.float32)
+    colors = np.zeros((0, 4), dtype=np.uint8)
+
+    write_ply(tmp_path / "empty.ply", vertices, colors)
+    assert b"element vertex 0" in open(tmp_path / "empty.ply", "rb").read()
+
+    write_compact_npz(tmp_path / "empty.npz", vertices, colors)
+    with np.load(tmp_path / "empty.npz") as data:
+        assert data["positions"].shape == (0, 3) and data["colors"].shape == (0, 3)
+
+    write_quantized_glb(tmp_path / "empty.glb", vertices, colors)
+    gltf, binary = read_glb(tmp_path / "empty.glb")
+    # No zero-length buffer, BIN chunk or empty arrays, which validators reject
+    assert binary is None
+    assert gltf == {"asset": gltf["asset"], "scene": 0, "scenes": [{}]}
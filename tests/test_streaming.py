@@ -0,0 +1,36 @@
+import contextvars
+import time
+
+import pytest
+
+from streaming import eta_text, frame_progress, run_in_background, wait
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Processed frame 3/12", (3, 12)),
+    ("Processing 4 / 10 images", (4, 10)),
+    ("Frames:  50%|#####     | 5/10 [00:01<00:01,  3.2it/s]", (5, 10)),
+    ("Loading /data/12/34/model.pt", (None, None)),
+    ("Run started 2024/10/17", (None, None)),
+    ("ratio 3/4 of memory in use", (None, None)),
+    ("Processed frame 13/12", (None, None)),
+    ("Processed frame 0/0", (None, None)),
+])
+def test_frame_progress(line, expected):
+    assert frame_progress(line) == expected
+
+
+def test_eta_text():
+    assert eta_text(2.0) == "2.0s elapsed"
+    assert eta_text(2.0, predicted=10) == "2.0s elapsed, about 8s left"
+    assert eta_text(2.0, done=1, total=3) == "2.0s elapsed, about 4s left"
+    assert eta_text(5.0, predicted=4) == "5.0s elapsed, finishing"
+
+
+def test_background_work_keeps_the_context():
+    var = contextvars.ContextVar("var", default=None)
+    var.set("request")
+    future = run_in_background(lambda: (time.sleep(0.05), var.get())[1])
+    assert not wait(future, 0.001)
+    assert wait(future, 5)
+    assert future.result() == "request"
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import tiling
+
+
+@pytest.fixture
+def upscale_model(monkeypatch):
+    """run_batched stand-in that upscales each tile 2x."""
+
+    def run_batched(project, input_file, output_file):
+        with Image.open(input_file) as tile:
+            tile.resize((tile.width * 2, tile.height * 2), Image.NEAREST).save(output_file)
+
+    monkeypatch.setattr(tiling, "run_batched", run_batched)
+    return {"model": "Upscale"}
+
+
+def reference_blend(image, tile_size, overlap, scale=2):
+    width, height = image.size
+    canvas = np.zeros((height * scale, width * scale, 3), dtype=np.float32)
+    weights = np.zeros(canvas.shape[:2], dtype=np.float32)
+    for left, top, right, bottom in tiling.tile_boxes(width, height, tile_size, overlap):
+        tile = image.crop((left, top, right, bottom))
+        tile = tile.resize((tile.width * scale, tile.height * scale), Image.NEAREST)
+        w = tiling.feather_weights(tile.width, tile.height, overlap * scale)
+        canvas[top * scale:bottom * scale, left * scale:right * scale] += np.asarray(tile, dtype=np.float32) * w[..., None]
+        weights[top * scale:bottom * scale, left * scale:right * scale] += w
+    return np.clip(canvas / np.maximum(weights, 1e-6)[..., None] + 0.5, 0, 255).astype(np.uint8)
+
+
+def test_tile_boxes_cover_image_flush_with_edges():
+    boxes = tiling.tile_boxes(100, 70, 32, 8)
+    assert {box[2] for box in boxes} >= {100}
+    assert {box[3] for box in boxes} >= {70}
+    covered = np.zeros((70, 100), dtype=bool)
+    for left, top, right, bottom in boxes:
+        covered[top:bottom, left:right] = True
+    assert covered.all()
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 3, 16])
+def test_row_band_blend_matches_full_canvas(upscale_model, max_in_flight):
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (70, 100, 3), dtype=np.uint8))
+
+    output, tiles = tiling.process_tiled(upscale_model, image, 32, 8, max_in_flight)
+
+    assert tiles == len(tiling.tile_boxes(100, 70, 32, 8))
+    assert output.size == (200, 140)
+    np.testing.assert_array_equal(np.asarray(output), reference_blend(image, 32, 8))
+
+
+def test_preview_shows_partial_output(upscale_model):
+    image = Image.new("RGB", (100, 70), (200, 100, 50))
+    previews = []
+
+    def on_tile(done, total, render_preview):
+        previews.append((done, total, render_preview(64)))
+
+    output, tiles = tiling.process_tiled(upscale_model, image, 32, 8, 2, on_tile)
+
+    assert [done for done, _, _ in previews] == list(range(1, tiles + 1))
+    assert all(max(preview.size) <= 64 for _, _, preview in previews)
+    first = np.asarray(previews[0][2]).reshape(-1, 3).tolist()
+    assert [200, 100, 50] in first and [0, 0, 0] in first  # one tile blended, the rest still empty
+    assert np.asarray(previews[-1][2]).min(axis=(0, 1)).tolist() == [200, 100, 50]
+    assert np.asarray(output).min(axis=(0, 1)).tolist() == [200, 100, 50]
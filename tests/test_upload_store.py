@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+import upload_store
+from upload_store import StoreBudget
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    uploads, reconstructions = tmp_path / "uploads", tmp_path / "reconstructions"
+    monkeypatch.setattr(upload_store, "UPLOAD_STORE_DIR", uploads)
+    monkeypatch.setattr(upload_store, "RECONSTRUCTION_STORE_DIR", reconstructions)
+    monkeypatch.setattr(upload_store, "upload_budget", StoreBudget(uploads, 1 << 20))
+    monkeypatch.setattr(upload_store, "reconstruction_budget", StoreBudget(reconstructions, 1 << 20))
+    return tmp_path
+
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def test_budget_evicts_least_recently_used(tmp_path):
+    budget = StoreBudget(tmp_path, 250)
+    for name in ("a", "b", "c"):
+        write(tmp_path / name, b"x" * 100)
+        budget.add(name)
+        if name == "b":
+            assert budget.touch("a")
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+    assert budget.bytes == 200 and budget.evictions == 1
+
+
+def test_budget_loads_existing_entries_oldest_first(tmp_path):
+    for i, name in enumerate(("old", "new")):
+        write(tmp_path / name / "predictions.npz", b"x" * 100)
+        os.utime(tmp_path / name, (i, i))
+    budget = StoreBudget(tmp_path, 150)
+    assert list(budget.entries) == ["new"]
+    assert not (tmp_path / "old").exists()
+
+
+def test_uploads_are_stored_once_and_read_only(stores):
+    images_dir = stores / "request" / "images"
+    images_dir.mkdir(parents=True)
+    source = write(stores / "src" / "frame.png", b"png bytes")
+
+    upload_store.import_uploads([str(source)], str(images_dir))
+    upload_store.import_uploads([str(source)], str(images_dir))
+
+    stored = list((stores / "uploads").iterdir())
+    assert len(stored) == 1
+    assert not os.stat(stored[0]).st_mode & 0o222
+    assert (images_dir / "frame.png").read_bytes() == b"png bytes"
+
+
+def test_image_set_key_depends_on_names_and_contents(stores):
+    images_dir = stores / "set" / "images"
+    write(images_dir / "a.png", b"1")
+    write(images_dir / "b.png", b"2")
+    key = upload_store.image_set_key(str(images_dir))
+    (images_dir / "b.png").rename(images_dir / "c.png")
+    assert upload_store.image_set_key(str(images_dir)) != key
+
+
+def test_rewriting_a_restored_file_does_not_touch_the_store(stores):
+    predictions = write(stores / "run1" / "predictions.npz", b"first")
+    upload_store.store_reconstruction("set", str(predictions))
+    restored = stores / "run2" / "predictions.npz"
+    restored.parent.mkdir()
+
+    assert upload_store.restore_reconstruction("set", "predictions.npz", str(restored))
+    # A rerun unlinks before writing (run_vggt_inference)
+    os.remove(restored)
+    restored.write_bytes(b"second")
+
+    assert (stores / "reconstructions" / "set" / "predictions.npz").read_bytes() == b"first"
+    assert not upload_store.restore_reconstruction("missing", "predictions.npz", str(restored))
@@ -0,0 +1,50 @@
+import numpy as np
+
+from components.vggt_index import voxel_downsample
+
+
+def surface(count=200000, seed=0):
+    rng = np.random.default_rng(seed)
+    uv = rng.random((count, 2), dtype=np.float32)
+    vertices = np.column_stack([uv, 0.1 * np.sin(12 * uv[:, 0])]).astype(np.float32)
+    colors = rng.integers(0, 256, size=(count, 3), dtype=np.uint8)
+    return vertices, colors
+
+
+def test_keeps_the_most_confident_point_per_voxel():
+    rng = np.random.default_rng(0)
+    # 10 tight clusters far apart: every cluster falls in one voxel
+    centers = np.arange(10)[:, None] * np.array([10.0, 7.0, 3.0])
+    labels = rng.integers(0, 10, 5000)
+    vertices = (centers[labels] + rng.normal(scale=1e-6, size=(5000, 3))).astype(np.float32)
+    colors = rng.integers(0, 256, size=(5000, 3), dtype=np.uint8)
+
+    kept, kept_colors, voxel_size = voxel_downsample(vertices, colors, 100, voxel_size=0.4)
+    assert voxel_size == 0.4 and len(kept) == 10
+    # Points come in ascending confidence order, so each cluster's last point wins
+    last = [np.flatnonzero(labels == label)[-1] for label in range(10)]
+    assert {tuple(v) for v in kept} == {tuple(vertices[i]) for i in last}
+    assert {tuple(c) for c in kept_colors} == {tuple(colors[i]) for i in last}
+
+
+def test_automatic_voxel_size_meets_the_budget():
+    vertices, colors = surface()
+    kept, kept_colors, voxel_size = voxel_downsample(vertices, colors, 20000)
+    assert 0 < len(kept) <= 20000 and voxel_size > 0
+    assert len(kept_colors) == len(kept)
+
+
+def test_far_outliers_do_not_overflow_the_grid():
+    vertices, colors = surface()
+    rng = np.random.default_rng(1)
+    outliers = rng.choice(len(vertices), 5, replace=False)
+    vertices[outliers] = rng.normal(size=(5, 3)) * 1e5
+    vertices[0] = np.nan
+
+    kept, _, voxel_size = voxel_downsample(vertices, colors, 20000)
+    assert 0 < len(kept) <= 20000
+    assert np.isfinite(kept).all()
+
+    # A fixed, tiny voxel size makes the grid too large to flatten into int64 keys
+    kept, _, _ = voxel_downsample(vertices, colors, 10, voxel_size=1e-9)
+    assert len(kept) == 10
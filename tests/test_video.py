@@ -0,0 +1,48 @@
+import numpy as np
+
+from video import VIDEO_DUPLICATE_THRESHOLD, fit, is_duplicate, thumbnail
+
+
+def textured_frame(rng, height=480, width=640):
+    blocks = rng.integers(0, 256, (height // 16 + 2, width // 16 + 2, 3), dtype=np.uint8)
+    return np.repeat(np.repeat(blocks, 16, axis=0), 16, axis=1)
+
+
+def test_thumbnail_averages_blocks():
+    frame = np.zeros((100, 60, 3), dtype=np.uint8)
+    frame[:50] = 200
+    thumb = thumbnail(frame)
+    assert thumb.shape == (64, 60)
+    assert thumb[:31].min() == 200 and thumb[33:].max() == 0
+
+
+def test_noise_is_duplicate():
+    rng = np.random.default_rng(0)
+    frame = textured_frame(rng)[:480, :640]
+    noisy = np.clip(frame + rng.normal(0, 2, frame.shape), 0, 255).astype(np.uint8)
+    assert is_duplicate(thumbnail(frame), thumbnail(noisy), VIDEO_DUPLICATE_THRESHOLD)
+
+
+def test_local_motion_is_not_duplicate():
+    rng = np.random.default_rng(1)
+    frame = textured_frame(rng)[:480, :640]
+    mouth = frame.copy()
+    mouth[300:320, 300:340] = 255 - mouth[300:320, 300:340]
+    assert not is_duplicate(thumbnail(frame), thumbnail(mouth), VIDEO_DUPLICATE_THRESHOLD)
+
+
+def test_small_pan_is_not_duplicate():
+    rng = np.random.default_rng(2)
+    texture = textured_frame(rng)
+    frame, panned = texture[:480, :640], texture[:480, 3:643]
+    assert not is_duplicate(thumbnail(frame), thumbnail(panned), VIDEO_DUPLICATE_THRESHOLD)
+
+
+def test_negative_threshold_never_matches():
+    thumb = np.zeros((64, 64), dtype=np.float32)
+    assert not is_duplicate(thumb, thumb, -1)
+
+
+def test_fit_never_upscales_and_keeps_even_sizes():
+    assert fit(640, 480, 1920) == (640, 480)
+    assert fit(1921, 1081, 256) == (256, 144)
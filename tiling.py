@@ -0,0 +1,170 @@
+"""
+Tiled inference for inputs too large to run through a model in one piece.
+
+The image is split into overlapping tiles, each tile is sent to the model as
+its own request (so the micro-batcher can group them), and the outputs are
+blended back together with linear feathering across the overlaps. Only
+max_in_flight tiles and a float band over the tile rows in progress exist at
+a time besides the uint8 output, so the blending memory is governed by the
+tile size rather than the input size.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from PIL import Image
+
+from batching import run_batched
+from workspaces import request_workspace
+
+
+def _starts(length, tile_size, overlap):
+    if length <= tile_size:
+        return [0]
+    stride = max(1, tile_size - overlap)
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)  # last tile flush with the edge
+    return starts
+
+
+def tile_boxes(width, height, tile_size, overlap):
+    """(left, top, right, bottom) boxes covering the image, overlapping by `overlap` px."""
+    return [
+        (left, top, min(left + tile_size, width), min(top + tile_size, height))
+        for top in _starts(height, tile_size, overlap)
+        for left in _starts(width, tile_size, overlap)
+    ]
+
+
+def _ramp(length, overlap):
+    if overlap <= 0:
+        return np.ones(length, dtype=np.float32)
+    i = np.arange(length, dtype=np.float32) + 0.5
+    return np.clip(np.minimum(i, length - i) / overlap, 1e-3, 1.0)
+
+
+def feather_weights(width, height, overlap):
+    """Blend weights that fall off linearly over `overlap` px at every tile border."""
+    return np.outer(_ramp(height, overlap), _ramp(width, overlap))
+
+
+def _run_tile(project, tile, index, input_dir, output_dir):
+    model = project["model"]
+    tile_input = input_dir / str(index)
+    tile_output = output_dir / str(index)
+    tile_input.mkdir()
+    tile_output.mkdir()
+    input_file = tile_input / "tile.png"
+    output_file = tile_output / f"tile_{model}.png"
+    tile.save(input_file)
+    run_batched(project, input_file, output_file)
+    with Image.open(output_file) as output:
+        output.load()
+    input_file.unlink()
+    output_file.unlink()
+    return output
+
+
+def process_tiled(project, image, tile_size, overlap, max_in_flight, on_tile=None):
+    """
+    Run the project's model over `image` tile by tile and return
+    (blended full-resolution output, number of tiles). The model's scale
+    factor is taken from the first finished tile. If given, on_tile(done,
+    total, render_preview) is called after each tile is blended;
+    render_preview(max_size) returns the partial output at most max_size px.
+
+    Tiles are blended into a float band that only spans the tile rows still
+    being worked on. Output rows above the first unfinished tile row are
+    final: they are normalized into the uint8 output and dropped from the band.
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    boxes = tile_boxes(width, height, tile_size, overlap)
+    pending = iter(enumerate(boxes))
+    row_tops = _starts(height, tile_size, overlap)
+    row_remaining = {top: 0 for top in row_tops}
+    for _, top, _, _ in boxes:
+        row_remaining[top] += 1
+
+    output = band = band_weights = None
+    band_top = 0  # first output row not yet final, and the band's first row
+    scale = None
+    blended = 0
+    lock = threading.Lock()
+
+    def normalized(rows, rows_weights):
+        return np.clip(rows / np.maximum(rows_weights, 1e-6)[..., None] + 0.5, 0, 255).astype(np.uint8)
+
+    def render_preview(max_size):
+        with lock:
+            step = max(1, -(-max(output.shape[:2]) // max_size))
+            preview = output[::step, ::step].copy()
+            start = -band_top % step
+            rows = normalized(band[start::step, ::step], band_weights[start::step, ::step])
+        first = (band_top + start) // step
+        rows = rows[:len(preview) - first]
+        preview[first:first + len(rows)] = rows
+        return Image.fromarray(preview)
+
+    def blend(box, tile_output):
+        nonlocal output, band, band_weights, scale
+        left, top, right, bottom = box
+        if scale is None:
+            scale = tile_output.width / (right - left)
+            output = np.zeros((round(height * scale), round(width * scale), 3), dtype=np.uint8)
+            band = np.zeros((0, output.shape[1], 3), dtype=np.float32)
+            band_weights = np.zeros((0, output.shape[1]), dtype=np.float32)
+
+        x0, y0 = round(left * scale), round(top * scale)
+        x1, y1 = round(right * scale), round(bottom * scale)
+        if tile_output.size != (x1 - x0, y1 - y0):
+            tile_output = tile_output.resize((x1 - x0, y1 - y0), Image.BICUBIC)
+        w = feather_weights(x1 - x0, y1 - y0, overlap * scale)
+        pixels = np.asarray(tile_output.convert("RGB"), dtype=np.float32) * w[..., None]
+        if y1 - band_top > len(band):
+            grow = y1 - band_top - len(band)
+            band = np.concatenate([band, np.zeros((grow, *band.shape[1:]), dtype=np.float32)])
+            band_weights = np.concatenate([band_weights, np.zeros((grow, band_weights.shape[1]), dtype=np.float32)])
+        band[y0 - band_top:y1 - band_top, x0:x1] += pixels
+        band_weights[y0 - band_top:y1 - band_top, x0:x1] += w
+
+    def finish_rows(top):
+        """Move output rows above `top` (an input row) from the band into the output."""
+        nonlocal band, band_weights, band_top
+        final = round(top * scale) if top < height else output.shape[0]
+        if final <= band_top:
+            return
+        count = final - band_top
+        output[band_top:final] = normalized(band[:count], band_weights[:count])
+        band, band_weights = band[count:].copy(), band_weights[count:].copy()
+        band_top = final
+
+    with request_workspace(project["model"]) as (input_dir, output_dir), ThreadPoolExecutor(max_in_flight) as pool:
+        in_flight = {}
+
+        def submit_next():
+            item = next(pending, None)
+            if item is None:
+                return
+            index, box = item
+            future = pool.submit(_run_tile, project, image.crop(box), index, input_dir, output_dir)
+            in_flight[future] = box
+
+        for _ in range(max_in_flight):
+            submit_next()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                box = in_flight.pop(future)
+                tile_output = future.result()
+                with lock:
+                    blend(box, tile_output)
+                    row_remaining[box[1]] -= 1
+                    unfinished = [top for top in row_tops if row_remaining[top]]
+                    finish_rows(unfinished[0] if unfinished else height)
+                blended += 1
+                if on_tile is not None:
+                    on_tile(blended, len(boxes), render_preview)
+                submit_next()
+
+    return Image.fromarray(output), len(boxes)
@@ -0,0 +1,198 @@
+"""
+Content-addressed storage for uploaded images and the reconstructions built from them.
+
+Every upload is stored once under cache/uploads/<sha256><ext> and hard-linked
+into request folders instead of copied (falling back to a copy across
+filesystems). An image set is identified by the hash of its sorted
+(file name, content hash) pairs; file names are part of the key because they
+fix the frame order. Predictions computed for a set are linked into
+cache/reconstructions/<set hash>/ so an identical set can skip inference.
+
+Stored files are read-only and only ever replaced by an atomic rename, never
+rewritten, so writing a new file at a linked path must unlink it first (see
+run_vggt_inference). Each store is bounded by a byte budget
+(UPLOAD_STORE_MB, RECONSTRUCTION_STORE_MB) and evicts the least recently used
+upload or set folder first; links already made into request folders keep
+their data.
+"""
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import CACHE_DIR
+from metrics import Gauge
+
+UPLOAD_STORE_DIR = CACHE_DIR / "uploads"
+RECONSTRUCTION_STORE_DIR = CACHE_DIR / "reconstructions"
+# Threads used to hash and link uploads; hashlib releases the GIL on large buffers.
+UPLOAD_IO_WORKERS = int(os.environ.get("UPLOAD_IO_WORKERS", "8"))
+UPLOAD_STORE_MB = float(os.environ.get("UPLOAD_STORE_MB", "2048"))
+RECONSTRUCTION_STORE_MB = float(os.environ.get("RECONSTRUCTION_STORE_MB", "8192"))
+
+MANIFEST_NAME = "uploads.json"
+
+
+def hash_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst (atomically replacing dst), copying if linking is not possible."""
+    tmp = f"{dst}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def _store(src, stored):
+    """Atomically put a read-only link or copy of src at stored."""
+    stored.parent.mkdir(parents=True, exist_ok=True)
+    link_or_copy(src, stored)
+    os.chmod(stored, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+
+def _entry_size(path):
+    if path.is_dir():
+        return sum(child.stat().st_size for child in path.rglob("*") if child.is_file())
+    return path.stat().st_size
+
+
+class StoreBudget:
+    """LRU byte budget over the top-level entries (files or set folders) of a store directory."""
+
+    def __init__(self, directory, budget):
+        self.directory = directory
+        self.budget = budget
+        self.entries = OrderedDict()  # entry name -> bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if directory.exists():
+            for path in sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime):
+                if not path.name.endswith(".tmp"):
+                    self.entries[path.name] = _entry_size(path)
+                    self.bytes += self.entries[path.name]
+            with self._lock:
+                self._evict()
+
+    def _evict(self):
+        while self.bytes > self.budget and self.entries:
+            name, size = self.entries.popitem(last=False)
+            path = self.directory / name
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+            self.bytes -= size
+            self.evictions += 1
+
+    def add(self, name):
+        """Account for a new or grown entry and evict over budget."""
+        size = _entry_size(self.directory / name)
+        with self._lock:
+            self.bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            self._evict()
+
+    def touch(self, name):
+        """Mark an entry as used; returns False if it is not in the store."""
+        with self._lock:
+            if name not in self.entries:
+                return False
+            self.entries.move_to_end(name)
+        try:
+            os.utime(self.directory / name)  # keeps LRU order across restarts
+        except FileNotFoundError:
+            return False
+        return True
+
+
+upload_budget = StoreBudget(UPLOAD_STORE_DIR, int(UPLOAD_STORE_MB * 1024 * 1024))
+reconstruction_budget = StoreBudget(RECONSTRUCTION_STORE_DIR, int(RECONSTRUCTION_STORE_MB * 1024 * 1024))
+
+Gauge(
+    "upload_store_bytes", "Bytes held by the upload and reconstruction stores.", ["store"],
+    function=lambda: {("uploads",): upload_budget.bytes, ("reconstructions",): reconstruction_budget.bytes},
+)
+
+
+def store_file(path):
+    """Add a file to the upload store and return (digest, stored path)."""
+    digest = hash_file(path)
+    stored = UPLOAD_STORE_DIR / f"{digest}{os.path.splitext(path)[1].lower()}"
+    if not upload_budget.touch(stored.name) or not stored.exists():
+        _store(path, stored)
+        upload_budget.add(stored.name)
+    return digest, stored
+
+
+def import_uploads(paths, images_dir):
+    """
+    Store each uploaded file and link it into images_dir under its original
+    name, in parallel. Writes a manifest of content hashes next to images_dir
+    and returns the sorted destination paths.
+    """
+    def import_one(path):
+        digest, stored = store_file(path)
+        name = os.path.basename(path)
+        try:
+            link_or_copy(stored, os.path.join(images_dir, name))
+        except FileNotFoundError:  # evicted in the meantime
+            link_or_copy(path, os.path.join(images_dir, name))
+        return name, digest
+
+    with ThreadPoolExecutor(max_workers=max(1, min(UPLOAD_IO_WORKERS, len(paths)))) as pool:
+        digests = dict(pool.map(import_one, paths))
+
+    with open(os.path.join(os.path.dirname(images_dir), MANIFEST_NAME), "w") as f:
+        json.dump(digests, f, indent=1, sort_keys=True)
+    return sorted(os.path.join(images_dir, name) for name in digests)
+
+
+def image_set_key(images_dir):
+    """Hash identifying the image set in images_dir (uses the upload manifest when present)."""
+    names = sorted(os.listdir(images_dir))
+    manifest_path = os.path.join(os.path.dirname(images_dir), MANIFEST_NAME)
+    digests = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            digests = json.load(f)
+    missing = [name for name in names if name not in digests]
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, min(UPLOAD_IO_WORKERS, len(missing)))) as pool:
+            digests.update(zip(missing, pool.map(hash_file, (os.path.join(images_dir, n) for n in missing))))
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(f"{name}\0{digests[name]}\n".encode())
+    return digest.hexdigest()
+
+
+def restore_reconstruction(set_key, file_name, dst):
+    """Link the stored result file for an image set to dst; returns False if there is none."""
+    if not reconstruction_budget.touch(set_key):
+        return False
+    try:
+        link_or_copy(RECONSTRUCTION_STORE_DIR / set_key / file_name, dst)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def store_reconstruction(set_key, path):
+    """Link a result file into the store for set_key."""
+    _store(path, RECONSTRUCTION_STORE_DIR / set_key / os.path.basename(path))
+    reconstruction_budget.add(set_key)
@@ -0,0 +1,294 @@
+"""
+Video restoration: stream a clip through an image model frame by frame.
+
+Frames are decoded by an ffmpeg subprocess into raw RGB on a pipe, already
+scaled to fit the model's bound (never upscaled), and restored frames are piped
+into a second ffmpeg that encodes H.264 and copies the source audio. Only the
+current batch, the next decoded batch and a few recent outputs are in memory,
+never the whole clip.
+
+Frames go to the model VIDEO_BATCH_SIZE at a time, as one model invocation per
+batch (through shared memory when the worker supports it, PNG files
+otherwise). Every frame is reduced to a 64x64 grid of block averages
+(grayscale). A frame whose blocks all differ by at most
+VIDEO_DUPLICATE_THRESHOLD (0-255) from those of one of the last
+VIDEO_REUSE_HISTORY processed frames is not sent to the model; the stored
+output of that frame is written again instead. Averaging whole blocks
+ignores sensor and compression noise, while taking the largest block
+difference catches local motion, such as a moving mouth or a pan of a few
+pixels, that a mean over the whole frame would hide. Static shots and
+duplicated frames from frame-rate conversion are restored once.
+
+ffmpeg and ffprobe must be on the PATH (or set FFMPEG / FFPROBE).
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from queue import Full, Queue
+
+import numpy as np
+from PIL import Image
+
+from metrics import Counter, span
+from model_workers import run_model, run_model_arrays, supports_shm
+from worker_protocol import output_path
+from workspaces import request_workspace
+
+FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
+FFPROBE = os.environ.get("FFPROBE", "ffprobe")
+VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", "8"))
+VIDEO_DUPLICATE_THRESHOLD = float(os.environ.get("VIDEO_DUPLICATE_THRESHOLD", "3"))
+# Processed frames (thumbnail and output) kept for reuse
+VIDEO_REUSE_HISTORY = int(os.environ.get("VIDEO_REUSE_HISTORY", "4"))
+THUMBNAIL_SIZE = 64
+# Lines of ffmpeg stderr kept for error messages
+FFMPEG_STDERR_TAIL = 20
+
+video_frames = Counter("video_frames_total", "Video frames restored by the model or reused from a near-identical frame.", ["model", "outcome"])
+
+_DONE = object()
+
+
+def probe(path):
+    """(width, height, frames per second) of the first video stream."""
+    result = subprocess.run(
+        [FFPROBE, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,avg_frame_rate", "-of", "json", str(path)],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    stream = json.loads(result.stdout)["streams"][0]
+    num, _, den = stream["avg_frame_rate"].partition("/")
+    fps = float(num) / float(den or 1) if float(num) else 25.0
+    return int(stream["width"]), int(stream["height"]), fps
+
+
+def fit(width, height, bound):
+    """Frame size within bound x bound (never larger than the source), rounded to even numbers."""
+    scale = min(1.0, bound / max(width, height))
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+
+def _drain_stderr(process):
+    """Read process.stderr on a thread so ffmpeg never blocks on a full pipe; returns (thread, tail)."""
+    tail = deque(maxlen=FFMPEG_STDERR_TAIL)
+
+    def drain():
+        for line in process.stderr:
+            tail.append(line.decode(errors="replace").rstrip())
+
+    thread = threading.Thread(target=drain, daemon=True, name="ffmpeg-stderr")
+    thread.start()
+    return thread, tail
+
+
+def _stderr_text(drained):
+    thread, tail = drained
+    thread.join(timeout=1)
+    return "\n".join(tail)
+
+
+class VideoReader:
+    """Iterates over HxWx3 uint8 frames of a video, scaled to width x height, as ffmpeg decodes them."""
+
+    def __init__(self, path, width, height):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.process = subprocess.Popen(
+            [FFMPEG, "-v", "error", "-i", str(path), "-vf", f"scale={width}:{height}",
+             "-f", "rawvideo", "-pix_fmt", "rgb24", "-"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+        self.stderr = _drain_stderr(self.process)
+
+    def __iter__(self):
+        frame_bytes = self.width * self.height * 3
+        while True:
+            data = self.process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not decode {self.path}: {_stderr_text(self.stderr)}")
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+class VideoWriter:
+    """H.264 encoder fed raw frames on a pipe; started on the first frame, which fixes the size."""
+
+    def __init__(self, path, fps, audio_source=None):
+        self.path = path
+        self.fps = fps
+        self.audio_source = audio_source
+        self.process = None
+        self.stderr = None
+
+    def write(self, frame):
+        if self.process is None:
+            height, width = frame.shape[:2]
+            cmd = [FFMPEG, "-v", "error", "-y",
+                   "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", f"{self.fps:.6g}", "-i", "-"]
+            if self.audio_source is not None:
+                cmd += ["-i", str(self.audio_source), "-map", "0:v:0", "-map", "1:a?", "-c:a", "copy", "-shortest"]
+            cmd += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "18", str(self.path)]
+            self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+            self.stderr = _drain_stderr(self.process)
+        self.process.stdin.write(np.ascontiguousarray(frame, dtype=np.uint8).tobytes())
+
+    def close(self):
+        if self.process is None:
+            raise RuntimeError("The video has no frames")
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg could not encode {self.path}: {_stderr_text(self.stderr)}")
+
+    def abort(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+def thumbnail(frame):
+    """Grayscale block averages of the frame on a grid of at most THUMBNAIL_SIZE x THUMBNAIL_SIZE."""
+    height, width = frame.shape[:2]
+    gray = frame.astype(np.float32).mean(axis=2)
+    rows = np.linspace(0, height, min(THUMBNAIL_SIZE, height) + 1).astype(np.intp)[:-1]
+    cols = np.linspace(0, width, min(THUMBNAIL_SIZE, width) + 1).astype(np.intp)[:-1]
+    sums = np.add.reduceat(np.add.reduceat(gray, rows, axis=0), cols, axis=1)
+    counts = np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width)))
+    return sums / counts
+
+
+def is_duplicate(a, b, threshold):
+    """Whether two thumbnails match: no block differs by more than threshold."""
+    return threshold >= 0 and float(np.abs(a - b).max()) <= threshold
+
+
+def run_frames(project, frames):
+    """Run the model once on {name: frame} and return {name: output frame}."""
+    model = project["model"]
+    shm_project = dict(project, transport="shm")
+    if supports_shm(shm_project):
+        outputs = run_model_arrays(shm_project, frames)
+        if outputs is not None:
+            return {name: np.asarray(output) for name, output in outputs.items()}
+
+    with request_workspace(model) as (input_dir, output_dir):
+        with span("encode", model):
+            for name, frame in frames.items():
+                Image.fromarray(frame).save(input_dir / f"{name}.png", compress_level=1)
+        run_model(project, input_dir, output_dir)
+        with span("decode", model):
+            outputs = {}
+            for name in frames:
+                with Image.open(output_path(output_dir, f"{name}.png", model)) as image:
+                    outputs[name] = np.asarray(image.convert("RGB"))
+    return outputs
+
+
+def _decode_batches(reader, batch_size, batches, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    batch = []
+    try:
+        for frame in reader:
+            batch.append(frame)
+            if len(batch) == batch_size:
+                put(batch)
+                batch = []
+        if batch:
+            put(batch)
+        put(_DONE)
+    except Exception as e:
+        put(e)
+
+
+def restore_video(project, input_path, output_file, batch_size=VIDEO_BATCH_SIZE,
+                  threshold=VIDEO_DUPLICATE_THRESHOLD, progress=None):
+    """
+    Restore every frame of input_path with the project's model and write
+    output_file. Set threshold to a negative number to process every frame.
+    Calls progress(frames done) after each batch if given. Returns
+    {"frames", "processed", "reused", "seconds", "fps", "reuse_ratio"}.
+    """
+    model = project["model"]
+    start_time = time.perf_counter()
+    width, height, fps = probe(input_path)
+    width, height = fit(width, height, project["bound"])
+
+    # Decode the next batch while the current one is in the model
+    batches = Queue(2)
+    stop = threading.Event()
+    reader = VideoReader(input_path, width, height)
+    threading.Thread(
+        target=_decode_batches, args=(reader, batch_size, batches, stop), daemon=True, name="video-decode"
+    ).start()
+
+    writer = VideoWriter(output_file, fps, audio_source=input_path)
+    history = deque(maxlen=max(1, VIDEO_REUSE_HISTORY))  # (thumbnail, output) of recently processed frames
+    done = processed = 0
+    try:
+        while (batch := batches.get()) is not _DONE:
+            if isinstance(batch, Exception):
+                raise batch
+
+            # Each frame is either sent to the model or points at a processed frame it duplicates
+            sources, unique, thumbnails = [], {}, {}
+            for frame in batch:
+                thumb = thumbnail(frame)
+                match = next((output for past, output in history if is_duplicate(past, thumb, threshold)), None)
+                if match is None:
+                    match = next((name for name, past in thumbnails.items() if is_duplicate(past, thumb, threshold)), None)
+                if match is None:
+                    match = f"frame{done + len(sources):08d}"
+                    unique[match] = frame
+                    thumbnails[match] = thumb
+                sources.append(match)
+
+            with span("model_run", model):
+                outputs = run_frames(project, unique) if unique else {}
+            with span("encode_video", model):
+                for source in sources:
+                    writer.write(outputs[source] if isinstance(source, str) else source)
+            for name, thumb in thumbnails.items():
+                history.append((thumb, outputs[name]))
+
+            done += len(batch)
+            processed += len(unique)
+            video_frames.inc(len(unique), model=model, outcome="processed")
+            video_frames.inc(len(batch) - len(unique), model=model, outcome="reused")
+            if progress is not None:
+                progress(done)
+
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        stop.set()
+        reader.close()
+
+    seconds = time.perf_counter() - start_time
+    return {
+        "frames": done,
+        "processed": processed,
+        "reused": done - processed,
+        "seconds": seconds,
+        "fps": done / seconds if seconds > 0 else 0.0,
+        "reuse_ratio": (done - processed) / done if done else 0.0,
+    }
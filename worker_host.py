@@ -0,0 +1,133 @@
+"""
+Serve this machine's models to a remote app (see remote_workers.py).
+
+    python worker_host.py --port 7870
+    python worker_host.py --port 7871 --models DarkIR DeOldify --host 0.0.0.0
+
+Advertises every image model that is installed here (its worker or one-shot
+script and venv exist; all of them with STUB_MODELS=1), or the --models
+subset. Jobs run through the local worker pools exactly as in the app, with
+the same per-model concurrency and memory admission. Several hosts can run on
+one machine on different ports to try out the remote pool:
+
+    STUB_MODELS=1 python worker_host.py --port 7870 &
+    STUB_MODELS=1 python worker_host.py --port 7871 --models DarkIR &
+    REMOTE_WORKERS=localhost:7870,localhost:7871 python main.py
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from constants import STUB_MODELS
+from model_registry import MODELS, image_models
+from model_workers import run_model, stop_all, worker_command
+from remote_workers import remote_workers
+from worker_protocol import output_path
+from workspaces import request_workspace
+
+
+def installed_models():
+    models = []
+    for model in image_models():
+        project = MODELS[model]
+        if STUB_MODELS or worker_command(project) is not None or (
+            os.path.exists(project["venv"]) and os.path.exists(project["script"])
+        ):
+            models.append(model)
+    return models
+
+
+class _WorkerHostHandler(BaseHTTPRequestHandler):
+    models = []
+    in_flight = {}
+    lock = threading.Lock()
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/health":
+            self._send_json(404, {"ok": False, "error": "not found"})
+            return
+        with self.lock:
+            models = {
+                model: {"capacity": MODELS[model].get("concurrency", 1), "in_flight": self.in_flight.get(model, 0)}
+                for model in self.models
+            }
+        self._send_json(200, {"host": socket.gethostname(), "pid": os.getpid(), "models": models})
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/run":
+            self._send_json(404, {"ok": False, "error": "not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            model = request["model"]
+            images = {os.path.basename(name): base64.b64decode(data) for name, data in request["images"].items()}
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"ok": False, "error": f"bad request: {e}"})
+            return
+        if model not in self.models:
+            self._send_json(404, {"ok": False, "error": f"{model} is not installed on this host"})
+            return
+
+        with self.lock:
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        try:
+            with request_workspace(model) as (input_dir, output_dir):
+                for name, data in images.items():
+                    (input_dir / name).write_bytes(data)
+                start_time = time.perf_counter()
+                run_model(MODELS[model], input_dir, output_dir)
+                infer_time = time.perf_counter() - start_time
+                outputs = {}
+                for name in images:
+                    with open(output_path(output_dir, name, model), "rb") as f:
+                        outputs[name] = base64.b64encode(f.read()).decode()
+        except Exception as e:
+            print(f"ERROR: {model} job failed: {e}")
+            self._send_json(500, {"ok": False, "error": str(e)})
+            return
+        finally:
+            with self.lock:
+                self.in_flight[model] -= 1
+        self._send_json(200, {"ok": True, "outputs": outputs, "infer_time": infer_time})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1", models=None):
+    # Jobs received here always run on this machine
+    remote_workers.hosts = []
+    available = installed_models()
+    _WorkerHostHandler.models = [model for model in available if models is None or model in models]
+    server = ThreadingHTTPServer((host, port), _WorkerHostHandler)
+    server.daemon_threads = True
+    print(f"Worker host on http://{host}:{port} serving {', '.join(_WorkerHostHandler.models) or 'no models'}")
+    try:
+        server.serve_forever()
+    finally:
+        stop_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve this machine's models to remote apps")
+    parser.add_argument("--port", type=int, default=7870)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on (0.0.0.0 for all)")
+    parser.add_argument("--models", nargs="+", choices=image_models(), help="Only advertise these models")
+    args = parser.parse_args()
+    try:
+        serve(args.port, args.host, args.models)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,108 @@
+"""
+Line-delimited JSON protocol spoken between the app and long-lived model workers.
+
+A worker script runs inside the model's venv (with the model folder as cwd),
+loads its checkpoint once and then calls serve(). The app writes one job per
+line to the worker's stdin and reads one reply per line from its stdout.
+
+Job:   {"id": 1, "model": "DarkIR", "input_dir": "...", "output_dir": "..."}
+Reply: {"id": 1, "ok": true, ...}  or  {"id": 1, "ok": false, "error": "..."}
+
+For every image <stem>.<ext> in input_dir the worker writes
+<output_dir>/<stem>_<model>.png, the same naming the one-shot scripts use.
+
+Workers that pass `handle_arrays` to serve() also accept raw pixel buffers in
+shared memory (see shared_buffers), skipping PNG encode/decode entirely:
+
+Job:   {"id": 2, "transport": "shm", "inputs": {"temp": <descriptor>}}
+Reply: {"id": 2, "ok": true, "outputs": {"temp": <descriptor>}}
+
+Workers without it answer such jobs with {"ok": false, "unsupported": true}
+and the app falls back to files.
+
+File jobs only need the standard library (shared-memory jobs import numpy on
+demand), so the module can be imported from any model venv: add the project
+root to sys.path and `from worker_protocol import serve`.
+"""
+import json
+import os
+import sys
+import time
+import traceback
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+
+def send(stream, message):
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+
+def list_images(input_dir):
+    """Sorted image file names in a job's input_dir."""
+    return sorted(
+        name for name in os.listdir(input_dir)
+        if os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES
+    )
+
+
+def output_path(output_dir, input_name, model):
+    stem = os.path.splitext(os.path.basename(input_name))[0]
+    return os.path.join(output_dir, f"{stem}_{model}.png")
+
+
+def _handle_shm_job(job, model, handle_arrays):
+    from shared_buffers import read_array, write_array
+
+    arrays = {name: read_array(descriptor) for name, descriptor in job["inputs"].items()}
+    outputs = handle_arrays(arrays, model)
+    return {"outputs": {name: write_array(array) for name, array in outputs.items()}}
+
+
+def serve(handle_job, load_model=None, handle_arrays=None):
+    """
+    Run the worker loop until stdin closes or a shutdown command arrives.
+
+    `load_model()` is called once before the ready message is sent and its
+    return value is passed to every `handle_job(job, model)` call. The dict
+    returned by `handle_job` is merged into the reply.
+
+    `handle_arrays(arrays, model)`, if given, serves shared-memory jobs: it
+    receives {name: HxWxC uint8 array} and returns arrays under the same names.
+    """
+    # Model code prints freely; keep the real stdout for protocol messages only
+    # and point both the Python and the C level stdout at stderr.
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    start_time = time.time()
+    model = load_model() if load_model is not None else None
+    send(protocol_out, {"ready": True, "pid": os.getpid(), "load_time": time.time() - start_time})
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        job = json.loads(line)
+        if job.get("cmd") == "shutdown":
+            break
+
+        reply = {"id": job.get("id")}
+        job_start = time.time()
+        try:
+            if job.get("transport") == "shm":
+                if handle_arrays is None:
+                    reply.update(ok=False, unsupported=True, error="shm transport not supported")
+                    send(protocol_out, reply)
+                    continue
+                reply.update(_handle_shm_job(job, model, handle_arrays))
+            else:
+                reply.update(handle_job(job, model) or {})
+            reply["ok"] = True
+        except Exception as e:
+            traceback.print_exc()
+            reply["ok"] = False
+            reply["error"] = str(e)
+        reply["infer_time"] = time.time() - job_start
+        send(protocol_out, reply)
@@ -0,0 +1,32 @@
+"""
+Per-request input/output folders so concurrent requests never share files.
+"""
+import shutil
+import uuid
+from contextlib import contextmanager
+
+from constants import BASE_DIR
+
+WORKSPACE_ROOT = BASE_DIR / "workspaces"
+
+# Shared folders the one-shot model scripts read from / write to.
+LEGACY_INPUT_DIR = BASE_DIR / "input_128"
+LEGACY_OUTPUT_DIR = BASE_DIR / "output_images"
+
+
+@contextmanager
+def request_workspace(model):
+    """
+    Create workspaces/<model>_<uuid>/{input,output} and remove it afterwards.
+    Yields (input_dir, output_dir). Anything read from output_dir must be
+    loaded into memory before the block exits.
+    """
+    workspace = WORKSPACE_ROOT / f"{model}_{uuid.uuid4().hex}"
+    input_dir = workspace / "input"
+    output_dir = workspace / "output"
+    input_dir.mkdir(parents=True)
+    output_dir.mkdir()
+    try:
+        yield input_dir, output_dir
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)